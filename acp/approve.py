@@ -4,6 +4,12 @@ import logging
 from dotenv import load_dotenv
 from web3 import Web3
 
+from acp.common.allowances import get_allowance_cache
+from acp.common.fees import fee_fields
+from acp.common.gas import get_gas_estimator
+from acp.common.replacements import send_transaction
+from acp.common.web3_pool import get_web3
+
 # --- Configuration ---
 # Load environment variables from a .env file
 load_dotenv(override=True)
@@ -44,11 +50,7 @@ ERC20_ABI = [
 def check_token_approval(w3, token_address, owner_address, spender_address):
     """Checks if the spender has a sufficient allowance."""
     try:
-        token_contract = w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=ERC20_ABI)
-        allowance = token_contract.functions.allowance(
-            Web3.to_checksum_address(owner_address),
-            Web3.to_checksum_address(spender_address)
-        ).call()
+        allowance = get_allowance_cache(w3).allowance(owner_address, token_address, spender_address)
         logging.info(f"Current allowance is: {allowance}")
         # A small non-zero allowance is considered sufficient for this check
         return allowance > 0
@@ -64,34 +66,32 @@ def approve_unlimited(w3, token_address, owner_address, spender_address, private
         # Max uint256 value for "unlimited" approval
         unlimited_amount = 2**256 - 1
         
-        # Build the transaction
-        nonce = w3.eth.get_transaction_count(Web3.to_checksum_address(owner_address))
-        
-        approve_txn = token_contract.functions.approve(
-            Web3.to_checksum_address(spender_address),
-            unlimited_amount
-        ).build_transaction({
+        # Build the transaction; the nonce comes from the shared local nonce manager
+        approve_txn = {
             'from': Web3.to_checksum_address(owner_address),
-            'gas': 100000,  # A reasonable gas limit for an approval
-            'gasPrice': w3.eth.gas_price,
-            'nonce': nonce,
-            'chainId': 8453  # Base Mainnet Chain ID
-        })
+            'to': token_contract.address,
+            'data': token_contract.encode_abi("approve", args=[
+                Web3.to_checksum_address(spender_address),
+                unlimited_amount,
+            ]),
+            'value': 0,
+            'chainId': 8453,  # Base Mainnet Chain ID
+            **fee_fields(w3),
+        }
+        # Learned from past approvals of this token; 100000 if it cannot be estimated
+        gas = get_gas_estimator(w3)
+        approve_txn['gas'] = gas.estimate(approve_txn, fallback=100000)
         
         # Sign and send the transaction
-        signed_txn = w3.eth.account.sign_transaction(approve_txn, private_key=private_key)
+        handle = send_transaction(w3, approve_txn, private_key)
         
-        # --- THIS IS THE FIX ---
-        # Use .raw_transaction (snake_case) instead of .rawTransaction (camelCase)
-        tx_hash = w3.eth.send_raw_transaction(signed_txn.raw_transaction)
-        # -----------------------
-        
-        logging.info(f"Approval transaction sent with hash: {tx_hash.hex()}")
-        logging.info(f"View on BaseScan: https://basescan.org/tx/{tx_hash.hex()}")
+        logging.info(f"Approval transaction sent with hash: {handle.tx_hash}")
+        logging.info(f"View on BaseScan: https://basescan.org/tx/{handle.tx_hash}")
         
         # Wait for the transaction to be confirmed
         logging.info("Waiting for transaction confirmation...")
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
+        receipt = handle.receipt()
+        gas.record(approve_txn, receipt)
         
         if receipt.status == 1:
             logging.info("Transaction confirmed successfully!")
@@ -120,10 +120,10 @@ def main():
     print("-" * 30)
 
     try:
-        w3 = Web3(Web3.HTTPProvider(RPC_URL))
-        if not w3.is_connected():
-            logging.error(f"Failed to connect to the RPC provider at {RPC_URL}")
-            sys.exit(1)
+        w3 = get_web3(RPC_URL)
+    except ConnectionError:
+        logging.error(f"Failed to connect to the RPC provider at {RPC_URL}")
+        sys.exit(1)
     except Exception as e:
         logging.error(f"Error initializing Web3 connection: {e}")
         sys.exit(1)
@@ -21,116 +21,152 @@ if OPERARI_ROOT not in sys.path:
     sys.path.append(OPERARI_ROOT)
 
 from data.utils import check_token_approval, approve_unlimited
+from acp.common.allowances import get_allowance_cache
+from acp.common.fees import fee_fields
+from acp.common.gas import get_gas_estimator
+from acp.common.permits import with_permit
+from acp.common.receipts import off_tracker, when_all_done
+from acp.common.replacements import send_transaction
+from acp.common.web3_pool import get_web3
 
 load_dotenv(override=True)
 
-def execute_swap_transaction(tx_data, private_key, rpc_url):
+def send_swap_transaction(tx_data, private_key, rpc_url, token_pair=None):
     """
-    Execute the actual swap transaction on-chain.
+    Sign and broadcast the swap transaction without waiting for it to be mined.
     
     Args:
         tx_data: Transaction data from seller's delivery
         private_key: Buyer's wallet private key
         rpc_url: RPC endpoint for the network
+        token_pair: (sellToken, buyToken) of the swap, so gas is learned per route
         
     Returns:
-        bool: True if transaction succeeded, False otherwise
+        TxHandle resolving to the receipt, or None if it could not be sent
     """
     try:
-        # Initialize Web3
-        web3 = Web3(Web3.HTTPProvider(rpc_url))
-        if not web3.is_connected():
-            print("[BUYER] Failed to connect to RPC")
-            return False
+        # Shared keep-alive provider (health-checked once per pool)
+        web3 = get_web3(rpc_url)
         
-        # Get account from private key
         account = web3.eth.account.from_key(private_key)
-        wallet_address = account.address
         
-        # Get current nonce
-        nonce = web3.eth.get_transaction_count(wallet_address)
-        
-        # Prepare transaction
+        # Prepare transaction (nonce is assigned locally by sign_and_send)
         transaction = {
+            'from': account.address,
             'to': web3.to_checksum_address(tx_data['to']),
             'data': tx_data['data'],
             'value': int(tx_data.get('value', '0')),
-            'gas': int(tx_data.get('totalGas', '200000')),  # fallback gas limit
-            'gasPrice': web3.to_wei(float(tx_data.get('gasPriceGwei', '0.1')), 'gwei'),
-            'nonce': nonce
+            'chainId': 8453,
+            **fee_fields(web3),
         }
+        # Learned from past receipts on this route; the seller's figure is the fallback
+        gas = get_gas_estimator(web3)
+        transaction['gas'] = gas.estimate(transaction, token_pair, fallback=int(tx_data.get('totalGas', '200000')))
         
         print(f"[BUYER] Executing swap transaction: {transaction['to']}")
         print(f"[BUYER] Value: {transaction['value']} wei")
         print(f"[BUYER] Gas limit: {transaction['gas']}")
         
-        # Sign transaction
-        signed_txn = web3.eth.account.sign_transaction(transaction, private_key)
-        
-        # Send transaction
-        tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-        print(f"[BUYER] Transaction sent: {tx_hash.hex()}")
-        
-        # Wait for confirmation
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-        
-        if receipt.status == 1:
-            print(f"[BUYER] Swap successful! Gas used: {receipt.gasUsed}")
-            return True
-        else:
-            print(f"[BUYER] Swap failed! Transaction reverted")
-            return False
+        handle = send_transaction(web3, transaction, private_key)
+        print(f"[BUYER] Transaction sent: {handle.tx_hash}")
+        gas.record_when_mined(handle, transaction, token_pair)
+        return handle
             
     except Exception as e:
         print(f"[BUYER] Swap execution error: {e}")
-        return False
+        return None
 
 
-def execute_approval_transaction(approval_data, private_key, rpc_url):
+def send_approval_transaction(approval_data, private_key, rpc_url):
     """
-    Execute token approval transaction if needed.
+    Sign and broadcast the token approval without waiting for it to be mined.
     
-    Args:
-        approval_data: Approval transaction data
-        private_key: Buyer's wallet private key
-        rpc_url: RPC endpoint
-        
     Returns:
-        bool: True if approval succeeded, False otherwise
+        TxHandle resolving to the receipt, or None if it could not be sent
     """
     try:
-        web3 = Web3(Web3.HTTPProvider(rpc_url))
+        web3 = get_web3(rpc_url)
         account = web3.eth.account.from_key(private_key)
         
-        nonce = web3.eth.get_transaction_count(account.address)
-        
         approval_tx = {
+            'from': account.address,
             'to': web3.to_checksum_address(approval_data['to']),
             'data': approval_data['data'],
             'value': 0,
-            'gas': int(approval_data.get('gas', '100000')),
-            'gasPrice': web3.to_wei(float(approval_data.get('gasPriceGwei', '0.1')), 'gwei'),
-            'nonce': nonce
+            'chainId': 8453,
+            **fee_fields(web3),
         }
+        gas = get_gas_estimator(web3)
+        approval_tx['gas'] = gas.estimate(approval_tx, fallback=int(approval_data.get('gas', '100000')))
         
         print("[BUYER] Executing approval transaction...")
-        signed_txn = web3.eth.account.sign_transaction(approval_tx, private_key)
-        tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-        
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-        
-        if receipt.status == 1:
-            print("[BUYER] Approval successful!")
-            return True
-        else:
-            print("[BUYER] Approval failed!")
-            return False
+        handle = send_transaction(web3, approval_tx, private_key)
+        print(f"[BUYER] Approval sent: {handle.tx_hash}")
+        gas.record_when_mined(handle, approval_tx)
+        return handle
             
     except Exception as e:
         print(f"[BUYER] Approval execution error: {e}")
+        return None
+
+
+def permit_swap_data(tx_data, private_key, rpc_url):
+    """
+    Swap transaction data carrying an EIP-2612 permit in place of a separate approval.
+    
+    Returns:
+        The rewritten transaction data, or None if the token/router needs the approval transaction
+    """
+    try:
+        return with_permit(get_web3(rpc_url), tx_data, private_key)
+    except Exception as e:
+        print(f"[BUYER] Permit unavailable, falling back to approval: {e}")
+        return None
+
+
+def report_transaction(handle, label):
+    """
+    Log the outcome of a tracked transaction (blocks until it resolves).
+    
+    Returns:
+        bool: True if it succeeded, False if it reverted or never confirmed
+    """
+    error = handle.exception()
+    if error is not None:
+        print(f"[BUYER] {label} confirmation error: {error}")
+        return False
+    
+    receipt = handle.receipt()
+    if receipt.status == 1:
+        print(f"[BUYER] {label} successful! Gas used: {receipt.gasUsed}")
+        return True
+    else:
+        print(f"[BUYER] {label} failed! Transaction reverted")
         return False
 
 
+def execute_swap_transaction(tx_data, private_key, rpc_url, token_pair=None):
+    """
+    Execute the actual swap transaction on-chain.
+        
+    Returns:
+        bool: True if transaction succeeded, False otherwise
+    """
+    handle = send_swap_transaction(tx_data, private_key, rpc_url, token_pair)
+    return handle is not None and report_transaction(handle, "Swap")
+
+
+def execute_approval_transaction(approval_data, private_key, rpc_url):
+    """
+    Execute token approval transaction if needed.
+        
+    Returns:
+        bool: True if approval succeeded, False otherwise
+    """
+    handle = send_approval_transaction(approval_data, private_key, rpc_url)
+    return handle is not None and report_transaction(handle, "Approval")
+
+
 def check_balance_and_allowance(env, token_address, spender_address, required_amount_wei, rpc_url):
     """
     Check if the buyer wallet has enough balance and allowance.
@@ -146,46 +182,18 @@ def check_balance_and_allowance(env, token_address, spender_address, required_am
         (bool, bool): (has_balance, has_allowance)
     """
     try:
-        # Initialize Web3 with the provided RPC URL
-        w3 = Web3(Web3.HTTPProvider(rpc_url))
-        if not w3.is_connected():
-            print("[ERROR] Failed to connect to RPC endpoint")
-            return False, False
-
-        # Standard ERC20 ABI for balanceOf and allowance functions
-        token_abi = [
-            {
-                "constant": True,
-                "inputs": [{"name": "_owner", "type": "address"}],
-                "name": "balanceOf",
-                "outputs": [{"name": "", "type": "uint256"}],
-                "stateMutability": "view",
-                "type": "function"
-            },
-            {
-                "constant": True,
-                "inputs": [
-                    {"name": "_owner", "type": "address"},
-                    {"name": "_spender", "type": "address"}
-                ],
-                "name": "allowance",
-                "outputs": [{"name": "", "type": "uint256"}],
-                "stateMutability": "view",
-                "type": "function"
-            }
-        ]
+        # Shared keep-alive provider for the provided RPC URL
+        w3 = get_web3(rpc_url)
 
         # Ensure addresses are checksummed
         token_address = Web3.to_checksum_address(token_address)
         spender_address = Web3.to_checksum_address(spender_address)
         wallet_address = Web3.to_checksum_address(env.BUYER_AGENT_WALLET_ADDRESS)
 
-        # Create contract instance
-        token = w3.eth.contract(address=token_address, abi=token_abi)
-
-        # Get balance and allowance
-        balance = token.functions.balanceOf(wallet_address).call()
-        allowance = token.functions.allowance(wallet_address, spender_address).call()
+        # Served from the log-maintained cache; only the first check per token hits the chain
+        balance, allowance = get_allowance_cache(w3).balance_and_allowance(
+            wallet_address, token_address, spender_address
+        )
 
         # Log the values for debugging
         print(f"[BALANCE] Wallet: {wallet_address}")
@@ -382,38 +390,66 @@ def buyer():
                 job.evaluate(False)
                 return
         
-            # Execute approval if needed
+            # Permit-capable tokens authorize the router inside the swap itself;
+            # otherwise send approval and swap back to back (the local nonce
+            # manager orders them, so the swap need not wait for the approval to mine)
+            tx_data = bundle.get("transactionData", {})
+            approval_handle = None
             if bundle.get("approvalData"):
-                print("[BUYER] Approval required - executing approval transaction...")
-                approval_success = execute_approval_transaction(
-                    bundle["approvalData"], 
-                    env.WHITELISTED_WALLET_PRIVATE_KEY, 
+                permitted_tx_data = permit_swap_data(
+                    tx_data,
+                    env.WHITELISTED_WALLET_PRIVATE_KEY,
                     config.rpc_url
                 )
-                if not approval_success:
-                    print("[BUYER] Approval transaction failed")
-                    job.evaluate(False)
-                    return
-            
-                # Wait a moment for approval to be mined
-                import time
-                time.sleep(5)
+                if permitted_tx_data is not None:
+                    tx_data = permitted_tx_data
+                else:
+                    print("[BUYER] Approval required - executing approval transaction...")
+                    approval_handle = send_approval_transaction(
+                        bundle["approvalData"], 
+                        env.WHITELISTED_WALLET_PRIVATE_KEY, 
+                        config.rpc_url
+                    )
+                    if approval_handle is None:
+                        print("[BUYER] Approval transaction failed")
+                        job.evaluate(False)
+                        return
         
-            # Execute the swap transaction
+            # Execute the swap transaction; the token pair keeps its gas samples apart from other routes
+            meta = delivery_data.get("value", {}).get("meta") or {}
+            token_pair = (meta["sellToken"], meta["buyToken"]) if meta.get("sellToken") and meta.get("buyToken") else None
             print("[BUYER] Executing swap transaction...")
-            tx_data = bundle.get("transactionData", {})
-            swap_success = execute_swap_transaction(
+            swap_handle = send_swap_transaction(
                 tx_data, 
                 env.WHITELISTED_WALLET_PRIVATE_KEY, 
-                config.rpc_url
+                config.rpc_url,
+                token_pair
             )
-            
-            if swap_success:
-                print("[BUYER] Swap executed successfully!")
-                job.evaluate(True)
-            else:
+            if swap_handle is None:
                 print("[BUYER] Swap execution failed")
                 job.evaluate(False)
+                return
+            
+            # Evaluate once both receipts are in, on a worker thread (job.evaluate blocks)
+            # so neither the SDK callback nor the receipt tracker waits on it
+            def finish_evaluation():
+                approval_success = approval_handle is None or report_transaction(approval_handle, "Approval")
+                swap_success = report_transaction(swap_handle, "Swap")
+                if approval_success and swap_success:
+                    print("[BUYER] Swap executed successfully!")
+                    job.evaluate(True)
+                else:
+                    print("[BUYER] Swap execution failed")
+                    job.evaluate(False)
+                
+                # Original logic as fallback
+                for memo in job.memos:
+                    if memo.next_phase == ACPJobPhase.COMPLETED:
+                        job.evaluate(True)
+                        break
+            
+            when_all_done([h for h in (approval_handle, swap_handle) if h is not None], off_tracker(finish_evaluation))
+            return
                 
         except Exception as e:
             print(f"[BUYER] Error during evaluation: {e}")
@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from eth_abi import encode
+from web3 import Web3
+
+from acp.common.multicall import aggregate3
+
+
+BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")  # balanceOf(address)
+ALLOWANCE_SELECTOR = bytes.fromhex("dd62ed3e")   # allowance(address,address)
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+APPROVAL_TOPIC = "0x8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0f7b2291e5b200ac8c7c3b925"
+UNLIMITED = 2**256 - 1
+
+ALLOWANCE_REFRESH_SECONDS = float(os.getenv("ALLOWANCE_REFRESH_SECONDS", "2"))
+# Behind by more than this many blocks, re-read everything instead of replaying logs
+ALLOWANCE_MAX_LOG_RANGE = int(os.getenv("ALLOWANCE_MAX_LOG_RANGE", "500"))
+# Never serve values last confirmed against the chain longer ago than this
+ALLOWANCE_MAX_LAG_SECONDS = float(os.getenv("ALLOWANCE_MAX_LAG_SECONDS", "10"))
+
+
+def _topic(address: str) -> str:
+    return "0x" + "0" * 24 + address.lower()[2:]
+
+
+def _topic_address(topic) -> str:
+    return "0x" + Web3.to_hex(topic)[-40:].lower()
+
+
+class AllowanceCache:
+    """ERC-20 balances and allowances for our own wallets, kept fresh from logs.
+
+    The first read of an (owner, token) balance or (owner, token, spender)
+    allowance fills it, together with anything else not yet cached, in one
+    Multicall3 batch pinned to the block the cache is synced to. A
+    background thread then follows ``Transfer`` and ``Approval`` logs that
+    involve the watched owners (two ``eth_getLogs`` calls per refresh) and
+    applies them, so later reads cost no RPC at all.
+
+    ``transferFrom`` lowers an allowance without an ``Approval`` event on
+    many tokens, so an outgoing transfer marks that owner's finite allowances
+    for the token stale and they are re-read on next access; unlimited
+    allowances are left alone. Falling more than ``max_log_range`` blocks
+    behind drops everything back to a fresh multicall read.
+
+    A read more than ``max_lag`` seconds after the last successful sync
+    (the background refresh keeps failing) first refreshes inline; if that
+    fails too, the cache is dropped and the value is read straight from the
+    chain, so stale balances or allowances are never served.
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        refresh_seconds: float = ALLOWANCE_REFRESH_SECONDS,
+        max_log_range: int = ALLOWANCE_MAX_LOG_RANGE,
+        max_lag: float = ALLOWANCE_MAX_LAG_SECONDS,
+    ):
+        self.w3 = w3
+        self.refresh_seconds = refresh_seconds
+        self.max_log_range = max_log_range
+        self.max_lag = max_lag
+        self._lock = threading.RLock()
+        self._balances: Dict[Tuple[str, str], int] = {}
+        self._allowances: Dict[Tuple[str, str, str], int] = {}
+        self._owners: Set[str] = set()
+        self._tokens: Set[str] = set()
+        self._synced_block: Optional[int] = None
+        self._synced_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    def _fill(self, balance_keys: Iterable[Tuple[str, str]], allowance_keys: Iterable[Tuple[str, str, str]]):
+        balance_keys = [k for k in balance_keys if k not in self._balances]
+        allowance_keys = [k for k in allowance_keys if k not in self._allowances]
+        if not balance_keys and not allowance_keys:
+            return
+        if self._synced_block is None:
+            self._synced_block = self.w3.eth.block_number
+            self._synced_at = time.monotonic()
+        calls = []
+        for owner, token in balance_keys:
+            calls.append((token, BALANCE_OF_SELECTOR + encode(["address"], [Web3.to_checksum_address(owner)])))
+        for owner, token, spender in allowance_keys:
+            args = encode(["address", "address"], [Web3.to_checksum_address(owner), Web3.to_checksum_address(spender)])
+            calls.append((token, ALLOWANCE_SELECTOR + args))
+        # Read at the synced block so logs after it apply on top without double counting
+        results = aggregate3(self.w3, calls, block_identifier=self._synced_block)
+        for key, (ok, data) in zip(list(balance_keys) + list(allowance_keys), results):
+            if not ok or len(data) < 32:
+                raise RuntimeError(f"Could not read {'balance' if len(key) == 2 else 'allowance'} for {key}")
+            value = int.from_bytes(data[:32], "big")
+            if len(key) == 2:
+                self._balances[key] = value
+            else:
+                self._allowances[key] = value
+        for key in list(balance_keys) + list(allowance_keys):
+            self._owners.add(key[0])
+            self._tokens.add(key[1])
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="allowance-cache", daemon=True)
+            self._thread.start()
+
+    def _apply_log(self, log):
+        topics = log["topics"]
+        if len(topics) < 3:
+            return
+        token = log["address"].lower()
+        event = Web3.to_hex(topics[0]).lower()
+        first, second = _topic_address(topics[1]), _topic_address(topics[2])
+        value = int.from_bytes(bytes(log["data"])[:32], "big")
+        if event == APPROVAL_TOPIC:
+            key = (first, token, second)
+            if key in self._allowances:
+                self._allowances[key] = value
+        elif event == TRANSFER_TOPIC:
+            if (first, token) in self._balances:
+                self._balances[(first, token)] -= value
+            if (second, token) in self._balances:
+                self._balances[(second, token)] += value
+            if first in self._owners:
+                for key in [k for k in self._allowances if k[0] == first and k[1] == token]:
+                    if self._allowances[key] != UNLIMITED:
+                        del self._allowances[key]
+
+    def refresh(self):
+        with self._lock:
+            if self._synced_block is None or not self._owners:
+                return
+            head = self.w3.eth.block_number
+            if head <= self._synced_block:
+                self._synced_at = time.monotonic()
+                return
+            if head - self._synced_block > self.max_log_range:
+                print(f"[ALLOWANCES] {head - self._synced_block} blocks behind; re-reading from chain")
+                self.invalidate()
+                return
+            owners = [_topic(o) for o in sorted(self._owners)]
+            base = {
+                "fromBlock": self._synced_block + 1,
+                "toBlock": head,
+                "address": [Web3.to_checksum_address(t) for t in sorted(self._tokens)],
+            }
+            # Outgoing transfers and approvals by our owners, then incoming transfers
+            logs = list(self.w3.eth.get_logs({**base, "topics": [[TRANSFER_TOPIC, APPROVAL_TOPIC], owners]}))
+            logs += list(self.w3.eth.get_logs({**base, "topics": [TRANSFER_TOPIC, None, owners]}))
+            seen = set()
+            for log in sorted(logs, key=lambda l: (l["blockNumber"], l["logIndex"])):
+                ident = (Web3.to_hex(log["transactionHash"]), log["logIndex"])
+                if ident in seen:
+                    continue
+                seen.add(ident)
+                self._apply_log(log)
+            self._synced_block = head
+            self._synced_at = time.monotonic()
+
+    def invalidate(self):
+        """Forget every cached value; the next reads re-fill from chain."""
+        with self._lock:
+            self._balances.clear()
+            self._allowances.clear()
+            self._synced_block = None
+
+    def _ensure_current(self):
+        if self._synced_block is None or time.monotonic() - self._synced_at <= self.max_lag:
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"[ALLOWANCES] Inline refresh failed: {e}")
+        if self._synced_block is not None and time.monotonic() - self._synced_at > self.max_lag:
+            print(f"[ALLOWANCES] Cache {time.monotonic() - self._synced_at:.0f}s behind; reading from chain")
+            self.invalidate()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[ALLOWANCES] Refresh error: {e}")
+
+    def balance(self, owner: str, token: str) -> int:
+        key = (owner.lower(), token.lower())
+        with self._lock:
+            self._ensure_current()
+            if key not in self._balances:
+                self._fill([key], [])
+            return self._balances[key]
+
+    def allowance(self, owner: str, token: str, spender: str) -> int:
+        key = (owner.lower(), token.lower(), spender.lower())
+        with self._lock:
+            self._ensure_current()
+            if key not in self._allowances:
+                self._fill([], [key])
+            return self._allowances[key]
+
+    def balance_and_allowance(self, owner: str, token: str, spender: str) -> Tuple[int, int]:
+        """Both values, filled together in one batch if either is missing."""
+        balance_key = (owner.lower(), token.lower())
+        allowance_key = (owner.lower(), token.lower(), spender.lower())
+        with self._lock:
+            self._ensure_current()
+            self._fill([balance_key], [allowance_key])
+            return self._balances[balance_key], self._allowances[allowance_key]
+
+
+_CACHES: Dict[int, AllowanceCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_allowance_cache(w3: Web3) -> AllowanceCache:
+    """One cache per Web3 instance; pooled instances are process-wide, so this is too."""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(id(w3))
+        if cache is None or cache.w3 is not w3:
+            cache = AllowanceCache(w3)
+            _CACHES[id(w3)] = cache
+        return cache
@@ -0,0 +1,442 @@
+import bisect
+import copy
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from eth_abi import decode, encode
+from web3 import Web3
+
+from acp.common.kyber import NATIVE_TOKEN
+from acp.common.multicall import aggregate3
+from acp.common.tokens import ETH_ADDRESS
+from acp.common.v3_math import (
+    FEE_DENOMINATOR,
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    Q96,
+    compute_swap_step,
+    get_sqrt_ratio_at_tick,
+)
+
+
+# Comma-separated pools to quote locally: "v2:<address>[:<fee bps>]" or "v3:<address>"
+AMM_POOLS = os.getenv("AMM_POOLS", "")
+AMM_REFRESH_SECONDS = float(os.getenv("AMM_REFRESH_SECONDS", "2"))
+# Behind by more than this many blocks, re-read pool state instead of replaying logs
+AMM_MAX_LOG_RANGE = int(os.getenv("AMM_MAX_LOG_RANGE", "500"))
+# Tick-bitmap words loaded on each side of a V3 pool's current tick (256 tick spacings each)
+AMM_V3_TICK_WORDS = int(os.getenv("AMM_V3_TICK_WORDS", "2"))
+
+TOKEN0_SELECTOR = bytes.fromhex("0dfe1681")        # token0()
+TOKEN1_SELECTOR = bytes.fromhex("d21220a7")        # token1()
+GET_RESERVES_SELECTOR = bytes.fromhex("0902f1ac")  # getReserves()
+SLOT0_SELECTOR = bytes.fromhex("3850c7bd")         # slot0()
+LIQUIDITY_SELECTOR = bytes.fromhex("1a686502")     # liquidity()
+FEE_SELECTOR = bytes.fromhex("ddca3f43")           # fee()
+TICK_SPACING_SELECTOR = bytes.fromhex("d0c93a7c")  # tickSpacing()
+TICK_BITMAP_SELECTOR = bytes.fromhex("5339c296")   # tickBitmap(int16)
+TICKS_SELECTOR = bytes.fromhex("f30dba93")         # ticks(int24)
+
+SYNC_TOPIC = "0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
+V3_SWAP_TOPIC = "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67"
+V3_MINT_TOPIC = "0x7a53080ba414158be7ec69b987b5fb7d07dee101fe85488f0853ae16239d0bde"
+V3_BURN_TOPIC = "0x0c396cd989a39f4459b5fa1aed6a9a8dcdbc45908acfd67e028cd568da98982c"
+
+
+class InsufficientTickData(Exception):
+    """The swap would run past the V3 ticks loaded locally."""
+
+
+def _pool_token(token: str) -> str:
+    """Pools hold WETH, never native ETH."""
+    token = token.lower()
+    return ETH_ADDRESS.lower() if token == NATIVE_TOKEN else token
+
+
+def _word(data: bytes, index: int) -> bytes:
+    return data[32 * index:32 * (index + 1)]
+
+
+def _address(data: bytes) -> str:
+    return "0x" + data[12:32].hex()
+
+
+class V2Pool:
+    """Constant-product pool (Uniswap V2 style) quoted from its reserves."""
+
+    kind = "v2"
+
+    def __init__(self, address: str, fee_bps: int = 30):
+        self.address = address.lower()
+        self.fee_bps = fee_bps
+        self.token0: Optional[str] = None
+        self.token1: Optional[str] = None
+        self.reserve0 = 0
+        self.reserve1 = 0
+
+    def state_calls(self) -> List[Tuple[str, bytes]]:
+        calls = [(self.address, GET_RESERVES_SELECTOR)]
+        if self.token0 is None:
+            calls = [(self.address, TOKEN0_SELECTOR), (self.address, TOKEN1_SELECTOR)] + calls
+        return calls
+
+    def load(self, w3: Web3, block: int):
+        results = aggregate3(w3, self.state_calls(), block_identifier=block)
+        if not all(ok for ok, _ in results):
+            raise RuntimeError(f"Could not read V2 pool {self.address}")
+        if self.token0 is None:
+            self.token0, self.token1 = _address(results[0][1]), _address(results[1][1])
+        reserves = results[-1][1]
+        self.reserve0, self.reserve1 = int.from_bytes(_word(reserves, 0), "big"), int.from_bytes(_word(reserves, 1), "big")
+
+    def apply_log(self, log) -> bool:
+        """Apply a Sync log; returns False when the pool must be re-read instead."""
+        if Web3.to_hex(log["topics"][0]).lower() == SYNC_TOPIC:
+            data = bytes(log["data"])
+            self.reserve0, self.reserve1 = int.from_bytes(_word(data, 0), "big"), int.from_bytes(_word(data, 1), "big")
+        return True
+
+    def _reserves(self, token_in: str) -> Tuple[int, int]:
+        return (self.reserve0, self.reserve1) if token_in == self.token0 else (self.reserve1, self.reserve0)
+
+    def amount_out(self, token_in: str, amount_in: int) -> int:
+        reserve_in, reserve_out = self._reserves(token_in)
+        amount_in_with_fee = amount_in * (10000 - self.fee_bps)
+        return amount_in_with_fee * reserve_out // (reserve_in * 10000 + amount_in_with_fee)
+
+    def amount_in(self, token_in: str, amount_out: int) -> int:
+        reserve_in, reserve_out = self._reserves(token_in)
+        if amount_out >= reserve_out:
+            raise ValueError(f"Pool {self.address} holds less than {amount_out}")
+        return reserve_in * amount_out * 10000 // ((reserve_out - amount_out) * (10000 - self.fee_bps)) + 1
+
+    def ladder_out(self, token_in: str, amounts: np.ndarray) -> np.ndarray:
+        reserve_in, reserve_out = self._reserves(token_in)
+        with_fee = amounts * ((10000 - self.fee_bps) / 10000)
+        return with_fee * float(reserve_out) / (float(reserve_in) + with_fee)
+
+
+class V3Pool:
+    """Concentrated-liquidity pool (Uniswap V3 style) quoted from slot0, liquidity and nearby ticks.
+
+    Initialized ticks are loaded from ``tick_words`` bitmap words either side
+    of the current tick. Swaps are simulated step by step with the pool's own
+    integer math; one that would leave the loaded range raises
+    InsufficientTickData rather than guess.
+    """
+
+    kind = "v3"
+
+    def __init__(self, address: str, tick_words: int = AMM_V3_TICK_WORDS):
+        self.address = address.lower()
+        self.tick_words = tick_words
+        self.token0: Optional[str] = None
+        self.token1: Optional[str] = None
+        self.fee = 0
+        self.tick_spacing = 1
+        self.sqrt_price_x96 = 0
+        self.tick = 0
+        self.liquidity = 0
+        self.ticks: List[int] = []
+        self.liquidity_net: Dict[int, int] = {}
+        self.min_loaded_tick = MIN_TICK
+        self.max_loaded_tick = MAX_TICK
+
+    def load(self, w3: Web3, block: int):
+        calls = [(self.address, SLOT0_SELECTOR), (self.address, LIQUIDITY_SELECTOR)]
+        if self.token0 is None:
+            calls += [(self.address, s) for s in (TOKEN0_SELECTOR, TOKEN1_SELECTOR, FEE_SELECTOR, TICK_SPACING_SELECTOR)]
+        results = aggregate3(w3, calls, block_identifier=block)
+        if not all(ok for ok, _ in results):
+            raise RuntimeError(f"Could not read V3 pool {self.address}")
+        if self.token0 is None:
+            self.token0, self.token1 = _address(results[2][1]), _address(results[3][1])
+            self.fee = int.from_bytes(results[4][1][:32], "big")
+            self.tick_spacing = decode(["int24"], results[5][1][:32])[0]
+        self.sqrt_price_x96, self.tick = decode(["uint160", "int24"], results[0][1][:64])
+        self.liquidity = int.from_bytes(results[1][1][:32], "big")
+
+        # Python's floor division matches the contract's rounding of negative ticks toward -inf
+        word = (self.tick // self.tick_spacing) >> 8
+        words = list(range(word - self.tick_words, word + self.tick_words + 1))
+        bitmaps = aggregate3(w3, [(self.address, TICK_BITMAP_SELECTOR + encode(["int16"], [w])) for w in words], block_identifier=block)
+        initialized = []
+        for w, (ok, data) in zip(words, bitmaps):
+            bitmap = int.from_bytes(data[:32], "big") if ok else 0
+            while bitmap:
+                bit = (bitmap & -bitmap).bit_length() - 1
+                initialized.append(((w << 8) + bit) * self.tick_spacing)
+                bitmap &= bitmap - 1
+        tick_data = aggregate3(w3, [(self.address, TICKS_SELECTOR + encode(["int24"], [t])) for t in initialized], block_identifier=block)
+        self.liquidity_net = {}
+        for t, (ok, data) in zip(initialized, tick_data):
+            if not ok:
+                raise RuntimeError(f"Could not read tick {t} of V3 pool {self.address}")
+            self.liquidity_net[t] = decode(["uint128", "int128"], data[:64])[1]
+        self.ticks = sorted(self.liquidity_net)
+        self.min_loaded_tick = max(MIN_TICK, (words[0] << 8) * self.tick_spacing)
+        self.max_loaded_tick = min(MAX_TICK, ((words[-1] + 1) << 8) * self.tick_spacing - 1)
+
+    def apply_log(self, log) -> bool:
+        """Apply a Swap log; Mint/Burn change tick liquidity, so they return False (re-read)."""
+        topic = Web3.to_hex(log["topics"][0]).lower()
+        if topic == V3_SWAP_TOPIC:
+            _, _, self.sqrt_price_x96, self.liquidity, self.tick = decode(
+                ["int256", "int256", "uint160", "uint128", "int24"], bytes(log["data"])
+            )
+            return not (self.tick < self.min_loaded_tick or self.tick > self.max_loaded_tick)
+        return topic not in (V3_MINT_TOPIC, V3_BURN_TOPIC)
+
+    def _next_tick(self, tick: int, zero_for_one: bool) -> Tuple[int, bool]:
+        """Next initialized tick in the swap direction, or the edge of the loaded range."""
+        if zero_for_one:
+            i = bisect.bisect_right(self.ticks, tick) - 1
+            return (self.ticks[i], True) if i >= 0 else (self.min_loaded_tick, False)
+        i = bisect.bisect_right(self.ticks, tick)
+        return (self.ticks[i], True) if i < len(self.ticks) else (self.max_loaded_tick, False)
+
+    def swap(self, zero_for_one: bool, amount_specified: int) -> Tuple[int, int]:
+        """Simulate a swap; positive ``amount_specified`` is exact input, negative exact output.
+
+        Returns (amount_in including fees, amount_out).
+        """
+        sqrt_limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+        remaining = amount_specified
+        amount_in = amount_out = 0
+        sqrt_price, tick, liquidity = self.sqrt_price_x96, self.tick, self.liquidity
+        while remaining != 0 and sqrt_price != sqrt_limit:
+            next_tick, initialized = self._next_tick(tick, zero_for_one)
+            sqrt_next = get_sqrt_ratio_at_tick(next_tick)
+            target = max(sqrt_next, sqrt_limit) if zero_for_one else min(sqrt_next, sqrt_limit)
+            sqrt_price, step_in, step_out, fee_amount = compute_swap_step(sqrt_price, target, liquidity, remaining, self.fee)
+            if remaining > 0:
+                remaining -= step_in + fee_amount
+            else:
+                remaining += step_out
+            amount_in += step_in + fee_amount
+            amount_out += step_out
+            if sqrt_price == sqrt_next:
+                if not initialized:
+                    raise InsufficientTickData(f"Swap leaves the ticks loaded for pool {self.address}")
+                net = self.liquidity_net[next_tick]
+                liquidity += -net if zero_for_one else net
+                tick = next_tick - 1 if zero_for_one else next_tick
+        return amount_in, amount_out
+
+    def amount_out(self, token_in: str, amount_in: int) -> int:
+        return self.swap(token_in == self.token0, amount_in)[1]
+
+    def amount_in(self, token_in: str, amount_out: int) -> int:
+        amount_in, filled = self.swap(token_in == self.token0, -amount_out)
+        if filled < amount_out:
+            raise ValueError(f"Pool {self.address} cannot fill {amount_out}")
+        return amount_in
+
+    def ladder_out(self, token_in: str, amounts: np.ndarray) -> np.ndarray:
+        """Outputs for many exact-input amounts at once (float64; NaN past the loaded ticks).
+
+        The loaded range is cut into constant-liquidity segments whose
+        cumulative input/output are computed once; each amount is then
+        placed in its segment with ``searchsorted`` and priced in closed form.
+        """
+        zero_for_one = token_in == self.token0
+        bounds = [t for t in self.ticks if (t <= self.tick if zero_for_one else t > self.tick)]
+        bounds = bounds[::-1] if zero_for_one else bounds
+        edge = self.min_loaded_tick if zero_for_one else self.max_loaded_tick
+        sqrt_bounds = np.array([get_sqrt_ratio_at_tick(t) / Q96 for t in bounds + [edge]])
+
+        liquidities = [self.liquidity]
+        for t in bounds:
+            net = self.liquidity_net[t]
+            liquidities.append(liquidities[-1] + (-net if zero_for_one else net))
+        liquidity = np.array(liquidities, dtype=float)
+        starts = np.concatenate(([self.sqrt_price_x96 / Q96], sqrt_bounds[:-1]))
+        if zero_for_one:
+            seg_in = liquidity * (1 / sqrt_bounds - 1 / starts)
+            seg_out = liquidity * (starts - sqrt_bounds)
+        else:
+            seg_in = liquidity * (sqrt_bounds - starts)
+            seg_out = liquidity * (1 / starts - 1 / sqrt_bounds)
+        cum_in = np.concatenate(([0.0], np.cumsum(seg_in)))
+        cum_out = np.concatenate(([0.0], np.cumsum(seg_out)))
+
+        net_in = np.asarray(amounts, dtype=float) * (1 - self.fee / FEE_DENOMINATOR)
+        segment = np.clip(np.searchsorted(cum_in, net_in, side="right") - 1, 0, len(starts) - 1)
+        rest = net_in - cum_in[segment]
+        s, l = starts[segment], liquidity[segment]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if zero_for_one:
+                s_next = l * s / (l + rest * s)
+                out = cum_out[segment] + l * (s - s_next)
+            else:
+                s_next = s + rest / l
+                out = cum_out[segment] + l * (1 / s - 1 / s_next)
+        out[net_in > cum_in[-1]] = np.nan
+        return out
+
+
+def parse_pools(spec: str) -> List:
+    pools = []
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        parts = entry.split(":")
+        if parts[0].lower() == "v2":
+            pools.append(V2Pool(parts[1], int(parts[2]) if len(parts) > 2 else 30))
+        elif parts[0].lower() == "v3":
+            pools.append(V3Pool(parts[1]))
+        else:
+            raise ValueError(f"Unknown pool type in AMM_POOLS entry {entry!r}")
+    return pools
+
+
+class AmmQuoter:
+    """In-process quotes from cached V2/V3 pool state, kept current from logs.
+
+    ``load`` reads every pool at one block (a few Multicall3 batches). A
+    background thread then fetches the pools' Sync/Swap/Mint/Burn logs each
+    refresh and applies them in order: Sync and Swap carry the new state,
+    while Mint/Burn (tick liquidity changed) or a swap past the loaded ticks
+    re-reads that pool. Falling more than ``max_log_range`` blocks behind
+    re-reads everything.
+
+    Quotes take the best pool for the pair and cost no RPC: exact-input and
+    exact-output are integer-exact, and ``ladder`` prices a whole array of
+    input amounts at once with NumPy. Refreshes fetch logs and re-read pools
+    on copies, outside the quote lock, and only take it to swap the updated
+    pools in, so quotes never wait on the network.
+    """
+
+    def __init__(self, w3: Web3, pools: Sequence, refresh_seconds: float = AMM_REFRESH_SECONDS, max_log_range: int = AMM_MAX_LOG_RANGE):
+        self.w3 = w3
+        self.pools = {pool.address: pool for pool in pools}
+        self.refresh_seconds = refresh_seconds
+        self.max_log_range = max_log_range
+        self._lock = threading.RLock()
+        # Serializes load/refresh (the network side) without blocking quotes
+        self._refresh_lock = threading.Lock()
+        self._synced_block: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _swap_in(self, updated: Dict, block: int):
+        with self._lock:
+            self.pools = {**self.pools, **updated}
+            self._synced_block = block
+
+    def load(self, block: Optional[int] = None):
+        with self._refresh_lock:
+            self._load(block)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="amm-quoter", daemon=True)
+            self._thread.start()
+
+    def _load(self, block: Optional[int] = None):
+        block = self.w3.eth.block_number if block is None else block
+        updated = {}
+        for address, pool in self.pools.items():
+            fresh = copy.copy(pool)
+            fresh.load(self.w3, block)
+            updated[address] = fresh
+        self._swap_in(updated, block)
+
+    def refresh(self):
+        with self._refresh_lock:
+            synced = self._synced_block
+            if synced is None:
+                return
+            head = self.w3.eth.block_number
+            if head <= synced:
+                return
+            if head - synced > self.max_log_range:
+                print(f"[AMM] {head - synced} blocks behind; re-reading pools")
+                self._load(head)
+                return
+            logs = self.w3.eth.get_logs({
+                "fromBlock": synced + 1,
+                "toBlock": head,
+                "address": [Web3.to_checksum_address(a) for a in self.pools],
+                "topics": [[SYNC_TOPIC, V3_SWAP_TOPIC, V3_MINT_TOPIC, V3_BURN_TOPIC]],
+            })
+            # Logs are applied to copies; pools being quoted are never modified in place
+            updated, stale = {}, set()
+            for log in sorted(logs, key=lambda l: (l["blockNumber"], l["logIndex"])):
+                address = log["address"].lower()
+                if address not in self.pools or address in stale:
+                    continue
+                if address not in updated:
+                    updated[address] = copy.copy(self.pools[address])
+                if not updated[address].apply_log(log):
+                    stale.add(address)
+            for address in stale:
+                updated[address].load(self.w3, head)
+            self._swap_in(updated, head)
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[AMM] Refresh error: {e}")
+
+    def pools_for(self, token_in: str, token_out: str) -> List:
+        pair = {_pool_token(token_in), _pool_token(token_out)}
+        return [p for p in self.pools.values() if {p.token0, p.token1} == pair]
+
+    def quote_exact_in(self, token_in: str, token_out: str, amount_in: int) -> Optional[Tuple[int, str]]:
+        """(best amount out, pool address), or None if no loaded pool can fill it."""
+        token_in = _pool_token(token_in)
+        best = None
+        with self._lock:
+            for pool in self.pools_for(token_in, token_out):
+                try:
+                    out = pool.amount_out(token_in, amount_in)
+                except (InsufficientTickData, ValueError, ZeroDivisionError):
+                    continue
+                if best is None or out > best[0]:
+                    best = (out, pool.address)
+        return best
+
+    def quote_exact_out(self, token_in: str, token_out: str, amount_out: int) -> Optional[Tuple[int, str]]:
+        """(least amount in, pool address) to receive exactly ``amount_out``, or None."""
+        token_in = _pool_token(token_in)
+        best = None
+        with self._lock:
+            for pool in self.pools_for(token_in, token_out):
+                try:
+                    needed = pool.amount_in(token_in, amount_out)
+                except (InsufficientTickData, ValueError, ZeroDivisionError):
+                    continue
+                if best is None or needed < best[0]:
+                    best = (needed, pool.address)
+        return best
+
+    def ladder(self, token_in: str, token_out: str, amounts: Sequence) -> np.ndarray:
+        """Best output across pools for each input amount (float64; NaN where no pool can fill)."""
+        token_in = _pool_token(token_in)
+        amounts = np.asarray(amounts, dtype=float)
+        best = np.full(amounts.shape, np.nan)
+        with self._lock:
+            for pool in self.pools_for(token_in, token_out):
+                best = np.fmax(best, pool.ladder_out(token_in, amounts))
+        return best
+
+
+_QUOTERS: Dict[int, AmmQuoter] = {}
+_QUOTERS_LOCK = threading.Lock()
+
+
+def get_amm_quoter(w3: Web3) -> Optional[AmmQuoter]:
+    """The quoter over the AMM_POOLS pools for this Web3 instance, or None when none are configured."""
+    if not AMM_POOLS.strip():
+        return None
+    with _QUOTERS_LOCK:
+        quoter = _QUOTERS.get(id(w3))
+        if quoter is None or quoter.w3 is not w3:
+            quoter = AmmQuoter(w3, parse_pools(AMM_POOLS))
+            quoter.load()
+            _QUOTERS[id(w3)] = quoter
+        return quoter
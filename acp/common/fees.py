@@ -0,0 +1,107 @@
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from web3 import Web3
+
+
+# Urgency name -> priority-fee percentile of recent blocks
+URGENCY_PERCENTILES = {"low": 10, "medium": 50, "high": 90}
+DEFAULT_URGENCY = os.getenv("FEE_URGENCY", "medium")
+FEE_HISTORY_BLOCKS = int(os.getenv("FEE_HISTORY_BLOCKS", "20"))
+# Base produces a block every 2 seconds; refreshing faster than that only repeats the same answer
+FEE_REFRESH_SECONDS = float(os.getenv("FEE_REFRESH_SECONDS", "2"))
+MIN_PRIORITY_FEE_WEI = int(os.getenv("MIN_PRIORITY_FEE_WEI", "1000000"))  # 0.001 gwei
+
+
+class FeeOracle:
+    """EIP-1559 fee suggestions from a rolling ``eth_feeHistory`` window.
+
+    The oracle keeps the priority-fee percentiles of the last ``window``
+    blocks and the next block's base fee. It refreshes at most once per
+    block interval, fetching only the blocks it has not seen, so signing a
+    transaction normally costs no fee RPC at all.
+
+    ``fees(urgency)`` returns ``maxPriorityFeePerGas`` (median of the
+    urgency's percentile across the window, floored at ``min_priority_fee``)
+    and ``maxFeePerGas`` (twice the next base fee plus the tip, which stays
+    valid through several full blocks of base-fee increases).
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        window: int = FEE_HISTORY_BLOCKS,
+        refresh_seconds: float = FEE_REFRESH_SECONDS,
+        min_priority_fee: int = MIN_PRIORITY_FEE_WEI,
+    ):
+        self.w3 = w3
+        self.window = window
+        self.refresh_seconds = refresh_seconds
+        self.min_priority_fee = min_priority_fee
+        self._percentiles = sorted(set(URGENCY_PERCENTILES.values()))
+        self._lock = threading.Lock()
+        # (block number, [reward per percentile])
+        self._rewards: Deque[Tuple[int, list]] = deque(maxlen=window)
+        self._next_base_fee: Optional[int] = None
+        self._newest_block: Optional[int] = None
+        self._refreshed_at = 0.0
+
+    def _refresh(self):
+        if self._newest_block is None:
+            block_count = self.window
+        else:
+            elapsed = time.monotonic() - self._refreshed_at
+            block_count = max(1, min(self.window, int(elapsed / max(self.refresh_seconds, 0.001)) + 1))
+        history = self.w3.eth.fee_history(block_count, "latest", self._percentiles)
+        oldest = history["oldestBlock"]
+        for i, rewards in enumerate(history.get("reward") or []):
+            number = oldest + i
+            if self._newest_block is not None and number <= self._newest_block:
+                continue
+            self._rewards.append((number, list(rewards)))
+            self._newest_block = number
+        # baseFeePerGas has one extra entry: the base fee of the block after the newest one
+        self._next_base_fee = history["baseFeePerGas"][-1]
+        self._refreshed_at = time.monotonic()
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if self._next_base_fee is None or time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+                self._refresh()
+
+    def fees(self, urgency: str = DEFAULT_URGENCY) -> Dict[str, int]:
+        if urgency not in URGENCY_PERCENTILES:
+            raise ValueError(f"Unknown fee urgency '{urgency}' (expected one of {sorted(URGENCY_PERCENTILES)})")
+        self._ensure_fresh()
+        column = self._percentiles.index(URGENCY_PERCENTILES[urgency])
+        with self._lock:
+            tips = [rewards[column] for _, rewards in self._rewards]
+            base_fee = self._next_base_fee
+        priority = max(int(statistics.median(tips)) if tips else 0, self.min_priority_fee)
+        return {
+            "maxPriorityFeePerGas": priority,
+            "maxFeePerGas": 2 * base_fee + priority,
+        }
+
+
+_ORACLES: Dict[int, FeeOracle] = {}
+_ORACLES_LOCK = threading.Lock()
+
+
+def get_fee_oracle(w3: Web3) -> FeeOracle:
+    """One oracle per Web3 instance; pooled instances are process-wide, so this is too."""
+    with _ORACLES_LOCK:
+        oracle = _ORACLES.get(id(w3))
+        if oracle is None or oracle.w3 is not w3:
+            oracle = FeeOracle(w3)
+            _ORACLES[id(w3)] = oracle
+        return oracle
+
+
+def fee_fields(w3: Web3, urgency: str = DEFAULT_URGENCY) -> Dict[str, int]:
+    """EIP-1559 fee fields to merge into a transaction dict."""
+    return get_fee_oracle(w3).fees(urgency)
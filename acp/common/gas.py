@@ -0,0 +1,132 @@
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from web3 import Web3
+
+
+DEFAULT_CACHE_PATH = os.getenv("ACP_GAS_CACHE", "/tmp/acp_gas_cache.json")
+GAS_LIMIT_PERCENTILE = float(os.getenv("GAS_LIMIT_PERCENTILE", "95"))
+GAS_LIMIT_MARGIN = float(os.getenv("GAS_LIMIT_MARGIN", "1.2"))
+# Observations older than this no longer count as a cache hit (router upgrades, new pools)
+GAS_CACHE_STALE_SECONDS = float(os.getenv("GAS_CACHE_STALE_SECONDS", "86400"))
+MAX_SAMPLES = 50
+
+
+def _percentile(values: Sequence[int], pct: float) -> int:
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def route_key(tx: Dict, token_pair: Optional[Tuple[str, str]] = None) -> str:
+    """Cache key: router (tx target), function selector, and the token pair if known."""
+    data = tx.get("data") or "0x"
+    data = data if isinstance(data, str) else Web3.to_hex(data)
+    selector = data[:10].lower()
+    sell, buy = token_pair if token_pair else ("*", "*")
+    return f"{tx['to'].lower()}|{selector}|{sell.lower()}|{buy.lower()}"
+
+
+class GasEstimator:
+    """Gas limits learned from our own receipts instead of fixed fallbacks.
+
+    Every successful receipt's ``gasUsed`` is recorded under its route key
+    (router, selector, token pair). A later transaction on the same route
+    gets ``percentile(samples) * margin`` without any RPC. ``eth_estimateGas``
+    is only called when a route has no samples or its newest one is older
+    than ``stale_after``; that estimate is stored as a sample too. If the
+    estimate fails (e.g. a swap sent right behind its not-yet-mined approval
+    reverts in simulation) the caller's fallback is used. Samples persist to
+    a JSON file so a restart keeps what was learned.
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        percentile: float = GAS_LIMIT_PERCENTILE,
+        margin: float = GAS_LIMIT_MARGIN,
+        stale_after: float = GAS_CACHE_STALE_SECONDS,
+    ):
+        self.w3 = w3
+        self.cache_path = cache_path
+        self.percentile = percentile
+        self.margin = margin
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._samples: Dict[str, list] = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, list]:
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"[GAS] Warning: ignoring unreadable gas cache {self.cache_path}: {e}")
+            return {}
+
+    def _save_cache(self):
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(self._samples, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"[GAS] Warning: failed to persist gas cache: {e}")
+
+    def _add_sample(self, key: str, gas: int):
+        with self._lock:
+            samples = self._samples.setdefault(key, [])
+            samples.append([int(gas), time.time()])
+            del samples[:-MAX_SAMPLES]
+            self._save_cache()
+
+    def estimate(self, tx: Dict, token_pair: Optional[Tuple[str, str]] = None, fallback: int = 200000) -> int:
+        """Gas limit for ``tx`` (which should carry ``from``, ``to``, ``data`` and ``value``)."""
+        key = route_key(tx, token_pair)
+        with self._lock:
+            samples = list(self._samples.get(key, []))
+        if samples and time.time() - max(ts for _, ts in samples) < self.stale_after:
+            return int(_percentile([gas for gas, _ in samples], self.percentile) * self.margin)
+
+        call = {k: tx[k] for k in ("from", "to", "data", "value") if k in tx}
+        try:
+            estimated = self.w3.eth.estimate_gas(call)
+        except Exception as e:
+            print(f"[GAS] estimateGas failed for {key} ({e}); using fallback {fallback}")
+            return fallback
+        self._add_sample(key, estimated)
+        return int(estimated * self.margin)
+
+    def record(self, tx: Dict, receipt, token_pair: Optional[Tuple[str, str]] = None):
+        # Reverted receipts say nothing useful about the route (out-of-gas burns the whole limit)
+        if receipt.status == 1:
+            self._add_sample(route_key(tx, token_pair), receipt.gasUsed)
+
+    def record_when_mined(self, handle, tx: Dict, token_pair: Optional[Tuple[str, str]] = None):
+        """Record ``handle``'s receipt (a receipts.TxHandle) once it resolves."""
+        def _record(h):
+            if h.exception() is None:
+                self.record(tx, h.receipt(), token_pair)
+        handle.add_done_callback(_record)
+
+
+_ESTIMATORS: Dict[int, GasEstimator] = {}
+_ESTIMATORS_LOCK = threading.Lock()
+
+
+def get_gas_estimator(w3: Web3) -> GasEstimator:
+    """One estimator per Web3 instance; pooled instances are process-wide, so this is too."""
+    with _ESTIMATORS_LOCK:
+        estimator = _ESTIMATORS.get(id(w3))
+        if estimator is None or estimator.w3 is not w3:
+            estimator = GasEstimator(w3)
+            _ESTIMATORS[id(w3)] = estimator
+        return estimator
@@ -0,0 +1,60 @@
+from typing import List, Optional, Tuple, Union
+
+from eth_abi import decode, encode
+from web3 import Web3
+
+
+NATIVE_TOKEN = "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee"
+
+# KyberSwap MetaAggregationRouterV2 entry points
+SWAP_SELECTOR = bytes.fromhex("e21fd0e9")              # swap(SwapExecutionParams)
+SWAP_SIMPLE_MODE_SELECTOR = bytes.fromhex("8af033fb")  # swapSimpleMode(address,SwapDescriptionV2,bytes,bytes)
+
+SWAP_DESCRIPTION = "(address,address,address[],uint256[],address[],uint256[],address,uint256,uint256,uint256,bytes)"
+SWAP_EXECUTION_PARAMS = f"(address,address,bytes,{SWAP_DESCRIPTION},bytes)"
+# Field positions inside SwapDescriptionV2
+DESC_SRC_TOKEN, DESC_DST_TOKEN, DESC_DST_RECEIVER, DESC_AMOUNT, DESC_MIN_RETURN, DESC_FLAGS, DESC_PERMIT = 0, 1, 6, 7, 8, 9, 10
+# SwapDescriptionV2 flag bits; either one can make the router send ETH back to msg.sender
+FLAG_PARTIAL_FILL = 0x01
+FLAG_REQUIRES_EXTRA_ETH = 0x02
+
+# Swapped(address sender, address srcToken, address dstToken, address dstReceiver, uint256 spentAmount, uint256 returnAmount)
+SWAPPED_TOPIC = "0xd6d4f5681c246c9f42c203e287975af1601f8df8035a9251f79aab5c8f09e2f8"
+SWAPPED_DATA_TYPES = ["address", "address", "address", "address", "uint256", "uint256"]
+
+
+def decode_swap(data: Union[str, bytes]) -> Optional[Tuple[bytes, List, List]]:
+    """(selector, decoded args, mutable swap description) for a router swap call, or None for anything else."""
+    data = bytes.fromhex(data[2:]) if isinstance(data, str) else bytes(data)
+    selector, body = data[:4], data[4:]
+    if selector == SWAP_SELECTOR:
+        args = list(decode([SWAP_EXECUTION_PARAMS], body))
+        return selector, args, list(args[0][3])
+    if selector == SWAP_SIMPLE_MODE_SELECTOR:
+        args = list(decode(["address", SWAP_DESCRIPTION, "bytes", "bytes"], body))
+        return selector, args, list(args[1])
+    return None
+
+
+def encode_swap(selector: bytes, args: List, desc: List) -> bytes:
+    """Re-encode a call from ``decode_swap`` with an edited swap description."""
+    if selector == SWAP_SELECTOR:
+        params = list(args[0])
+        params[3] = tuple(desc)
+        return selector + encode([SWAP_EXECUTION_PARAMS], [tuple(params)])
+    return selector + encode(["address", SWAP_DESCRIPTION, "bytes", "bytes"], [args[0], tuple(desc), args[2], args[3]])
+
+
+def decode_swapped(log) -> Optional[dict]:
+    """Fields of a router ``Swapped`` event log, or None for any other log."""
+    if not log["topics"] or Web3.to_hex(log["topics"][0]).lower() != SWAPPED_TOPIC:
+        return None
+    sender, src, dst, receiver, spent, returned = decode(SWAPPED_DATA_TYPES, bytes(log["data"]))
+    return {
+        "sender": sender.lower(),
+        "srcToken": src.lower(),
+        "dstToken": dst.lower(),
+        "dstReceiver": receiver.lower(),
+        "spentAmount": spent,
+        "returnAmount": returned,
+    }
@@ -0,0 +1,105 @@
+from typing import List, Sequence, Tuple
+
+from web3 import Web3
+
+
+# Multicall3 is deployed at the same address on Base and every other major EVM chain
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    },
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "value", "type": "uint256"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3Value",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "addr", "type": "address"}],
+        "name": "getEthBalance",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+# Default number of sub-calls per aggregate3 request; large batches can exceed
+# provider eth_call gas/size limits.
+DEFAULT_CHUNK_SIZE = 200
+
+
+def multicall_contract(w3: Web3):
+    return w3.eth.contract(address=Web3.to_checksum_address(MULTICALL3_ADDRESS), abi=MULTICALL3_ABI)
+
+
+def aggregate3(
+    w3: Web3,
+    calls: Sequence[Tuple[str, bytes]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    block_identifier="latest",
+) -> List[Tuple[bool, bytes]]:
+    """Run many read-only calls through Multicall3.aggregate3.
+
+    ``calls`` is a sequence of (target address, calldata) pairs. Every call is
+    sent with allowFailure=True, so one reverting target does not sink the
+    batch. Returns (success, returnData) in the same order as ``calls``.
+    """
+    if not calls:
+        return []
+    contract = multicall_contract(w3)
+    size = max(1, chunk_size)
+    results: List[Tuple[bool, bytes]] = []
+    for start in range(0, len(calls), size):
+        chunk = [
+            (Web3.to_checksum_address(target), True, bytes(data))
+            for target, data in calls[start:start + size]
+        ]
+        out = contract.functions.aggregate3(chunk).call(block_identifier=block_identifier)
+        results.extend((bool(ok), bytes(ret)) for ok, ret in out)
+    return results
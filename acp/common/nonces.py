@@ -0,0 +1,188 @@
+import heapq
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+from acp.common.fees import fee_fields
+
+
+_NONCE_ERRORS = ("nonce too low", "nonce too high", "replacement transaction underpriced")
+# This exact signed transaction is already in the node's pool (e.g. a retried RPC call that went through)
+_ALREADY_KNOWN = ("already known", "known transaction")
+
+
+class _WalletNonces:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next: Optional[int] = None
+        self.released: List[int] = []
+
+
+class NonceManager:
+    """Hands out nonces per wallet from local state instead of asking the node.
+
+    The first allocation for a wallet syncs from ``get_transaction_count(...,
+    "pending")``; after that nonces are counted locally, so several
+    transactions from one wallet (approval then swap, or many jobs' swaps) can
+    be signed and broadcast back to back without waiting for each to be mined.
+
+    A nonce whose transaction never reached the node is ``release``d and
+    handed out again first, which closes the gap it would otherwise leave.
+    Node errors about nonces trigger a resync; ``find_gaps`` compares local
+    state with the node, and ``fill_gaps`` plugs any remaining holes with
+    zero-value self-transfers so later transactions are not stuck behind them.
+    """
+
+    def __init__(self, w3: Web3):
+        self.w3 = w3
+        self._wallets: Dict[str, _WalletNonces] = {}
+        self._lock = threading.Lock()
+
+    def _wallet(self, address: str) -> _WalletNonces:
+        key = address.lower()
+        with self._lock:
+            state = self._wallets.get(key)
+            if state is None:
+                state = _WalletNonces()
+                self._wallets[key] = state
+            return state
+
+    def next_nonce(self, address: str) -> int:
+        state = self._wallet(address)
+        with state.lock:
+            if state.released:
+                return heapq.heappop(state.released)
+            if state.next is None:
+                state.next = self.w3.eth.get_transaction_count(Web3.to_checksum_address(address), "pending")
+            nonce = state.next
+            state.next += 1
+            return nonce
+
+    def release(self, address: str, nonce: int):
+        """Return a nonce whose transaction was never broadcast."""
+        state = self._wallet(address)
+        with state.lock:
+            if state.next is None or nonce >= state.next or nonce in state.released:
+                return
+            heapq.heappush(state.released, nonce)
+            # Released nonces at the top of the range leave no gap; just hand them out again later
+            while state.released and max(state.released) == state.next - 1:
+                state.released.remove(state.next - 1)
+                state.next -= 1
+            heapq.heapify(state.released)
+
+    def resync(self, address: str):
+        state = self._wallet(address)
+        with state.lock:
+            state.next = self.w3.eth.get_transaction_count(Web3.to_checksum_address(address), "pending")
+            state.released = [n for n in state.released if n < state.next]
+            heapq.heapify(state.released)
+
+    def handle_send_error(self, address: str, nonce: int, error: Exception) -> bool:
+        """Recover local state after send_raw_transaction failed for ``nonce``.
+
+        Returns True if the error was a nonce mismatch (state was resynced and
+        the transaction is worth retrying with a fresh nonce).
+        """
+        message = str(error).lower()
+        if any(marker in message for marker in _NONCE_ERRORS):
+            # Our view drifted from the node (another sender, dropped tx, restart); start over
+            self.resync(address)
+            return True
+        self.release(address, nonce)
+        return False
+
+    def find_gaps(self, address: str) -> List[int]:
+        """Released nonces below our local high-water mark that the node has no transaction for.
+
+        Only released nonces count: the node's pending count can also stop at a
+        nonce that is allocated and in flight but has not reached this node yet,
+        and self-sending there would race or replace the real transaction.
+        """
+        state = self._wallet(address)
+        with state.lock:
+            if state.next is None:
+                return []
+            pending = self.w3.eth.get_transaction_count(Web3.to_checksum_address(address), "pending")
+            if pending >= state.next:
+                return []
+            return sorted(n for n in state.released if n >= pending)
+
+    def fill_gaps(self, address: str, private_key: str, fees: Optional[Dict] = None) -> List[str]:
+        """Send zero-value self-transfers for every gap. Returns their tx hashes."""
+        hashes = []
+        checksum = Web3.to_checksum_address(address)
+        for nonce in self.find_gaps(address):
+            state = self._wallet(address)
+            with state.lock:
+                # Handed out again since find_gaps; its new transaction closes the gap
+                if nonce not in state.released:
+                    continue
+                state.released.remove(nonce)
+                heapq.heapify(state.released)
+            tx = {
+                "to": checksum,
+                "value": 0,
+                "gas": 21000,
+                "nonce": nonce,
+                "chainId": self.w3.eth.chain_id,
+                **(fees or fee_fields(self.w3)),
+            }
+            signed = self.w3.eth.account.sign_transaction(tx, private_key)
+            tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+            print(f"[NONCE] Filled nonce gap {nonce} for {checksum}: {tx_hash.hex()}")
+            hashes.append(tx_hash.hex())
+        return hashes
+
+
+_MANAGERS: Dict[int, NonceManager] = {}
+_MANAGERS_LOCK = threading.Lock()
+
+
+def get_nonce_manager(w3: Web3) -> NonceManager:
+    """One manager per Web3 instance; pooled instances are process-wide, so this is too."""
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.get(id(w3))
+        if manager is None or manager.w3 is not w3:
+            manager = NonceManager(w3)
+            _MANAGERS[id(w3)] = manager
+        return manager
+
+
+def send_with_nonce(w3: Web3, tx: Dict, private_key: str) -> Tuple[bytes, Dict]:
+    """Fill in a locally managed nonce, sign and broadcast ``tx``.
+
+    Returns (tx hash, the transaction as sent, including its nonce). Does not
+    wait for the receipt, so callers can submit several transactions from
+    one wallet back to back. "Already known" means this very transaction is
+    in the pool, so it counts as sent. A nonce mismatch resyncs and retries
+    once; any other failure frees the nonce and fills the gap it leaves
+    behind transactions that were already sent.
+    """
+    account = w3.eth.account.from_key(private_key)
+    manager = get_nonce_manager(w3)
+    for attempt in range(2):
+        nonce = manager.next_nonce(account.address)
+        sent = {**tx, "nonce": nonce}
+        signed = None
+        try:
+            signed = w3.eth.account.sign_transaction(sent, private_key)
+            return w3.eth.send_raw_transaction(signed.raw_transaction), sent
+        except Exception as e:
+            if signed is not None and any(marker in str(e).lower() for marker in _ALREADY_KNOWN):
+                # Re-signing at a new nonce here would broadcast the same swap or approval twice
+                return signed.hash, sent
+            if manager.handle_send_error(account.address, nonce, e) and attempt == 0:
+                print(f"[NONCE] Nonce {nonce} rejected for {account.address} ({e}); resynced, retrying")
+                continue
+            try:
+                manager.fill_gaps(account.address, private_key)
+            except Exception as fill_error:
+                print(f"[NONCE] Warning: failed to fill nonce gaps for {account.address}: {fill_error}")
+            raise
+
+
+def sign_and_send(w3: Web3, tx: Dict, private_key: str):
+    """Like ``send_with_nonce`` but returns only the tx hash."""
+    return send_with_nonce(w3, tx, private_key)[0]
@@ -0,0 +1,165 @@
+import time
+from typing import Dict, Optional
+
+from eth_abi import decode, encode
+from eth_account.messages import encode_typed_data
+from web3 import Web3
+
+from acp.common.allowances import get_allowance_cache
+from acp.common.kyber import DESC_AMOUNT, DESC_PERMIT, DESC_SRC_TOKEN, NATIVE_TOKEN, decode_swap, encode_swap
+from acp.common.multicall import aggregate3
+
+
+# Canonical Uniswap Permit2 deployment (same address on every chain)
+PERMIT2_ADDRESS = "0x000000000022D473030F116dDEE9F6B43aC78BA3"
+
+DOMAIN_SEPARATOR_SELECTOR = bytes.fromhex("3644e515")  # DOMAIN_SEPARATOR()
+NONCES_SELECTOR = bytes.fromhex("7ecebe00")            # nonces(address)
+NAME_SELECTOR = bytes.fromhex("06fdde03")              # name()
+VERSION_SELECTOR = bytes.fromhex("54fd4d50")           # version()
+
+_DOMAIN_TYPEHASH = Web3.keccak(text="EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
+
+PERMIT_DEADLINE_SECONDS = 1200
+
+
+def _decode_string(data: bytes) -> Optional[str]:
+    try:
+        return decode(["string"], data)[0]
+    except Exception:
+        return None
+
+
+def _domain_separator(name: str, version: str, chain_id: int, token: str) -> bytes:
+    return Web3.keccak(encode(
+        ["bytes32", "bytes32", "bytes32", "uint256", "address"],
+        [_DOMAIN_TYPEHASH, Web3.keccak(text=name), Web3.keccak(text=version), chain_id, Web3.to_checksum_address(token)],
+    ))
+
+
+# token -> {"name", "version"} or None when the token has no usable EIP-2612 permit
+_DOMAINS: Dict[str, Optional[Dict]] = {}
+
+
+def detect_permit(w3: Web3, token: str, owner: str) -> Optional[Dict]:
+    """EIP-712 domain and current permit nonce of ``owner`` if ``token`` supports EIP-2612.
+
+    Support means ``DOMAIN_SEPARATOR()`` and ``nonces(owner)`` both answer and
+    the separator matches one we can rebuild from ``name()`` and ``version()``
+    (or the common versions "1"/"2" when ``version()`` is missing), so a
+    signature made here is guaranteed to verify on-chain. All four reads go
+    out in one Multicall3 batch; the domain is cached per token.
+    """
+    key = token.lower()
+    if key in _DOMAINS and _DOMAINS[key] is None:
+        return None
+    owner_arg = encode(["address"], [Web3.to_checksum_address(owner)])
+    calls = [
+        (token, DOMAIN_SEPARATOR_SELECTOR),
+        (token, NONCES_SELECTOR + owner_arg),
+        (token, NAME_SELECTOR),
+        (token, VERSION_SELECTOR),
+    ]
+    (sep_ok, sep), (nonce_ok, nonce), (name_ok, name), (version_ok, version) = aggregate3(w3, calls)
+    if not (sep_ok and nonce_ok and len(sep) >= 32 and len(nonce) >= 32):
+        _DOMAINS[key] = None
+        return None
+
+    domain = _DOMAINS.get(key)
+    if domain is None:
+        name = _decode_string(name) if name_ok else None
+        versions = [_decode_string(version)] if version_ok and _decode_string(version) else ["1", "2"]
+        chain_id = w3.eth.chain_id
+        for candidate in versions:
+            if name is not None and _domain_separator(name, candidate, chain_id, token) == sep[:32]:
+                domain = {"name": name, "version": candidate, "chainId": chain_id}
+                break
+        _DOMAINS[key] = domain
+        if domain is None:
+            return None
+    return {**domain, "nonce": int.from_bytes(nonce[:32], "big")}
+
+
+def permit2_allowance(w3: Web3, token: str, owner: str) -> int:
+    """How much of ``token`` Permit2 may already pull from ``owner``."""
+    return get_allowance_cache(w3).allowance(owner, token, PERMIT2_ADDRESS)
+
+
+def sign_permit(w3: Web3, token: str, private_key: str, spender: str, value: int, deadline: int, domain: Dict):
+    """EIP-2612 Permit signature. Returns (v, r, s)."""
+    account = w3.eth.account.from_key(private_key)
+    typed = {
+        "types": {
+            "EIP712Domain": [
+                {"name": "name", "type": "string"},
+                {"name": "version", "type": "string"},
+                {"name": "chainId", "type": "uint256"},
+                {"name": "verifyingContract", "type": "address"},
+            ],
+            "Permit": [
+                {"name": "owner", "type": "address"},
+                {"name": "spender", "type": "address"},
+                {"name": "value", "type": "uint256"},
+                {"name": "nonce", "type": "uint256"},
+                {"name": "deadline", "type": "uint256"},
+            ],
+        },
+        "primaryType": "Permit",
+        "domain": {
+            "name": domain["name"],
+            "version": domain["version"],
+            "chainId": domain["chainId"],
+            "verifyingContract": Web3.to_checksum_address(token),
+        },
+        "message": {
+            "owner": account.address,
+            "spender": Web3.to_checksum_address(spender),
+            "value": value,
+            "nonce": domain["nonce"],
+            "deadline": deadline,
+        },
+    }
+    signed = account.sign_message(encode_typed_data(full_message=typed))
+    return signed.v, signed.r.to_bytes(32, "big"), signed.s.to_bytes(32, "big")
+
+
+def with_permit(w3: Web3, tx_data: Dict, private_key: str, deadline_seconds: int = PERMIT_DEADLINE_SECONDS) -> Optional[Dict]:
+    """Swap ``tx_data`` rewritten to carry an EIP-2612 permit, or None if the approval is still needed.
+
+    Applies to KyberSwap router swaps of a permit-capable token: the permit
+    (owner = the signing wallet, spender = the router, value = the swap
+    amount) goes into the swap description, so the router redeems it in the
+    same transaction and no separate approval has to be mined first. Native
+    sells, other routers and tokens without EIP-2612 return None. Permit2
+    allowances are reported but not used, since this router pulls funds with
+    a plain ``transferFrom``.
+    """
+    try:
+        decoded = decode_swap(tx_data.get("data") or "0x")
+    except Exception as e:
+        print(f"[PERMIT] Could not decode swap calldata: {e}")
+        return None
+    if decoded is None:
+        return None
+    selector, args, desc = decoded
+    token = desc[DESC_SRC_TOKEN]
+    if token.lower() == NATIVE_TOKEN or desc[DESC_PERMIT]:
+        return None
+
+    owner = w3.eth.account.from_key(private_key).address
+    domain = detect_permit(w3, token, owner)
+    if domain is None:
+        try:
+            if permit2_allowance(w3, token, owner) >= desc[DESC_AMOUNT]:
+                print(f"[PERMIT] {token} has a Permit2 allowance, but the router needs a direct approval")
+        except Exception:
+            pass
+        return None
+
+    deadline = int(time.time()) + deadline_seconds
+    v, r, s = sign_permit(w3, token, private_key, tx_data["to"], desc[DESC_AMOUNT], deadline, domain)
+    desc[DESC_PERMIT] = encode(
+        ["uint256", "uint256", "uint8", "bytes32", "bytes32"], [desc[DESC_AMOUNT], deadline, v, r, s]
+    )
+    print(f"[PERMIT] Signed EIP-2612 permit for {token}; skipping approval transaction")
+    return {**tx_data, "data": Web3.to_hex(encode_swap(selector, args, desc))}
@@ -0,0 +1,259 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+from web3 import Web3
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+
+DEFAULT_TIMEOUT = 300
+# Threads for continuations that block (ACP deliver/evaluate calls) once a receipt is in
+TX_CONTINUATION_WORKERS = int(os.getenv("TX_CONTINUATION_WORKERS", "4"))
+
+
+def _hex(tx_hash) -> str:
+    return Web3.to_hex(tx_hash).lower() if not isinstance(tx_hash, str) else tx_hash.lower()
+
+
+class TxHandle:
+    """A sent transaction whose receipt is delivered by the ReceiptTracker.
+
+    Poll it with ``done()``, block on ``receipt(timeout)``, attach a
+    continuation with ``add_done_callback(fn)`` (``fn`` receives the handle)
+    or ``await`` it from asyncio code. A transaction that is not mined before
+    its deadline fails with web3's ``TimeExhausted``.
+    """
+
+    def __init__(self, tx_hash: str, future: Future):
+        self.tx_hash = tx_hash
+        self._future = future
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def receipt(self, timeout: Optional[float] = None):
+        return self._future.result(timeout)
+
+    def exception(self, timeout: Optional[float] = None):
+        return self._future.exception(timeout)
+
+    def succeeded(self) -> bool:
+        """True once the transaction is mined with status 1."""
+        if not self._future.done() or self._future.exception() is not None:
+            return False
+        return self._future.result().status == 1
+
+    def add_done_callback(self, fn: Callable[["TxHandle"], None]):
+        """Run ``fn(handle)`` once resolved, on the tracker thread (or now if already done)."""
+        self._future.add_done_callback(lambda _: fn(self))
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+
+class _Pending:
+    __slots__ = ("future", "deadline", "last_checked")
+
+    def __init__(self, future: Future, deadline: float):
+        self.future = future
+        self.deadline = deadline
+        self.last_checked = time.monotonic()
+
+
+class ReceiptTracker:
+    """Resolves receipts for many in-flight transactions from one background thread.
+
+    Instead of every sender blocking in ``wait_for_transaction_receipt``, the
+    tracker follows new blocks: each block's transaction hashes are matched
+    against everything pending and, on a hit, the whole block's receipts are
+    fetched in one ``eth_getBlockReceipts`` call (falling back to one
+    ``eth_getTransactionReceipt`` per hit on nodes without it). Hashes missed
+    that way (tracked late, skipped blocks, reorgs) are rechecked directly
+    every ``recheck_after`` seconds. The thread only polls while something is
+    pending.
+
+    Done-callbacks run on the tracker thread; keep them short and wrap
+    anything that blocks (SDK calls, further sends) in ``off_tracker``.
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        poll_interval: float = 1.0,
+        recheck_after: float = 30.0,
+        max_catch_up: int = 20,
+    ):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.recheck_after = recheck_after
+        self.max_catch_up = max_catch_up
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _Pending] = {}
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_block: Optional[int] = None
+        self._block_receipts_supported = True
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def track(self, tx_hash, timeout: float = DEFAULT_TIMEOUT) -> TxHandle:
+        key = _hex(tx_hash)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = _Pending(Future(), time.monotonic() + timeout)
+                self._pending[key] = pending
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="receipt-tracker", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return TxHandle(key, pending.future)
+
+    def track_many(self, tx_hashes: Iterable, timeout: float = DEFAULT_TIMEOUT):
+        return [self.track(h, timeout) for h in tx_hashes]
+
+    def _resolve(self, key: str, receipt=None, error: Optional[BaseException] = None):
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        if error is not None:
+            pending.future.set_exception(error)
+        else:
+            pending.future.set_result(receipt)
+
+    def _block_receipts(self, block_number: int, hits):
+        if self._block_receipts_supported:
+            try:
+                return {_hex(r["transactionHash"]): r for r in self.w3.eth.get_block_receipts(block_number)}
+            except Exception as e:
+                print(f"[RECEIPTS] eth_getBlockReceipts unavailable ({e}); fetching receipts individually")
+                self._block_receipts_supported = False
+        return {h: self.w3.eth.get_transaction_receipt(h) for h in hits}
+
+    def _process_block(self, block_number: int):
+        block = self.w3.eth.get_block(block_number)
+        with self._lock:
+            hits = {_hex(h) for h in block["transactions"]} & set(self._pending)
+        if not hits:
+            return
+        receipts = self._block_receipts(block_number, hits)
+        for key in hits:
+            if key in receipts:
+                self._resolve(key, receipts[key])
+
+    def _recheck_stragglers(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [k for k, p in self._pending.items() if now - p.last_checked >= self.recheck_after]
+            for key in due:
+                self._pending[key].last_checked = now
+        for key in due:
+            try:
+                self._resolve(key, self.w3.eth.get_transaction_receipt(key))
+            except TransactionNotFound:
+                continue
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, p in self._pending.items() if now >= p.deadline]
+        for key in expired:
+            self._resolve(key, error=TimeExhausted(f"Transaction {key} is not in the chain after its timeout"))
+
+    def _tick(self):
+        head = self.w3.eth.block_number
+        if self._last_block is None:
+            # Anything sent just before tracking can already be in the head block
+            self._last_block = head - 1
+        if head - self._last_block > self.max_catch_up:
+            # Too far behind to scan block by block; let the direct recheck find them
+            with self._lock:
+                for pending in self._pending.values():
+                    pending.last_checked = 0.0
+            self._last_block = head - self.max_catch_up
+        for block_number in range(self._last_block + 1, head + 1):
+            self._process_block(block_number)
+            self._last_block = block_number
+        self._recheck_stragglers()
+        self._expire()
+
+    def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                self._last_block = None
+                continue
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"[RECEIPTS] Tracker error: {e}")
+            time.sleep(self.poll_interval)
+
+
+_CONTINUATIONS: Optional[ThreadPoolExecutor] = None
+_CONTINUATIONS_LOCK = threading.Lock()
+
+
+def off_tracker(fn: Callable) -> Callable:
+    """Wrap a done-callback so it runs on a shared worker pool instead of the tracker thread.
+
+    A slow continuation run inline would stall receipt tracking (and the
+    replacement engine's fee bumps) for every other in-flight transaction.
+    """
+    def _submit(*args, **kwargs):
+        global _CONTINUATIONS
+        with _CONTINUATIONS_LOCK:
+            if _CONTINUATIONS is None:
+                _CONTINUATIONS = ThreadPoolExecutor(max_workers=TX_CONTINUATION_WORKERS, thread_name_prefix="tx-continuation")
+        future = _CONTINUATIONS.submit(fn, *args, **kwargs)
+        future.add_done_callback(_report_failure)
+    return _submit
+
+
+def _report_failure(future: Future):
+    if future.exception() is not None:
+        print(f"[RECEIPTS] Continuation failed: {future.exception()}")
+
+
+def when_all_done(handles: Iterable[TxHandle], fn: Callable[[], None]):
+    """Run ``fn()`` once every handle has resolved (immediately if they all have)."""
+    handles = list(handles)
+    remaining = [len(handles)]
+    lock = threading.Lock()
+
+    def _one_done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            fn()
+
+    if not handles:
+        fn()
+    for handle in handles:
+        handle.add_done_callback(_one_done)
+
+
+_TRACKERS: Dict[int, ReceiptTracker] = {}
+_TRACKERS_LOCK = threading.Lock()
+
+
+def get_receipt_tracker(w3: Web3) -> ReceiptTracker:
+    """One tracker per Web3 instance; pooled instances are process-wide, so this is too."""
+    with _TRACKERS_LOCK:
+        tracker = _TRACKERS.get(id(w3))
+        if tracker is None or tracker.w3 is not w3:
+            tracker = ReceiptTracker(w3)
+            _TRACKERS[id(w3)] = tracker
+        return tracker
+
+
+def track_transaction(w3: Web3, tx_hash, timeout: float = DEFAULT_TIMEOUT) -> TxHandle:
+    return get_receipt_tracker(w3).track(tx_hash, timeout)
@@ -0,0 +1,236 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+
+from acp.common.fees import fee_fields
+from acp.common.nonces import send_with_nonce
+from acp.common.receipts import TxHandle, get_receipt_tracker
+
+
+# Re-price a transaction that has not been mined this long after its last (re)send
+TX_INCLUSION_TARGET_SECONDS = float(os.getenv("TX_INCLUSION_TARGET_SECONDS", "30"))
+# Nodes only accept a same-nonce replacement that raises both fee caps by at least 10%
+TX_FEE_BUMP = max(1.1, float(os.getenv("TX_FEE_BUMP", "1.15")))
+TX_MAX_BUMPS = int(os.getenv("TX_MAX_BUMPS", "5"))
+# Past this age the transaction is cancelled (zero-value self-send on its nonce) instead
+TX_CANCEL_AFTER_SECONDS = float(os.getenv("TX_CANCEL_AFTER_SECONDS", "240"))
+TX_GIVE_UP_SECONDS = float(os.getenv("TX_GIVE_UP_SECONDS", "600"))
+
+_LANDED_ELSEWHERE = ("nonce too low", "already known")
+
+
+class TransactionCancelled(Exception):
+    """The nonce was consumed by our cancellation, so the original transaction never ran."""
+
+    def __init__(self, tx_hash: str, receipt):
+        super().__init__(f"Transaction cancelled; nonce used by {tx_hash}")
+        self.tx_hash = tx_hash
+        self.receipt = receipt
+
+
+class _Watched:
+    def __init__(self, tx: Dict, private_key: str, handle: TxHandle, future: Future):
+        now = time.monotonic()
+        self.tx = tx
+        self.private_key = private_key
+        self.handle = handle
+        self.future = future
+        self.hashes: List[str] = []
+        self.cancel_hashes: set = set()
+        self.timed_out: set = set()
+        self.first_sent_at = now
+        self.last_sent_at = now
+        self.bumps = 0
+        self.cancels = 0
+        # Fee caps of the most recent version; each replacement must beat these
+        self.fees = {
+            "maxPriorityFeePerGas": tx.get("maxPriorityFeePerGas", tx.get("gasPrice", 0)),
+            "maxFeePerGas": tx.get("maxFeePerGas", tx.get("gasPrice", 0)),
+        }
+
+
+class ReplacementEngine:
+    """Sends transactions and keeps them moving until one version is mined.
+
+    A transaction still pending ``target_seconds`` after its last send is
+    re-signed with the same nonce and both EIP-1559 fee caps raised by
+    ``fee_bump`` (and at least to the oracle's high-urgency fees). Once it is
+    ``cancel_after`` seconds old, the replacement is a zero-value self-send
+    instead, which frees the nonce for the transactions queued behind it.
+
+    Every hash sent for a nonce is handed to the ReceiptTracker, and the
+    returned TxHandle resolves with whichever lands first (its ``tx_hash``
+    is updated to the mined one). If the cancellation is what landed, the
+    handle fails with TransactionCancelled; after ``give_up_after`` seconds
+    it fails with TimeExhausted.
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        target_seconds: float = TX_INCLUSION_TARGET_SECONDS,
+        fee_bump: float = TX_FEE_BUMP,
+        max_bumps: int = TX_MAX_BUMPS,
+        cancel_after: float = TX_CANCEL_AFTER_SECONDS,
+        give_up_after: float = TX_GIVE_UP_SECONDS,
+        poll_interval: float = 2.0,
+    ):
+        self.w3 = w3
+        self.target_seconds = target_seconds
+        self.fee_bump = fee_bump
+        self.max_bumps = max_bumps
+        self.cancel_after = cancel_after
+        self.give_up_after = give_up_after
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._watched: Dict[str, _Watched] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def send(self, tx: Dict, private_key: str) -> TxHandle:
+        """Sign and broadcast ``tx`` with a managed nonce and watch it until it lands."""
+        tx_hash, sent = send_with_nonce(self.w3, tx, private_key)
+        key = Web3.to_hex(tx_hash).lower()
+        future: Future = Future()
+        watched = _Watched(sent, private_key, TxHandle(key, future), future)
+        with self._lock:
+            self._watched[key] = watched
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="tx-replacer", daemon=True)
+                self._thread.start()
+        self._attach(watched, key)
+        return watched.handle
+
+    def _attach(self, watched: _Watched, tx_hash: str):
+        watched.hashes.append(tx_hash)
+        # The engine enforces its own deadline; individual hashes just need to outlive it
+        tracked = get_receipt_tracker(self.w3).track(tx_hash, timeout=self.give_up_after + self.target_seconds)
+        tracked.add_done_callback(lambda h: self._landed(watched, h))
+
+    def _landed(self, watched: _Watched, tracked: TxHandle):
+        if tracked.exception() is not None:
+            watched.timed_out.add(tracked.tx_hash)
+            if watched.timed_out >= set(watched.hashes):
+                self._finish(watched, error=tracked.exception())
+            return
+        watched.handle.tx_hash = tracked.tx_hash
+        receipt = tracked.receipt()
+        if tracked.tx_hash in watched.cancel_hashes:
+            self._finish(watched, error=TransactionCancelled(tracked.tx_hash, receipt))
+        else:
+            if len(watched.hashes) > 1:
+                print(f"[REPLACE] Nonce {watched.tx['nonce']} landed as {tracked.tx_hash} after {watched.bumps} bump(s)")
+            self._finish(watched, receipt=receipt)
+
+    def _finish(self, watched: _Watched, receipt=None, error: Optional[BaseException] = None):
+        with self._lock:
+            if watched.future.done():
+                return
+            self._watched.pop(watched.hashes[0], None)
+        if error is not None:
+            watched.future.set_exception(error)
+        else:
+            watched.future.set_result(receipt)
+
+    def _bumped_fees(self, watched: _Watched) -> Dict[str, int]:
+        old_tip = watched.fees["maxPriorityFeePerGas"]
+        old_max = watched.fees["maxFeePerGas"]
+        urgent = fee_fields(self.w3, "high")
+        tip = max(math.ceil(old_tip * self.fee_bump), urgent["maxPriorityFeePerGas"])
+        return {
+            "maxPriorityFeePerGas": tip,
+            "maxFeePerGas": max(math.ceil(old_max * self.fee_bump), urgent["maxFeePerGas"], tip),
+        }
+
+    def _replace(self, watched: _Watched, cancel: bool):
+        fees = self._bumped_fees(watched)
+        base = {k: v for k, v in watched.tx.items() if k != "gasPrice"}
+        if cancel:
+            sender = self.w3.eth.account.from_key(watched.private_key).address
+            replacement = {
+                "from": sender,
+                "to": sender,
+                "value": 0,
+                "gas": 21000,
+                "nonce": base["nonce"],
+                "chainId": base.get("chainId", self.w3.eth.chain_id),
+                **fees,
+            }
+        else:
+            replacement = {**base, **fees}
+        if cancel:
+            watched.cancels += 1
+        else:
+            watched.bumps += 1
+        watched.last_sent_at = time.monotonic()
+        try:
+            signed = self.w3.eth.account.sign_transaction(replacement, watched.private_key)
+            tx_hash = Web3.to_hex(self.w3.eth.send_raw_transaction(signed.raw_transaction)).lower()
+        except Exception as e:
+            if any(marker in str(e).lower() for marker in _LANDED_ELSEWHERE):
+                # An earlier version was just mined; the tracker will report it
+                return
+            print(f"[REPLACE] Replacement for nonce {base['nonce']} rejected: {e}")
+            return
+        watched.fees = fees
+        if cancel:
+            watched.cancel_hashes.add(tx_hash)
+        action = "Cancelling" if cancel else "Re-priced"
+        print(
+            f"[REPLACE] {action} nonce {base['nonce']} as {tx_hash} "
+            f"(tip {fees['maxPriorityFeePerGas']} wei, max {fees['maxFeePerGas']} wei)"
+        )
+        self._attach(watched, tx_hash)
+
+    def _tick(self):
+        now = time.monotonic()
+        with self._lock:
+            watched_list = list(self._watched.values())
+        for watched in watched_list:
+            if watched.future.done():
+                continue
+            age = now - watched.first_sent_at
+            if age >= self.give_up_after:
+                self._finish(watched, error=TimeExhausted(
+                    f"Transaction {watched.hashes[0]} (nonce {watched.tx['nonce']}) not mined after {age:.0f}s"
+                ))
+                continue
+            if now - watched.last_sent_at < self.target_seconds:
+                continue
+            # Once cancelling, keep re-pricing the cancellation rather than the original
+            cancel = age >= self.cancel_after or bool(watched.cancel_hashes)
+            if (watched.cancels if cancel else watched.bumps) >= self.max_bumps:
+                continue
+            self._replace(watched, cancel)
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"[REPLACE] Engine error: {e}")
+
+
+_ENGINES: Dict[int, ReplacementEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_replacement_engine(w3: Web3) -> ReplacementEngine:
+    """One engine per Web3 instance; pooled instances are process-wide, so this is too."""
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(id(w3))
+        if engine is None or engine.w3 is not w3:
+            engine = ReplacementEngine(w3)
+            _ENGINES[id(w3)] = engine
+        return engine
+
+
+def send_transaction(w3: Web3, tx: Dict, private_key: str) -> TxHandle:
+    """Send ``tx`` with a managed nonce; the handle resolves with whichever version is mined."""
+    return get_replacement_engine(w3).send(tx, private_key)
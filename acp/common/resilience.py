@@ -0,0 +1,223 @@
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional
+
+
+RETRY_ATTEMPTS = int(os.getenv("TRADE_RETRY_ATTEMPTS", "3"))
+RETRY_BASE_MS = float(os.getenv("TRADE_RETRY_BASE_MS", "100"))
+RETRY_MAX_MS = float(os.getenv("TRADE_RETRY_MAX_MS", "2000"))
+# Hedge after this percentile of recent latencies, once enough samples exist
+HEDGE_PERCENTILE = float(os.getenv("TRADE_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("TRADE_HEDGE_MIN_SAMPLES", "20"))
+BREAKER_FAILURES = int(os.getenv("TRADE_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("TRADE_BREAKER_RESET_SECONDS", "30"))
+LATENCY_WINDOW = 200
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while an endpoint's breaker is open."""
+
+
+class CircuitBreaker:
+    """Per-endpoint breaker: opens after ``failure_threshold`` consecutive failures.
+
+    While open, calls fail fast with CircuitOpenError. After ``reset_after``
+    seconds one trial call is let through (half-open); its success closes
+    the breaker, its failure opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET_SECONDS, on_transition=None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_after = reset_after
+        self.on_transition = on_transition
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    def _move(self, state: str):
+        if state != self.state:
+            print(f"[BREAKER] {self.name}: {self.state} -> {state}")
+            previous, self.state = self.state, state
+            if self.on_transition:
+                self.on_transition(previous, state)
+
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_after:
+                    raise CircuitOpenError(f"Circuit for {self.name} is open")
+                self._move(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial_running:
+                    raise CircuitOpenError(f"Circuit for {self.name} is half-open; trial call in progress")
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_running = False
+            self._move(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._move(OPEN)
+
+
+class ResilientCaller:
+    """Retries, hedging and circuit breaking around idempotent upstream calls.
+
+    ``call(endpoint, fn)`` runs ``fn()`` (which must be safe to repeat) and:
+
+    - hedges: if the first attempt has not answered after the endpoint's
+      recent p95 latency, a second identical request is started and
+      whichever succeeds first wins (only once ``hedge_min_samples``
+      latencies are known);
+    - retries: a failure for which ``is_retryable`` is true is retried up
+      to ``attempts`` times in total with full-jitter exponential backoff;
+    - breaks: each endpoint has a CircuitBreaker fed with the outcome of
+      every call, so an unhealthy upstream fails fast instead of being
+      waited on.
+
+    ``stats`` counts calls, retries, hedges, hedge wins, fast failures and
+    breaker transitions.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        is_retryable: Callable[[BaseException], bool],
+        attempts: int = RETRY_ATTEMPTS,
+        base_delay: float = RETRY_BASE_MS / 1000,
+        max_delay: float = RETRY_MAX_MS / 1000,
+        hedge_percentile: Optional[float] = HEDGE_PERCENTILE,
+        hedge_min_samples: int = HEDGE_MIN_SAMPLES,
+        failure_threshold: int = BREAKER_FAILURES,
+        reset_after: float = BREAKER_RESET_SECONDS,
+        max_workers: int = 8,
+    ):
+        self.name = name
+        self.is_retryable = is_retryable
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = max(1, hedge_min_samples)
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-hedge")
+        self._stats = {"calls": 0, "failures": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "fast_failures": 0, "breaker_transitions": 0}
+
+    @property
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["breakers"] = {endpoint: b.state for endpoint, b in self._breakers.items()}
+        return stats
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._stats[key] += n
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    f"{self.name} {endpoint}",
+                    self.failure_threshold,
+                    self.reset_after,
+                    on_transition=lambda old, new: self._count("breaker_transitions"),
+                )
+                self._breakers[endpoint] = breaker
+            return breaker
+
+    def hedge_delay(self, endpoint: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while too few latencies are known."""
+        if self.hedge_percentile is None:
+            return None
+        with self._lock:
+            samples = list(self._latencies.get(endpoint, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return _percentile(samples, self.hedge_percentile)
+
+    def _timed(self, endpoint: str, fn: Callable):
+        started = time.monotonic()
+        result = fn()
+        with self._lock:
+            self._latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(time.monotonic() - started)
+        return result
+
+    def _attempt(self, endpoint: str, fn: Callable):
+        delay = self.hedge_delay(endpoint)
+        if delay is None:
+            return self._timed(endpoint, fn)
+        primary = self._pool.submit(self._timed, endpoint, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        self._count("hedges")
+        hedge = self._pool.submit(self._timed, endpoint, fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, endpoint: str, fn: Callable):
+        breaker = self.breaker(endpoint)
+        self._count("calls")
+        for attempt in range(1, self.attempts + 1):
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                self._count("fast_failures")
+                raise
+            try:
+                result = self._attempt(endpoint, fn)
+            except Exception as e:
+                retryable = self.is_retryable(e)
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    # The upstream answered; a rejected request says nothing about its health
+                    breaker.record_success()
+                if not retryable or attempt == self.attempts:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                print(f"[{self.name.upper()}] {endpoint} attempt {attempt} failed ({e}); retrying in {backoff * 1000:.0f} ms")
+                time.sleep(backoff)
+                continue
+            breaker.record_success()
+            return result
@@ -0,0 +1,113 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one upstream call.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it is running wait for it instead of
+    calling upstream themselves. Everyone gets the same outcome: the result
+    (a deep copy for followers, so one caller's edits cannot leak into
+    another's) or the leader's exception. Nothing is remembered once the
+    call finishes; the next call for the key starts a new flight.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._stats = {"calls": 0, "upstream": 0, "shared": 0}
+
+    @property
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        return stats
+
+    def waiters(self, key: Hashable) -> int:
+        """Callers currently waiting on the in-flight call for ``key`` (excluding its leader)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            return flight.waiters if flight else 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self._stats["calls"] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self._stats["shared"] += 1
+                leader = False
+            else:
+                flight = _Flight(Future())
+                self._flights[key] = flight
+                self._stats["upstream"] += 1
+                leader = True
+
+        if not leader:
+            return copy.deepcopy(flight.future.result())
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            flight.future.set_exception(e)
+            raise
+        else:
+            flight.future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            if flight.waiters:
+                print(f"[{self.name.upper()}] {flight.waiters} caller(s) shared one call for {key}")
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines on one event loop."""
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._flights: Dict[Hashable, Tuple[asyncio.Future, list]] = {}
+        self._stats = {"calls": 0, "upstream": 0, "shared": 0}
+
+    @property
+    def stats(self) -> Dict:
+        return {**self._stats, "in_flight": len(self._flights)}
+
+    def waiters(self, key: Hashable) -> int:
+        flight = self._flights.get(key)
+        return flight[1][0] if flight else 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs):
+        self._stats["calls"] += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight[1][0] += 1
+            self._stats["shared"] += 1
+            # shield: one waiter being cancelled must not cancel the shared call
+            return copy.deepcopy(await asyncio.shield(flight[0]))
+
+        self._stats["upstream"] += 1
+        task = asyncio.ensure_future(fn(*args, **kwargs))
+        # Followers await the task; retrieve its exception so an unwatched failure is not logged
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._flights[key] = (task, [0])
+        try:
+            return await asyncio.shield(task)
+        finally:
+            waiters = self._flights.pop(key, (None, [0]))[1][0]
+            if waiters:
+                print(f"[{self.name.upper()}] {waiters} caller(s) shared one call for {key}")
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+from eth_abi import decode
+from web3 import Web3
+
+from acp.common.multicall import aggregate3
+from acp.common.web3_pool import get_web3
+
+
+DECIMALS_SELECTOR = bytes.fromhex("313ce567")  # decimals()
+SYMBOL_SELECTOR = bytes.fromhex("95d89b41")    # symbol()
+
+DEFAULT_CACHE_PATH = os.getenv("ACP_TOKEN_METADATA_CACHE", "/tmp/acp_token_metadata.json")
+
+
+def _decode_symbol(data: bytes) -> Optional[str]:
+    if not data:
+        return None
+    try:
+        return decode(["string"], data)[0]
+    except Exception:
+        pass
+    # Some older tokens (e.g. MKR) return symbol() as bytes32
+    if len(data) == 32:
+        return data.rstrip(b"\x00").decode("utf-8", errors="ignore") or None
+    return None
+
+
+def _decode_decimals(data: bytes) -> Optional[int]:
+    if len(data) < 32:
+        return None
+    value = int.from_bytes(data[:32], "big")
+    return value if value <= 255 else None
+
+
+class TokenMetadataResolver:
+    """Discovers decimals()/symbol() for tokens that are not in tokens.csv.
+
+    Misses are resolved in a single Multicall3 round trip and written to a JSON
+    cache on disk, so a restarted seller never repeats the lookup. Addresses
+    that answered but are not ERC-20s are remembered for the life of the
+    process only; RPC failures are never cached.
+    """
+
+    def __init__(self, rpc_url: Optional[str] = None, cache_path: str = DEFAULT_CACHE_PATH):
+        self._rpc_url = rpc_url
+        self._w3: Optional[Web3] = None
+        self.cache_path = cache_path
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict] = self._load_cache()
+        self._not_tokens = set()
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"[TOKENS] Warning: ignoring unreadable metadata cache {self.cache_path}: {e}")
+            return {}
+
+    def _save_cache(self):
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(self._cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"[TOKENS] Warning: failed to persist metadata cache: {e}")
+
+    def _web3(self) -> Optional[Web3]:
+        if self._w3 is None:
+            rpc_url = self._rpc_url or os.getenv("BASE_MAINNET_RPC_URL")
+            if not rpc_url:
+                return None
+            self._w3 = get_web3(rpc_url)
+        return self._w3
+
+    @property
+    def available(self) -> bool:
+        return bool(self._rpc_url or os.getenv("BASE_MAINNET_RPC_URL"))
+
+    def get_cached(self, address: str) -> Optional[Dict]:
+        return self._cache.get(address.lower())
+
+    def lookup_many(self, addresses: Iterable[str]) -> Dict[str, Dict]:
+        """Returns {lowercased address: {"symbol", "decimals"}} for every token found."""
+        wanted = {a.lower() for a in addresses if a}
+        found = {a: self._cache[a] for a in wanted if a in self._cache}
+        misses = sorted(a for a in wanted - set(found) if a not in self._not_tokens)
+        if not misses:
+            return found
+
+        w3 = self._web3()
+        if w3 is None:
+            return found
+
+        calls = []
+        for addr in misses:
+            calls.append((addr, DECIMALS_SELECTOR))
+            calls.append((addr, SYMBOL_SELECTOR))
+        results = aggregate3(w3, calls)
+
+        with self._lock:
+            for i, addr in enumerate(misses):
+                dec_ok, dec_data = results[2 * i]
+                sym_ok, sym_data = results[2 * i + 1]
+                decimals = _decode_decimals(dec_data) if dec_ok else None
+                if decimals is None:
+                    self._not_tokens.add(addr)
+                    continue
+                info = {
+                    "address": Web3.to_checksum_address(addr),
+                    "decimals": decimals,
+                    "symbol": _decode_symbol(sym_data) if sym_ok else None,
+                }
+                self._cache[addr] = info
+                found[addr] = info
+            self._save_cache()
+        print(f"[TOKENS] Resolved {len(misses)} token(s) on-chain via Multicall3")
+        return found
+
+    def lookup(self, address: str) -> Optional[Dict]:
+        return self.lookup_many([address]).get(address.lower())
+
+
+_DEFAULT_RESOLVER: Optional[TokenMetadataResolver] = None
+
+
+def get_metadata_resolver() -> TokenMetadataResolver:
+    global _DEFAULT_RESOLVER
+    if _DEFAULT_RESOLVER is None:
+        _DEFAULT_RESOLVER = TokenMetadataResolver()
+    return _DEFAULT_RESOLVER
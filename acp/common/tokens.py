@@ -0,0 +1,168 @@
+import csv
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from acp.common.kyber import NATIVE_TOKEN
+from acp.common.token_metadata import TokenMetadataResolver, get_metadata_resolver
+
+
+# Base canonical ETH (WETH) address used by TokenTransactionTool to skip approvals
+ETH_ADDRESS = "0x4200000000000000000000000000000000000006"
+DEFAULT_CHAIN = "base"
+
+
+def swap_token(value: str, address: str) -> str:
+    """Address to route a token under, given the symbol or address the job asked for and its resolved address.
+
+    Only the literal symbol "ETH" is swapped as native ETH. The registry
+    resolves it to ETH_ADDRESS, which is also WETH, so the decision has to be
+    made on the raw value: "WETH" or 0x4200...0006 stays the ERC-20.
+    """
+    return NATIVE_TOKEN if str(value).strip().lower() == "eth" else address
+
+
+class TokenRegistry:
+    """In-memory index over tokens.csv with O(1) symbol and address lookups.
+
+    Entries are keyed by (chain, SYMBOL) and (chain, lowercased address). The CSV
+    is expected to look like ``Token,Full Name,Contract Address,decimals`` with an
+    optional trailing ``chain`` column; rows without a chain belong to
+    DEFAULT_CHAIN. The file's mtime is checked at most every ``reload_interval``
+    seconds and the index is rebuilt when it changes, so edits to tokens.csv are
+    picked up without restarting the seller. Addresses missing from the CSV are
+    looked up on-chain through ``metadata`` when one is attached.
+    """
+
+    def __init__(
+        self,
+        csv_path: str,
+        reload_interval: float = 2.0,
+        metadata: Optional[TokenMetadataResolver] = None,
+    ):
+        self.csv_path = csv_path
+        self.reload_interval = reload_interval
+        self.metadata = metadata
+        self._lock = threading.Lock()
+        self._by_symbol: Dict[Tuple[str, str], Dict] = {}
+        self._by_address: Dict[Tuple[str, str], Dict] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    def _read_csv(self):
+        by_symbol = {}
+        by_address = {}
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            # Expect header like: Token,Full Name,Contract Address,decimals[,chain]
+            next(reader, None)
+            for row in reader:
+                if len(row) < 4:
+                    continue
+                sym = str(row[0]).strip()
+                addr = str(row[2]).strip()
+                try:
+                    dec = int(str(row[3]).strip())
+                except Exception:
+                    dec = 18
+                chain = str(row[4]).strip().lower() if len(row) > 4 and row[4].strip() else DEFAULT_CHAIN
+                if not sym:
+                    continue
+                info = {"symbol": sym.upper(), "address": addr, "decimals": dec, "chain": chain}
+                by_symbol[(chain, sym.upper())] = info
+                if addr:
+                    by_address[(chain, addr.lower())] = info
+        return by_symbol, by_address
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._mtime is not None and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if self._mtime is not None and now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.csv_path).st_mtime
+            except OSError as e:
+                if self._mtime is None:
+                    print(f"[TOKENS] Warning: failed to load tokens.csv at {self.csv_path}: {e}")
+                    self._mtime = 0.0
+                return
+            if mtime == self._mtime:
+                return
+            try:
+                by_symbol, by_address = self._read_csv()
+            except Exception as e:
+                print(f"[TOKENS] Warning: failed to load tokens.csv at {self.csv_path}: {e}")
+                if self._mtime is None:
+                    self._mtime = 0.0
+                return
+            # Swap both indexes in one go so readers never see a half-built registry
+            self._by_symbol, self._by_address = by_symbol, by_address
+            self._mtime = mtime
+            print(f"[TOKENS] Loaded {len(by_symbol)} tokens from {self.csv_path}")
+
+    def by_symbol(self, symbol: str, chain: str = DEFAULT_CHAIN) -> Optional[Dict]:
+        self._maybe_reload()
+        return self._by_symbol.get((chain.lower(), str(symbol).strip().upper()))
+
+    def by_address(self, address: str, chain: str = DEFAULT_CHAIN) -> Optional[Dict]:
+        self._maybe_reload()
+        return self._by_address.get((chain.lower(), str(address).strip().lower()))
+
+    def prefetch(self, values: Iterable[str], chain: str = DEFAULT_CHAIN):
+        """Resolve every address missing from tokens.csv in one on-chain batch; symbols are skipped."""
+        if self.metadata is None or chain.lower() != DEFAULT_CHAIN:
+            return
+        addresses = [v for v in values if v and v.startswith("0x") and len(v) == 42]
+        unknown = [a for a in addresses if self.by_address(a, chain) is None]
+        if unknown:
+            self.metadata.lookup_many(unknown)
+
+    def _resolve_unknown_address(self, address: str, chain: str):
+        # The metadata resolver only talks to the Base RPC
+        if self.metadata is None or not self.metadata.available or chain.lower() != DEFAULT_CHAIN:
+            print(f"[TOKENS] Warning: {address} not in tokens.csv, assuming 18 decimals")
+            return address, 18
+        info = self.metadata.lookup(address)
+        if not info:
+            raise ValueError(f"Could not read decimals() for token {address}; is it an ERC-20 on {chain}?")
+        return info["address"], int(info["decimals"])
+
+    def resolve(self, value: str, chain: str = DEFAULT_CHAIN):
+        """
+        Returns tuple (address, decimals).
+        Accepts symbol (e.g., 'USDC', 'ETH') or address (0x...).
+        Addresses missing from tokens.csv have their decimals read on-chain.
+        """
+        if not value:
+            raise ValueError("Token value is empty")
+        v = str(value).strip()
+        if v.lower() == "eth":
+            return ETH_ADDRESS, 18
+        if v.startswith("0x") and len(v) == 42:
+            info = self.by_address(v, chain)
+            if info:
+                return info["address"], int(info["decimals"])
+            return self._resolve_unknown_address(v, chain)
+        info = self.by_symbol(v, chain)
+        if not info:
+            raise ValueError(f"Unknown token symbol '{v}'. Please use address or add to tokens.csv")
+        return info["address"], int(info["decimals"])
+
+
+_REGISTRIES: Dict[str, TokenRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+
+def get_token_registry(csv_path: str) -> TokenRegistry:
+    """Process-wide registry per tokens.csv path, shared by all seller variants."""
+    path = os.path.abspath(csv_path)
+    with _REGISTRIES_LOCK:
+        registry = _REGISTRIES.get(path)
+        if registry is None:
+            registry = TokenRegistry(path, metadata=get_metadata_resolver())
+            _REGISTRIES[path] = registry
+        return registry
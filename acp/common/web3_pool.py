@@ -0,0 +1,65 @@
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.middleware import ExtraDataToPOAMiddleware
+
+
+# Distinct hosts kept in the session's pool, and keep-alive connections per host
+POOL_CONNECTIONS = int(os.getenv("WEB3_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("WEB3_POOL_MAXSIZE", "32"))
+REQUEST_TIMEOUT = float(os.getenv("WEB3_REQUEST_TIMEOUT", "30"))
+
+_POOLS: Dict[Tuple[str, bool], Web3] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _session(pool_connections: int, pool_maxsize: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_web3(
+    rpc_url: Optional[str] = None,
+    poa: bool = False,
+    pool_connections: int = POOL_CONNECTIONS,
+    pool_maxsize: int = POOL_MAXSIZE,
+) -> Web3:
+    """Process-wide Web3 instance per RPC URL, backed by a pooled keep-alive session.
+
+    The first call for a URL builds the provider and runs the only
+    ``is_connected()`` health check for that pool; later calls return the
+    same instance without any network round trip. Raises ConnectionError if
+    the health check fails (nothing is cached in that case, so the next call
+    retries). ``poa`` injects ExtraDataToPOAMiddleware for block reads on Base.
+    """
+    rpc_url = rpc_url or os.getenv("BASE_MAINNET_RPC_URL")
+    if not rpc_url:
+        raise ValueError("RPC URL is not set (pass rpc_url or set BASE_MAINNET_RPC_URL)")
+    key = (rpc_url, poa)
+    w3 = _POOLS.get(key)
+    if w3 is not None:
+        return w3
+
+    with _POOLS_LOCK:
+        w3 = _POOLS.get(key)
+        if w3 is not None:
+            return w3
+        provider = Web3.HTTPProvider(
+            rpc_url,
+            request_kwargs={"timeout": REQUEST_TIMEOUT},
+            session=_session(pool_connections, pool_maxsize),
+        )
+        w3 = Web3(provider)
+        if poa:
+            w3.middleware_onion.inject(ExtraDataToPOAMiddleware(), layer=0)
+        if not w3.is_connected():
+            raise ConnectionError(f"Failed to connect to RPC at {rpc_url}")
+        _POOLS[key] = w3
+        return w3
@@ -0,0 +1,117 @@
+import time
+from typing import Iterable, Iterator, Set
+
+from web3 import Web3
+
+
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+def address_topic(address: str) -> bytes:
+    """32-byte left-padded form an address takes as an indexed log topic."""
+    return bytes(12) + bytes.fromhex(address[2:].lower())
+
+
+def bloom_may_contain(logs_bloom: bytes, value: bytes) -> bool:
+    """Test a 2048-bit block header logsBloom for ``value`` (an address or topic).
+
+    False means the value is definitely absent from every log in the block, so
+    the block's logs never need to be fetched for it.
+    """
+    digest = Web3.keccak(value)
+    for i in (0, 2, 4):
+        bit = ((digest[i] << 8) | digest[i + 1]) & 2047
+        if not logs_bloom[255 - bit // 8] & (1 << (bit % 8)):
+            return False
+    return True
+
+
+def touched_wallets(w3: Web3, block_number: int, wallets: Iterable[str]) -> Set[str]:
+    """Lowercased designated wallets that received ETH or an ERC-20 Transfer in a block.
+
+    Native transfers are read from the block's transactions. For ERC-20s the
+    header logsBloom is used as a first pass over the designated addresses and
+    eth_getLogs is only called when some recipient topic may be present.
+    Internal ETH transfers (value moved by a contract call) are not visible
+    here; callers should fall back to a periodic full balance sweep.
+    """
+    wanted = {w.lower() for w in wallets}
+    if not wanted:
+        return set()
+
+    block = w3.eth.get_block(block_number, full_transactions=True)
+    touched = set()
+    for tx in block["transactions"]:
+        to = tx.get("to")
+        if to and to.lower() in wanted and tx.get("value", 0) > 0:
+            touched.add(to.lower())
+
+    logs_bloom = bytes(block["logsBloom"])
+    if not bloom_may_contain(logs_bloom, bytes.fromhex(TRANSFER_TOPIC[2:])):
+        return touched
+    candidates = [w for w in wanted if w not in touched and bloom_may_contain(logs_bloom, address_topic(w))]
+    if not candidates:
+        return touched
+
+    logs = w3.eth.get_logs({
+        "blockHash": block["hash"],
+        "topics": [TRANSFER_TOPIC, None, ["0x" + address_topic(w).hex() for w in candidates]],
+    })
+    for log in logs:
+        topics = log["topics"]
+        if len(topics) >= 3:
+            touched.add("0x" + bytes(topics[2])[-20:].hex())
+    return touched & wanted
+
+
+class BlockFollower:
+    """Yields every new block number as the chain advances.
+
+    Uses an eth_newBlockFilter when the provider supports one and falls back to
+    polling eth_blockNumber otherwise. Either way an idle follower costs one
+    light RPC per ``poll_interval``.
+    """
+
+    def __init__(self, w3: Web3, poll_interval: float = 1.0, use_filter: bool = True, max_catch_up: int = 50):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.use_filter = use_filter
+        self.max_catch_up = max_catch_up
+        self._filter = None
+
+    def _new_filter(self):
+        if not self.use_filter:
+            return None
+        try:
+            return self.w3.eth.filter("latest")
+        except Exception as e:
+            print(f"[BLOCKS] Block filter unavailable, polling block number instead: {e}")
+            self.use_filter = False
+            return None
+
+    def _has_new_block(self) -> bool:
+        if self._filter is None:
+            return True
+        try:
+            return bool(self._filter.get_new_entries())
+        except Exception as e:
+            # Filters expire if the node restarts or we fall behind; recreate it
+            print(f"[BLOCKS] Block filter lost, recreating: {e}")
+            self._filter = self._new_filter()
+            return True
+
+    def new_blocks(self) -> Iterator[int]:
+        last = self.w3.eth.block_number
+        self._filter = self._new_filter()
+        while True:
+            if self._has_new_block():
+                head = self.w3.eth.block_number
+                if head > last:
+                    # Never replay an unbounded backlog after a long stall
+                    start = max(last + 1, head - self.max_catch_up + 1)
+                    for number in range(start, head + 1):
+                        yield number
+                    last = head
+                    continue
+            time.sleep(self.poll_interval)
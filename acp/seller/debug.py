@@ -16,8 +16,6 @@ from virtuals_acp.configs import BASE_MAINNET_CONFIG
 from virtuals_acp.models import IDeliverable
 from virtuals_acp.models import NegotiationPayload
 
-job_designated_wallets = {}  # GLOBAL storage for wallets
-job_trade_details = {}  
 
 # Make operari-server and operari-server/data importable to reuse modules
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
@@ -28,26 +26,26 @@ for p in (OPERARI_ROOT, OPERARI_DATA):
         sys.path.append(p)
 from acp.common.schemas import TradeRequest
 from data.crew.tools.tokenTools import TokenTransactionTool
-import csv
+from acp.common.tokens import get_token_registry
+from acp.seller.job_state import JobState, delivery_value, get_job_journal
+from acp.seller.job_store import JobStore
 
 load_dotenv(override=True)
 
-JOBS_DIR = "/tmp/acp_jobs"  # or use a proper data directory
+_JOB_STORE = None
+
+
+def get_job_store():
+    global _JOB_STORE
+    if _JOB_STORE is None:
+        _JOB_STORE = JobStore()
+    return _JOB_STORE
+
 
 def save_job_data(job_id, wallet_info, trade_details):
-    """Save job data to file for monitor to read"""
-    os.makedirs(JOBS_DIR, exist_ok=True)
-    
-    job_data = {
-        "wallet_info": wallet_info,
-        "trade_details": trade_details,
-        "status": "waiting_for_funds",
-        "created_at": time.time()
-    }
-    
-    with open(f"{JOBS_DIR}/{job_id}.json", "w") as f:
-        json.dump(job_data, f)
-    
+    """Save job data to the job store for monitor to read"""
+    get_job_store().save_job(job_id, wallet_info, trade_details)
+
     print(f"[SELLER] Saved job data for {job_id}")
 
 def _parse_service_requirement(sr):
@@ -61,8 +59,8 @@ def _parse_service_requirement(sr):
         except Exception:
             return {}
 
-_TOKENS_CACHE = None
 _TOKENS_CSV_PATH = os.path.join(OPERARI_ROOT, "tokens.csv")
+_TOKENS = get_token_registry(_TOKENS_CSV_PATH)
 
 def generate_new_wallet():
     """Generate a new Ethereum wallet for designated funds"""
@@ -74,60 +72,16 @@ def generate_new_wallet():
         "private_key": private_key
     }
 
-def _load_tokens_csv():
-    global _TOKENS_CACHE
-    if _TOKENS_CACHE is not None:
-        return _TOKENS_CACHE
-    cache = {}
-    try:
-        with open(_TOKENS_CSV_PATH, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            # Expect header like: Token,Full Name,Contract Address,decimals
-            next(reader, None)
-            for row in reader:
-                if len(row) < 4:
-                    continue
-                sym = str(row[0]).strip()
-                addr = str(row[2]).strip()
-                try:
-                    dec = int(str(row[3]).strip())
-                except Exception:
-                    dec = 18
-                if sym:
-                    cache[sym.upper()] = {"address": addr, "decimals": dec}
-    except Exception as e:
-        print(f"[SELLER] Warning: failed to load tokens.csv at {_TOKENS_CSV_PATH}: {e}")
-    _TOKENS_CACHE = cache
-    return _TOKENS_CACHE
-
-def _resolve_token(value: str):
+def _resolve_token(value: str, chain: str = "base"):
     """
-    Returns tuple (address, decimals)
+    Returns tuple (address, decimals).
     Accepts symbol (e.g., 'USDC', 'ETH') or address (0x...).
     """
-    if not value:
-        raise ValueError("Token value is empty")
-    v = str(value).strip()
-    # Base canonical ETH (WETH) address used by TokenTransactionTool to skip approvals
-    ETH_ADDR = "0x4200000000000000000000000000000000000006"
-    if v.lower() == "eth":
-        return ETH_ADDR, 18
-    if v.startswith("0x") and len(v) == 42:
-        # Try to enrich decimals from CSV if present by matching address
-        tokens = _load_tokens_csv()
-        for sym, info in tokens.items():
-            if info.get("address", "").lower() == v.lower():
-                return info.get("address"), int(info.get("decimals", 18))
-        return v, 18
-    # Symbol path
-    tokens = _load_tokens_csv()
-    info = tokens.get(v.upper())
-    if not info:
-        raise ValueError(f"Unknown token symbol '{v}'. Please use address or add to tokens.csv")
-    return info.get("address"), int(info.get("decimals", 18))
+    return _TOKENS.resolve(value, chain)
+
+
 def seller():
     env = EnvSettings()
-    global job_designated_wallets
 
     YOUR_TEST_WALLET = {
         "address": os.getenv("TEST_WALLET_ADDRESS"),
@@ -224,16 +178,20 @@ def seller():
     def on_new_task(job: ACPJob, memo_to_sign=None):
     print(f"[SELLER] on_new_task: phase={job.phase} job_id={getattr(job, 'id', None)} memos={len(job.memos)}")
     
-    global job_designated_wallets, job_trade_details
+    jobs = get_job_journal()
     
     if job.phase == ACPJobPhase.REQUEST:
         print("[SELLER] REQUEST received. Checking memos for NEGOTIATION transition...")
+        record = jobs.get(job.id)
+        if record is not None and record.state != JobState.REQUEST:
+            print(f"[SELLER] Job {job.id} already accepted ({record.state.value})")
+            return
         for memo in job.memos:
             if memo.next_phase == ACPJobPhase.NEGOTIATION:
-                designated_wallet = YOUR_TEST_WALLET
-                print(f"[SELLER] Generated designated wallet: {designated_wallet['address']}")
-                
-                job_designated_wallets[job.id] = designated_wallet
+                # Reuse the job's wallet on a redelivered REQUEST; a new one is
+                # persisted (with its key) before its address is published
+                designated_wallet = jobs.designated_wallet(job.id, lambda: YOUR_TEST_WALLET)
+                print(f"[SELLER] Designated wallet: {designated_wallet['address']}")
                 
                 # Create proper NegotiationPayload with wallet address
                 payload = NegotiationPayload(
@@ -245,6 +203,7 @@ def seller():
                     payload=payload,
                     reason="Ready to process trade"
                 )
+                jobs.advance(job.id, JobState.NEGOTIATION)
                 break
     
     elif job.phase == ACPJobPhase.TRANSACTION:
@@ -264,19 +223,23 @@ def seller():
             requirements = _parse_service_requirement(original_trade_memo.content)
             tr = TradeRequest.from_dict(requirements)
 
-            designated_wallet = job_designated_wallets.get(job.id)
+            designated_wallet = jobs.wallet(job.id)
             if not designated_wallet:
                 print(f"[SELLER] ERROR: No designated wallet found for job {job.id}")
                 return
+            if jobs.get(job.id).data.get('funds_requested'):
+                print(f"[SELLER] Funds already requested for job {job.id}")
+                return
 
+            _, sell_dec = _resolve_token(tr.fromToken, tr.chain)
             trade_details = {
                 'fromToken': tr.fromToken,
                 'toToken': tr.toToken, 
                 'amount': tr.amount,
-                'sell_decimals': 6
+                'sell_decimals': sell_dec
             }
             
-            job_trade_details[job.id] = trade_details
+            jobs.advance(job.id, JobState.TRANSACTION, trade_details=trade_details)
             
             save_job_data(job.id, designated_wallet, trade_details)
             print(f"[SELLER] Registered trade details for job {job.id}")
@@ -288,6 +251,7 @@ def seller():
                 reason=f"Funds needed for {tr.fromToken}->{tr.toToken} swap",
                 nextPhase=ACPJobPhase.TRANSACTION
             )
+            jobs.advance(job.id, JobState.TRANSACTION, funds_requested=True)
             
         except Exception as e:
             print(f"[SELLER] Error in funds request: {e}")
@@ -303,6 +267,14 @@ def seller():
         config=config,
     )
 
+    # Deliver swaps as the monitor finishes them and close the jobs in the journal
+    def deliver_result(record):
+        job = acp_instance.get_job_by_onchain_id(int(record.job_id))
+        job.deliver(IDeliverable(type="object", value=delivery_value(record)))
+        print(f"[SELLER] Delivered {record.state.value} result for job {record.job_id}")
+
+    get_job_journal().follow(get_job_store(), deliver_result)
+
     print("Waiting for new task...")
     threading.Event().wait()
 
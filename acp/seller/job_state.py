@@ -0,0 +1,344 @@
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from typing import Callable, Dict, List, Optional
+
+
+DEFAULT_JOURNAL_DIR = os.getenv("ACP_JOB_JOURNAL_DIR", "/tmp/acp_jobs/journal")
+
+
+class JobState(str, Enum):
+    REQUEST = "request"
+    NEGOTIATION = "negotiation"
+    TRANSACTION = "transaction"
+    FUNDED = "funded"
+    SWAPPED = "swapped"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+
+_TRANSITIONS = {
+    # TRANSACTION straight from REQUEST: a crash between job.respond() and
+    # recording NEGOTIATION leaves the journal behind the ACP job
+    JobState.REQUEST: {JobState.NEGOTIATION, JobState.TRANSACTION},
+    JobState.NEGOTIATION: {JobState.TRANSACTION},
+    JobState.TRANSACTION: {JobState.FUNDED},
+    JobState.FUNDED: {JobState.SWAPPED},
+    JobState.SWAPPED: {JobState.DELIVERED},
+    JobState.DELIVERED: set(),
+    JobState.FAILED: set(),
+}
+
+TERMINAL_STATES = {JobState.DELIVERED, JobState.FAILED}
+
+# Monitor job-store status -> the journal state it proves the job has reached
+_STORE_STATES = {
+    "swapping": JobState.FUNDED,
+    "completed": JobState.SWAPPED,
+    "failed": JobState.FAILED,
+}
+_SWAP_FLOW = [JobState.TRANSACTION, JobState.FUNDED, JobState.SWAPPED]
+
+JOB_FOLLOW_SECONDS = float(os.getenv("ACP_JOB_FOLLOW_SECONDS", "10"))
+
+
+@dataclass
+class JobRecord:
+    job_id: str
+    state: JobState
+    wallet: Optional[Dict] = None
+    trade_details: Optional[Dict] = None
+    data: Dict = field(default_factory=dict)
+    updated_at: float = 0.0
+
+
+def delivery_value(record: JobRecord) -> Dict:
+    """Deliverable body for a job the monitor finished (SWAPPED or FAILED)."""
+    result = record.data.get("result") or {}
+    tx_hash = (result.get("transaction") or {}).get("transactionHash")
+    metadata = {
+        "sellToken": (record.trade_details or {}).get("fromToken"),
+        "buyToken": (record.trade_details or {}).get("toToken"),
+        "sellAmount": (record.trade_details or {}).get("amount"),
+    }
+    if record.state == JobState.SWAPPED:
+        return {"status": "SUCCESS", "message": "Swap completed.", "transaction_hash": tx_hash, "metadata": metadata}
+    value = {"status": "FAILURE", "message": str(result.get("error") or "Swap execution failed."), "metadata": metadata}
+    if tx_hash:
+        value["transaction_hash"] = tx_hash
+    return value
+
+
+class JobJournal:
+    """Crash-recoverable seller job state machine.
+
+    Every transition is appended to ``journal.log`` as one JSON line and
+    fsynced before ``advance`` returns. Every ``snapshot_every`` entries the
+    full job table is written to ``snapshot.json`` (atomically) and the
+    journal is truncated, so startup replay is one snapshot load plus at most
+    ``snapshot_every`` journal lines. Terminal jobs are dropped from snapshots.
+
+    Transitions follow REQUEST -> NEGOTIATION -> TRANSACTION -> FUNDED ->
+    SWAPPED -> DELIVERED (REQUEST may skip to TRANSACTION, since the buyer
+    paying proves the acceptance went out even if it was never recorded);
+    any non-terminal job may move to FAILED, and re-entering the current
+    state just updates the job's fields. A job we first hear about mid-flow
+    (e.g. after losing the journal) may start in any state.
+    """
+
+    def __init__(self, journal_dir: str = DEFAULT_JOURNAL_DIR, snapshot_every: int = 1000, fsync: bool = True):
+        self.journal_dir = journal_dir
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, JobRecord] = {}
+        self._seq = 0
+        self._entries_since_snapshot = 0
+        os.makedirs(journal_dir, exist_ok=True)
+        self._journal_path = os.path.join(journal_dir, "journal.log")
+        self._snapshot_path = os.path.join(journal_dir, "snapshot.json")
+        started = time.monotonic()
+        self._replay()
+        # Designated wallet private keys end up in here; keep the files owner-only
+        fd = os.open(self._journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        self._journal = os.fdopen(fd, "a", encoding="utf-8")
+        print(f"[JOBS] Replayed {len(self.open_jobs())} open job(s) in {time.monotonic() - started:.2f}s")
+
+    @staticmethod
+    def _record_from_dict(d: Dict) -> JobRecord:
+        return JobRecord(
+            job_id=d["job_id"],
+            state=JobState(d["state"]),
+            wallet=d.get("wallet"),
+            trade_details=d.get("trade_details"),
+            data=d.get("data") or {},
+            updated_at=d.get("updated_at", 0.0),
+        )
+
+    def _replay(self):
+        snapshot_seq = 0
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot.get("seq", 0)
+            for d in snapshot.get("jobs", []):
+                record = self._record_from_dict(d)
+                self._jobs[record.job_id] = record
+        self._seq = snapshot_seq
+
+        if not os.path.exists(self._journal_path):
+            return
+        good_offset = 0
+        with open(self._journal_path, "rb") as f:
+            for line in f:
+                try:
+                    # A line without its newline was cut off too, even if what is there parses
+                    if not line.endswith(b"\n"):
+                        raise ValueError("missing newline")
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                good_offset += len(line)
+                if entry["seq"] <= snapshot_seq:
+                    continue
+                self._apply(entry)
+                self._seq = entry["seq"]
+                self._entries_since_snapshot += 1
+            end = f.seek(0, os.SEEK_END)
+        if end > good_offset:
+            # A torn tail from a crash mid-write; cut it off so the next append starts on a clean line
+            print(f"[JOBS] Warning: dropping {end - good_offset} byte(s) of truncated journal entry")
+            with open(self._journal_path, "r+b") as f:
+                f.truncate(good_offset)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _apply(self, entry: Dict):
+        job_id = entry["job_id"]
+        state = JobState(entry["state"])
+        record = self._jobs.get(job_id)
+        if record is None:
+            record = JobRecord(job_id=job_id, state=state)
+            self._jobs[job_id] = record
+        record.state = state
+        if entry.get("wallet") is not None:
+            record.wallet = entry["wallet"]
+        if entry.get("trade_details") is not None:
+            record.trade_details = entry["trade_details"]
+        if entry.get("data"):
+            record.data.update(entry["data"])
+        record.updated_at = entry["ts"]
+
+    def _snapshot(self):
+        open_jobs = []
+        for record in self._jobs.values():
+            if record.state in TERMINAL_STATES:
+                continue
+            d = asdict(record)
+            d["state"] = record.state.value
+            open_jobs.append(d)
+        tmp_path = f"{self._snapshot_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"seq": self._seq, "jobs": open_jobs}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+        # Entries up to self._seq are now covered by the snapshot
+        self._journal.truncate(0)
+        self._jobs = {r.job_id: r for r in self._jobs.values() if r.state not in TERMINAL_STATES}
+        self._entries_since_snapshot = 0
+
+    def advance(
+        self,
+        job_id,
+        state: JobState,
+        wallet: Optional[Dict] = None,
+        trade_details: Optional[Dict] = None,
+        **data,
+    ) -> JobRecord:
+        """Move a job to ``state`` and durably record it. Raises ValueError on an illegal transition."""
+        job_id = str(job_id)
+        state = JobState(state)
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is not None and state != record.state:
+                allowed = _TRANSITIONS[record.state]
+                if state not in allowed and not (state == JobState.FAILED and record.state not in TERMINAL_STATES):
+                    raise ValueError(f"Illegal job transition {record.state.value} -> {state.value} for job {job_id}")
+
+            self._seq += 1
+            entry = {
+                "seq": self._seq,
+                "ts": time.time(),
+                "job_id": job_id,
+                "state": state.value,
+                "wallet": wallet,
+                "trade_details": trade_details,
+                "data": data or None,
+            }
+            self._journal.write(json.dumps(entry) + "\n")
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._apply(entry)
+            self._entries_since_snapshot += 1
+            record = self._jobs[job_id]
+            if self._entries_since_snapshot >= self.snapshot_every:
+                self._snapshot()
+            return record
+
+    def designated_wallet(self, job_id, generate: Callable[[], Dict]) -> Dict:
+        """The job's designated wallet, generating and journaling one only if it has none yet.
+
+        A redelivered REQUEST (or one replayed after a crash before NEGOTIATION
+        was recorded) must get the same wallet back: its address may already
+        have been published to the buyer, and replacing the key would strand
+        anything sent there.
+        """
+        with self._lock:
+            wallet = self.wallet(job_id)
+            if wallet:
+                return wallet
+            wallet = generate()
+            self.advance(job_id, JobState.REQUEST, wallet=wallet)
+            return wallet
+
+    def reconcile(self, store) -> List[JobRecord]:
+        """Catch open jobs up with the monitor's job store (a JobStore).
+
+        The monitor runs in its own process and only writes the job store, so
+        its funding and swap results reach the journal here: ``swapping``
+        moves a job to FUNDED, ``completed`` to SWAPPED (through FUNDED) and
+        ``failed`` to FAILED, each carrying the monitor's ``result``. Returns
+        the jobs that became SWAPPED or FAILED, i.e. those awaiting delivery.
+        """
+        finished = []
+        for job_id, record in self.open_jobs().items():
+            if record.state not in _SWAP_FLOW:
+                continue
+            try:
+                stored = store.get_job(job_id)
+            except Exception as e:
+                print(f"[JOBS] Could not read job {job_id} from the job store: {e}")
+                continue
+            target = _STORE_STATES.get(stored["status"]) if stored else None
+            if target is None or target == record.state:
+                continue
+            result = stored.get("result")
+            if target == JobState.FAILED:
+                finished.append(self.advance(job_id, JobState.FAILED, result=result))
+                continue
+            current = _SWAP_FLOW.index(record.state)
+            for state in _SWAP_FLOW[current + 1:_SWAP_FLOW.index(target) + 1]:
+                extra = {"result": result} if state == JobState.SWAPPED else {}
+                record = self.advance(job_id, state, **extra)
+            if record.state == JobState.SWAPPED:
+                finished.append(record)
+        return finished
+
+    def deliver_finished(self, store, deliver: Callable[[JobRecord], None]):
+        """Reconcile with ``store`` and hand each finished job to ``deliver``.
+
+        A SWAPPED job becomes DELIVERED once ``deliver`` returns; if it raises,
+        the job stays SWAPPED and is offered again on the next call. FAILED
+        jobs are already terminal, so their delivery is best effort.
+        """
+        finished = self.reconcile(store)
+        finished += [r for r in self.open_jobs().values() if r.state == JobState.SWAPPED and r not in finished]
+        for record in finished:
+            try:
+                deliver(record)
+            except Exception as e:
+                print(f"[JOBS] Delivery for job {record.job_id} ({record.state.value}) failed: {e}")
+                continue
+            if record.state == JobState.SWAPPED:
+                self.advance(record.job_id, JobState.DELIVERED)
+
+    def follow(self, store, deliver: Callable[[JobRecord], None], interval: float = JOB_FOLLOW_SECONDS) -> threading.Thread:
+        """Run ``deliver_finished`` every ``interval`` seconds on a daemon thread."""
+        def _run():
+            while True:
+                try:
+                    self.deliver_finished(store, deliver)
+                except Exception as e:
+                    print(f"[JOBS] Job follower error: {e}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=_run, name="job-follower", daemon=True)
+        thread.start()
+        return thread
+
+    def get(self, job_id) -> Optional[JobRecord]:
+        return self._jobs.get(str(job_id))
+
+    def wallet(self, job_id) -> Optional[Dict]:
+        record = self.get(job_id)
+        return record.wallet if record else None
+
+    def trade_details(self, job_id) -> Optional[Dict]:
+        record = self.get(job_id)
+        return record.trade_details if record else None
+
+    def open_jobs(self) -> Dict[str, JobRecord]:
+        return {job_id: r for job_id, r in self._jobs.items() if r.state not in TERMINAL_STATES}
+
+    def close(self):
+        with self._lock:
+            self._journal.close()
+
+
+_DEFAULT_JOURNAL: Optional[JobJournal] = None
+_DEFAULT_JOURNAL_LOCK = threading.Lock()
+
+
+def get_job_journal() -> JobJournal:
+    """Process-wide journal, replayed on first use."""
+    global _DEFAULT_JOURNAL
+    with _DEFAULT_JOURNAL_LOCK:
+        if _DEFAULT_JOURNAL is None:
+            _DEFAULT_JOURNAL = JobJournal()
+        return _DEFAULT_JOURNAL
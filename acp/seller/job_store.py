@@ -0,0 +1,181 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+JOBS_DIR = "/tmp/acp_jobs"
+DEFAULT_DB_PATH = os.getenv("ACP_JOBS_DB", os.path.join(JOBS_DIR, "jobs.db"))
+
+STATUS_WAITING = "waiting_for_funds"
+STATUS_SWAPPING = "swapping"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id         TEXT PRIMARY KEY,
+    status         TEXT NOT NULL,
+    wallet_address TEXT,
+    wallet_info    TEXT NOT NULL,
+    trade_details  TEXT NOT NULL,
+    result         TEXT,
+    created_at     REAL NOT NULL,
+    updated_at     REAL NOT NULL,
+    completed_at   REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name       TEXT PRIMARY KEY,
+    block      INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class JobStore:
+    """SQLite-backed handoff between the seller and the monitor.
+
+    The database runs in WAL mode so the monitor can read while the seller
+    writes, and the status index means a sweep only touches pending rows
+    instead of every job ever created. Each thread gets its own connection.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: transactions are managed explicitly below
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict:
+        job = {
+            "wallet_info": json.loads(row["wallet_info"]),
+            "trade_details": json.loads(row["trade_details"]),
+            "status": row["status"],
+            "created_at": row["created_at"],
+        }
+        if row["completed_at"] is not None:
+            job["completed_at"] = row["completed_at"]
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        return job
+
+    def save_job(
+        self,
+        job_id,
+        wallet_info: Dict,
+        trade_details: Dict,
+        status: str = STATUS_WAITING,
+        created_at: Optional[float] = None,
+    ):
+        now = time.time()
+        self._conn().execute(
+            """
+            INSERT INTO jobs (job_id, status, wallet_address, wallet_info, trade_details, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                status = excluded.status,
+                wallet_address = excluded.wallet_address,
+                wallet_info = excluded.wallet_info,
+                trade_details = excluded.trade_details,
+                updated_at = excluded.updated_at
+            """,
+            (
+                str(job_id),
+                status,
+                wallet_info.get("address"),
+                json.dumps(wallet_info),
+                json.dumps(trade_details),
+                created_at or now,
+                now,
+            ),
+        )
+
+    def get_job(self, job_id) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (str(job_id),)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def jobs_with_status(self, status: str = STATUS_WAITING) -> Dict[str, Dict]:
+        rows = self._conn().execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY created_at", (status,)
+        ).fetchall()
+        return {row["job_id"]: self._row_to_job(row) for row in rows}
+
+    def update_status(self, job_id, status: str, result_data=None, expected_status: Optional[str] = None) -> bool:
+        """Set a job's status in one transaction.
+
+        When ``expected_status`` is given the update only applies if the job is
+        still in that status, which lets callers claim a job exactly once.
+        Returns True if a row was updated.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            query = "UPDATE jobs SET status = ?, updated_at = ?, completed_at = ?"
+            params = [status, now, now if status in (STATUS_COMPLETED, STATUS_FAILED) else None]
+            if result_data:
+                query += ", result = ?"
+                params.append(json.dumps(result_data))
+            query += " WHERE job_id = ?"
+            params.append(str(job_id))
+            if expected_status is not None:
+                query += " AND status = ?"
+                params.append(expected_status)
+            updated = conn.execute(query, params).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return updated > 0
+
+    def get_checkpoint(self, name: str) -> Optional[int]:
+        row = self._conn().execute("SELECT block FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return int(row["block"]) if row else None
+
+    def set_checkpoint(self, name: str, block: int):
+        self._conn().execute(
+            """
+            INSERT INTO checkpoints (name, block, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET block = excluded.block, updated_at = excluded.updated_at
+            """,
+            (name, int(block), time.time()),
+        )
+
+    def import_json_dir(self, jobs_dir: str = JOBS_DIR) -> int:
+        """One-off migration of legacy /tmp/acp_jobs/*.json handoff files."""
+        imported = 0
+        for job_file in glob.glob(f"{jobs_dir}/*.json"):
+            job_id = os.path.basename(job_file).replace(".json", "")
+            try:
+                with open(job_file, "r") as f:
+                    job_data = json.load(f)
+                if self.get_job(job_id) is None:
+                    self.save_job(
+                        job_id,
+                        job_data["wallet_info"],
+                        job_data["trade_details"],
+                        status=job_data.get("status", STATUS_WAITING),
+                        created_at=job_data.get("created_at"),
+                    )
+                    imported += 1
+                os.rename(job_file, f"{job_file}.imported")
+            except Exception as e:
+                print(f"[JOBS] Error importing {job_file}: {e}")
+        return imported
@@ -14,8 +14,6 @@ from virtuals_acp.env import EnvSettings
 from virtuals_acp.configs import BASE_MAINNET_CONFIG
 from virtuals_acp.models import IDeliverable
 
-job_designated_wallets = {}  # GLOBAL storage for wallets
-job_trade_details = {}  
 
 # Make operari-server and operari-server/data importable to reuse modules
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
@@ -26,7 +24,9 @@ for p in (OPERARI_ROOT, OPERARI_DATA):
         sys.path.append(p)
 from acp.common.schemas import TradeRequest
 from data.crew.tools.tokenTools import TokenTransactionTool
-import csv
+from acp.common.tokens import get_token_registry
+from acp.seller.job_state import JobState, delivery_value, get_job_journal
+from acp.seller.job_store import JobStore
 
 
 load_dotenv(override=True)
@@ -43,8 +43,8 @@ def _parse_service_requirement(sr):
         except Exception:
             return {}
 
-_TOKENS_CACHE = None
 _TOKENS_CSV_PATH = os.path.join(OPERARI_ROOT, "tokens.csv")
+_TOKENS = get_token_registry(_TOKENS_CSV_PATH)
 
 
 def generate_new_wallet():
@@ -57,66 +57,27 @@ def generate_new_wallet():
         "private_key": private_key
     }
 
-def _load_tokens_csv():
-    global _TOKENS_CACHE
-    if _TOKENS_CACHE is not None:
-        return _TOKENS_CACHE
-    cache = {}
-    try:
-        with open(_TOKENS_CSV_PATH, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            # Expect header like: Token,Full Name,Contract Address,decimals
-            next(reader, None)
-            for row in reader:
-                if len(row) < 4:
-                    continue
-                sym = str(row[0]).strip()
-                addr = str(row[2]).strip()
-                try:
-                    dec = int(str(row[3]).strip())
-                except Exception:
-                    dec = 18
-                if sym:
-                    cache[sym.upper()] = {"address": addr, "decimals": dec}
-    except Exception as e:
-        print(f"[SELLER] Warning: failed to load tokens.csv at {_TOKENS_CSV_PATH}: {e}")
-    _TOKENS_CACHE = cache
-    return _TOKENS_CACHE
-
-
-def _resolve_token(value: str):
+_JOB_STORE = None
+
+
+def get_job_store():
+    global _JOB_STORE
+    if _JOB_STORE is None:
+        _JOB_STORE = JobStore()
+    return _JOB_STORE
+
+
+def _resolve_token(value: str, chain: str = "base"):
     """
     Returns tuple (address, decimals).
     Accepts symbol (e.g., 'USDC', 'ETH') or address (0x...).
     """
-    if not value:
-        raise ValueError("Token value is empty")
-    v = str(value).strip()
-    # Base canonical ETH (WETH) address used by TokenTransactionTool to skip approvals
-    ETH_ADDR = "0x4200000000000000000000000000000000000006"
-    if v.lower() == "eth":
-        return ETH_ADDR, 18
-    if v.startswith("0x") and len(v) == 42:
-        # Try to enrich decimals from CSV if present by matching address
-        tokens = _load_tokens_csv()
-        for sym, info in tokens.items():
-            if info.get("address", "").lower() == v.lower():
-                return info.get("address"), int(info.get("decimals", 18))
-        return v, 18
-    # Symbol path
-    tokens = _load_tokens_csv()
-    info = tokens.get(v.upper())
-    if not info:
-        raise ValueError(f"Unknown token symbol '{v}'. Please use address or add to tokens.csv")
-    return info.get("address"), int(info.get("decimals", 18))
+    return _TOKENS.resolve(value, chain)
 
 
 def seller():
     env = EnvSettings()
     
-    # Store designated wallets by job ID (use database in production)
-    global job_designated_wallets
-    
     global acp_instance
     acp_instance = VirtualsACP(
         wallet_private_key=env.WHITELISTED_WALLET_PRIVATE_KEY,
@@ -253,19 +214,20 @@ def seller():
     def on_new_task(job: ACPJob, memo_to_sign=None):
         print(f"[SELLER] on_new_task: phase={job.phase} job_id={getattr(job, 'id', None)} memos={len(job.memos)}")
         
-        # Dictionary to store designated wallets for each job
-        global job_designated_wallets
+        jobs = get_job_journal()
         
         if job.phase == ACPJobPhase.REQUEST:
             print("[SELLER] REQUEST received. Checking memos for NEGOTIATION transition...")
+            record = jobs.get(job.id)
+            if record is not None and record.state != JobState.REQUEST:
+                print(f"[SELLER] Job {job.id} already accepted ({record.state.value})")
+                return
             for memo in job.memos:
                 if memo.next_phase == ACPJobPhase.NEGOTIATION:
-                    # Generate designated wallet for this job
-                    designated_wallet = generate_new_wallet()
-                    print(f"[SELLER] Generated designated wallet: {designated_wallet['address']}")
-                    
-                    # Store the wallet info for later use (you might want to use a database)
-                    job_designated_wallets[job.id] = designated_wallet
+                    # Reuse the job's wallet on a redelivered REQUEST; a new one is
+                    # persisted (with its key) before its address is published
+                    designated_wallet = jobs.designated_wallet(job.id, generate_new_wallet)
+                    print(f"[SELLER] Designated wallet: {designated_wallet['address']}")
                     
                     # Respond with designated wallet and reporting API
                     job.respond(
@@ -274,6 +236,7 @@ def seller():
                         #reportingApiEndpoint="https://your-api.com/portfolio",  # Change this to your actual endpoint
                         reason="Ready to process trade"
                     )
+                    jobs.advance(job.id, JobState.NEGOTIATION)
                     break
         
         elif job.phase == ACPJobPhase.TRANSACTION:
@@ -295,13 +258,24 @@ def seller():
                 requirements = _parse_service_requirement(original_trade_memo.content)
                 tr = TradeRequest.from_dict(requirements)
 
-                job_designated_wallets[job.id] = designated_wallet
-                job_trade_details[job.id] = {
+                designated_wallet = jobs.wallet(job.id)
+                if not designated_wallet:
+                    print(f"[SELLER] ERROR: No designated wallet found for job {job.id}")
+                    return
+                if jobs.get(job.id).data.get('funds_requested'):
+                    print(f"[SELLER] Funds already requested for job {job.id}")
+                    return
+
+                _, sell_dec = _resolve_token(tr.fromToken, tr.chain)
+                trade_details = {
                     'fromToken': tr.fromToken,
                     'toToken': tr.toToken, 
                     'amount': tr.amount,
-                    'sell_decimals': 6
+                    'sell_decimals': sell_dec
                 }
+                jobs.advance(job.id, JobState.TRANSACTION, trade_details=trade_details)
+                # Hand the job to the monitor, which swaps once the wallet is funded
+                get_job_store().save_job(job.id, designated_wallet, trade_details)
                 print(f"[SELLER] Registered wallet for job {job.id}: {designated_wallet['address']}")
                 # You need access to the acp client instance - modify your seller setup:
                 # Store acp instance as global or pass it differently
@@ -312,6 +286,7 @@ def seller():
                     reason=f"Funds needed for {tr.fromToken}->{tr.toToken} swap",
                     nextPhase=ACPJobPhase.TRANSACTION
                 )
+                jobs.advance(job.id, JobState.TRANSACTION, funds_requested=True)
                 
             except Exception as e:
                 print(f"[SELLER] Error in funds request: {e}")
@@ -332,7 +307,7 @@ def seller():
     })
     print("[SELLER] Agent:", env.SELLER_AGENT_WALLET_ADDRESS, "Entity:", env.SELLER_ENTITY_ID)
 
-    VirtualsACP(
+    acp_instance = VirtualsACP(
         wallet_private_key=env.WHITELISTED_WALLET_PRIVATE_KEY,
         agent_wallet_address=env.SELLER_AGENT_WALLET_ADDRESS,
         on_new_task=on_new_task,
@@ -340,6 +315,14 @@ def seller():
         config=config,
     )
 
+    # Deliver swaps as the monitor finishes them and close the jobs in the journal
+    def deliver_result(record):
+        job = acp_instance.get_job_by_onchain_id(int(record.job_id))
+        job.deliver(IDeliverable(type="object", value=delivery_value(record)))
+        print(f"[SELLER] Delivered {record.state.value} result for job {record.job_id}")
+
+    get_job_journal().follow(get_job_store(), deliver_result)
+
     print("Waiting for new task...")
     threading.Event().wait()
 
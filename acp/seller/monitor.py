@@ -1,9 +1,6 @@
 import os
 import time
 import json
-import glob
-from web3 import Web3
-from web3.middleware import ExtraDataToPOAMiddleware
 
 import sys
 import os
@@ -17,80 +14,218 @@ for p in (OPERARI_ROOT, OPERARI_DATA):
         sys.path.append(p)
 
 from data.crew.tools.tokenTools import TokenTransactionTool
+from acp.common.amm import get_amm_quoter
+from acp.common.tokens import get_token_registry, swap_token
+from acp.common.web3_pool import get_web3
+from acp.seller.balances import BalanceFetcher
+from acp.seller.blocks import BlockFollower, touched_wallets
+from acp.seller.job_store import JobStore, JOBS_DIR, STATUS_SWAPPING, STATUS_WAITING
+from acp.seller.quote_aggregator import KyberRouteSource, QuoteRequest
+from acp.seller.swap_executor import SwapExecutor
+from acp.seller.transfer_scanner import TransferLogScanner
+from acp.seller.warm_quotes import QuoteKeeper, amm_price_probe, execute_warm_quote
 
-JOBS_DIR = "/tmp/acp_jobs"
+_TOKENS = get_token_registry(os.path.join(OPERARI_ROOT, "tokens.csv"))
+# Sub-calls per Multicall3 request when polling designated wallet balances
+BALANCE_CHUNK_SIZE = int(os.getenv("MONITOR_BALANCE_CHUNK", "200"))
+# "poll" sweeps every 15s; "blocks" checks only wallets touched by each new block
+MONITOR_MODE = os.getenv("MONITOR_MODE", "poll").lower()
+# In block mode, still sweep every pending wallet this often to catch internal ETH transfers
+FULL_SWEEP_BLOCKS = int(os.getenv("MONITOR_FULL_SWEEP_BLOCKS", "30"))
+# Swaps executed concurrently (each designated wallet's swaps still run in order)
+SWAP_WORKERS = int(os.getenv("MONITOR_SWAP_WORKERS", "8"))
+# Keep a ready-to-sign route for every waiting job so funded swaps skip the cold route build
+WARM_QUOTES = os.getenv("MONITOR_WARM_QUOTES", "1") == "1"
+
+_JOB_STORE = None
+_QUOTE_KEEPER = None
+
+
+def get_job_store():
+    global _JOB_STORE
+    if _JOB_STORE is None:
+        _JOB_STORE = JobStore()
+        imported = _JOB_STORE.import_json_dir(JOBS_DIR)
+        if imported:
+            print(f"[MONITOR] Imported {imported} legacy job files from {JOBS_DIR}")
+    return _JOB_STORE
 
 def load_pending_jobs():
-    """Load all pending jobs from files"""
-    jobs = {}
-    if not os.path.exists(JOBS_DIR):
-        return jobs
-    
-    for job_file in glob.glob(f"{JOBS_DIR}/*.json"):
-        try:
-            with open(job_file, 'r') as f:
-                job_data = json.load(f)
-            
-            job_id = os.path.basename(job_file).replace('.json', '')
-            if job_data.get('status') == 'waiting_for_funds':
-                jobs[job_id] = job_data
-                
-        except Exception as e:
-            print(f"[MONITOR] Error loading {job_file}: {e}")
-    
-    return jobs
+    """Load all pending jobs from the job store"""
+    try:
+        pending_jobs = get_job_store().jobs_with_status(STATUS_WAITING)
+    except Exception as e:
+        print(f"[MONITOR] Error loading pending jobs: {e}")
+        return {}
+    prefetch_job_tokens(pending_jobs)
+    return pending_jobs
+
+def prefetch_job_tokens(jobs):
+    """Read decimals for every job token missing from tokens.csv in one batch, before jobs resolve them one by one"""
+    tokens = set()
+    for job_data in jobs.values():
+        trade_details = job_data.get('trade_details') or {}
+        tokens.update(str(trade_details.get(k) or '').strip() for k in ('fromToken', 'toToken'))
+    try:
+        _TOKENS.prefetch(tokens)
+    except Exception as e:
+        print(f"[MONITOR] Token prefetch failed: {e}")
 
 def update_job_status(job_id, status, result_data=None):
-    """Update job status in file"""
-    job_file = f"{JOBS_DIR}/{job_id}.json"
-    
+    """Update job status in the job store"""
     try:
-        with open(job_file, 'r') as f:
-            job_data = json.load(f)
-        
-        job_data['status'] = status
-        job_data['completed_at'] = time.time()
-        if result_data:
-            job_data['result'] = result_data
-        
-        with open(job_file, 'w') as f:
-            json.dump(job_data, f)
-            
+        get_job_store().update_status(job_id, status, result_data)
         print(f"[MONITOR] Updated job {job_id} status to {status}")
         
     except Exception as e:
         print(f"[MONITOR] Error updating job status: {e}")
 
-def monitor_designated_wallets():
-    w3 = Web3(Web3.HTTPProvider(os.getenv("BASE_MAINNET_RPC_URL")))
-    w3.middleware_onion.inject(ExtraDataToPOAMiddleware(), layer=0)
+def _is_native_job(trade_details):
+    from_token = str(trade_details.get('fromToken', '')).strip()
+    return not from_token or from_token.lower() == 'eth'
+
+def _sell_token_address(trade_details):
+    """Token the designated wallet is funded with; None for native ETH"""
+    if _is_native_job(trade_details):
+        return None
+    from_token = str(trade_details.get('fromToken', '')).strip()
+    address, _ = _TOKENS.resolve(from_token)
+    return address
+
+def find_funded_jobs(fetcher, pending_jobs):
+    """Return [(job_id, balance)] for pending jobs whose wallet holds the sell token"""
+    wallets = {}
+    sell_tokens = {}
+    for job_id, job_data in pending_jobs.items():
+        wallet = job_data['wallet_info']['address']
+        try:
+            token = _sell_token_address(job_data['trade_details'])
+        except Exception as e:
+            print(f"[MONITOR] Skipping job {job_id}: {e}")
+            continue
+        sell_tokens[job_id] = token
+        wallets.setdefault(wallet, set())
+        if token:
+            wallets[wallet].add(token)
+
+    balances = fetcher.fetch(wallets)
+    tick = fetcher.last_tick
+    print(f"[MONITOR] Balance tick: {tick['wallets']} wallets, {tick['calls']} calls "
+          f"in {tick['chunks']} chunk(s), {tick['elapsed_ms']} ms")
+
+    funded = []
+    for job_id, token in sell_tokens.items():
+        entry = balances[pending_jobs[job_id]['wallet_info']['address']]
+        balance = entry['native'] if token is None else entry['tokens'].get(token)
+        if balance:
+            funded.append((job_id, balance))
+    return funded
+
+def find_transfer_funded_jobs(scanner, pending_jobs):
+    """Return [(job_id, amount)] for ERC-20 jobs whose wallet received the sell token since the last scan"""
+    token_jobs = {}
+    for job_id, job_data in pending_jobs.items():
+        try:
+            token = _sell_token_address(job_data['trade_details'])
+        except Exception as e:
+            print(f"[MONITOR] Skipping job {job_id}: {e}")
+            continue
+        if token:
+            token_jobs[job_id] = token
+
+    transfers = scanner.scan(pending_jobs[job_id]['wallet_info']['address'] for job_id in token_jobs)
+
+    funded = []
+    for job_id, token in token_jobs.items():
+        wallet = pending_jobs[job_id]['wallet_info']['address'].lower()
+        received = [t for t in transfers.get(wallet, []) if t['token'].lower() == token.lower()]
+        if received:
+            funded.append((job_id, sum(t['value'] for t in received)))
+    return funded
+
+def _build_route(request):
+    """Key-less TokenTransactionTool route build (nothing is signed or sent)"""
+    tool_resp_raw = TokenTransactionTool()._run(
+        buy_token=request.buy_token,
+        sell_token=request.sell_token,
+        sell_amount=request.sell_amount,
+        wallet_address=request.recipient,
+        sell_token_decimals=request.sell_decimals,
+    )
+    return json.loads(tool_resp_raw) if isinstance(tool_resp_raw, str) else tool_resp_raw
+
+def sync_warm_quotes(pending_jobs):
+    """Point the quote keeper at the jobs currently waiting for funds"""
+    if _QUOTE_KEEPER is None:
+        return
+    requests = {}
+    for job_id, job_data in pending_jobs.items():
+        trade_details = job_data['trade_details']
+        try:
+            sell_symbol, buy_symbol = str(trade_details.get('fromToken') or 'ETH'), str(trade_details['toToken'])
+            sell_addr, sell_dec = _TOKENS.resolve(sell_symbol)
+            buy_addr, buy_dec = _TOKENS.resolve(buy_symbol)
+            sell_addr, buy_addr = swap_token(sell_symbol, sell_addr), swap_token(buy_symbol, buy_addr)
+        except Exception as e:
+            print(f"[MONITOR] No warm quote for job {job_id}: {e}")
+            continue
+        requests[job_id] = QuoteRequest(
+            sell_addr, buy_addr, str(trade_details['amount']), sell_dec, buy_dec, job_data['wallet_info']['address']
+        )
+    _QUOTE_KEEPER.sync(requests)
+
+def run_swap_job(job_id, wallet_info, trade_details, warm=None):
+    # Execute swap and get result
+    swap_result = execute_swap_with_designated_wallet(
+        wallet_info, job_id, trade_details, warm
+    )
     
-    print("[MONITOR] Starting monitoring...")
+    # Update job status with result
+    if "error" in swap_result:
+        update_job_status(job_id, "failed", swap_result)
+    else:
+        update_job_status(job_id, "completed", swap_result)
+
+def process_funded_jobs(executor, pending_jobs, funded_jobs):
+    """Hand funded jobs to the swap executor so detection never waits on a swap"""
+    for job_id, balance in funded_jobs:
+        wallet_info = pending_jobs[job_id]['wallet_info']
+        trade_details = pending_jobs[job_id]['trade_details']
+        
+        # Claim the job first so later ticks cannot submit it twice
+        if not get_job_store().update_status(job_id, STATUS_SWAPPING, expected_status=STATUS_WAITING):
+            continue
+        
+        print(f"[MONITOR] Funds detected for job {job_id}: {balance} (base units)")
+        warm = _QUOTE_KEEPER.get(job_id) if _QUOTE_KEEPER is not None else None
+        executor.submit(wallet_info['address'], run_swap_job, job_id, wallet_info, trade_details, warm)
     
+    if executor.queue_depth or executor.in_flight:
+        print(f"[MONITOR] Swaps queued: {executor.queue_depth}, in flight: {executor.in_flight}")
+
+def monitor_by_polling(w3, fetcher, executor):
+    scanner = TransferLogScanner(w3, get_job_store())
+    seen_jobs = set()
     while True:
         try:
-            # FIXED: Load from files instead of global variables
+            # Only jobs still waiting for funds are read (indexed by status)
             pending_jobs = load_pending_jobs()
+            sync_warm_quotes(pending_jobs)
             
-            for job_id, job_data in pending_jobs.items():
-                wallet_info = job_data['wallet_info']
-                trade_details = job_data['trade_details']
-                
-                balance = w3.eth.get_balance(wallet_info['address'])
-                
-                if balance > 0:
-                    print(f"[MONITOR] Funds detected for job {job_id}: {balance} wei")
-                    
-                    # Execute swap and get result
-                    swap_result = execute_swap_with_designated_wallet(
-                        wallet_info, job_id, trade_details
-                    )
-                    
-                    # Update job status with result
-                    if "error" in swap_result:
-                        update_job_status(job_id, "failed", swap_result)
-                    else:
-                        update_job_status(job_id, "completed", swap_result)
+            # ERC-20 funding comes from Transfer logs since the last checkpoint
+            funded = dict(find_transfer_funded_jobs(scanner, pending_jobs))
+            
+            # Native-ETH jobs, and new jobs whose funds may predate the checkpoint, need a balance read
+            to_check = {
+                job_id: job for job_id, job in pending_jobs.items()
+                if job_id not in funded and (job_id not in seen_jobs or _is_native_job(job['trade_details']))
+            }
+            seen_jobs.update(pending_jobs)
+            if to_check:
+                funded.update(find_funded_jobs(fetcher, to_check))
+            
+            if funded:
+                process_funded_jobs(executor, pending_jobs, list(funded.items()))
             
             time.sleep(15)
             
@@ -98,11 +233,83 @@ def monitor_designated_wallets():
             print(f"[MONITOR] Error: {e}")
             time.sleep(30)
 
-def execute_swap_with_designated_wallet(wallet_info, job_id, trade_details):
+def monitor_by_blocks(w3, fetcher, executor):
+    """Check only the wallets each new block touched instead of sweeping on a timer"""
+    follower = BlockFollower(w3)
+    seen_jobs = set()
+    blocks_since_sweep = 0
+    while True:
+        try:
+            for block_number in follower.new_blocks():
+                pending_jobs = load_pending_jobs()
+                sync_warm_quotes(pending_jobs)
+                if not pending_jobs:
+                    continue
+                
+                blocks_since_sweep += 1
+                if blocks_since_sweep >= FULL_SWEEP_BLOCKS:
+                    blocks_since_sweep = 0
+                    to_check = pending_jobs
+                else:
+                    wallets = {job['wallet_info']['address'] for job in pending_jobs.values()}
+                    touched = touched_wallets(w3, block_number, wallets)
+                    # New jobs get one full check in case funds landed before registration
+                    to_check = {
+                        job_id: job for job_id, job in pending_jobs.items()
+                        if job_id not in seen_jobs or job['wallet_info']['address'].lower() in touched
+                    }
+                seen_jobs.update(pending_jobs)
+                
+                if to_check:
+                    process_funded_jobs(executor, pending_jobs, find_funded_jobs(fetcher, to_check))
+                    
+        except Exception as e:
+            print(f"[MONITOR] Error: {e}")
+            time.sleep(5)
+
+def monitor_designated_wallets():
+    global _QUOTE_KEEPER
+    w3 = get_web3(os.getenv("BASE_MAINNET_RPC_URL"), poa=True)
+    fetcher = BalanceFetcher(w3, chunk_size=BALANCE_CHUNK_SIZE)
+    if WARM_QUOTES:
+        # With AMM_POOLS set, local pool quotes flag price moves between route rebuilds
+        quoter = get_amm_quoter(w3)
+        probe = amm_price_probe(quoter) if quoter is not None else None
+        _QUOTE_KEEPER = QuoteKeeper(w3, KyberRouteSource(w3, _build_route), price_probe=probe)
+    
+    executor = SwapExecutor(max_workers=SWAP_WORKERS)
+    
+    stuck = get_job_store().jobs_with_status(STATUS_SWAPPING)
+    if stuck:
+        # A crash mid-swap may or may not have sent the transaction; never retry blindly
+        print(f"[MONITOR] Warning: {len(stuck)} job(s) were mid-swap at last shutdown: {list(stuck)}")
+    
+    print(f"[MONITOR] Starting monitoring (mode={MONITOR_MODE}, swap workers={SWAP_WORKERS}, warm quotes={WARM_QUOTES})...")
+    
+    try:
+        if MONITOR_MODE == "blocks":
+            monitor_by_blocks(w3, fetcher, executor)
+        else:
+            monitor_by_polling(w3, fetcher, executor)
+    except KeyboardInterrupt:
+        print(f"[MONITOR] Shutting down; draining {executor.queue_depth + executor.in_flight} swap(s)...")
+        executor.shutdown(wait=True)
+
+def execute_swap_with_designated_wallet(wallet_info, job_id, trade_details, warm=None):
     """Execute swap using designated wallet's private key"""
     try:
         print(f"[MONITOR] Executing swap for job {job_id}")
         
+        # A warm route still within its validity window is signed and sent as-is
+        if warm is not None and _QUOTE_KEEPER is not None and _QUOTE_KEEPER.is_fresh(warm):
+            w3 = get_web3(os.getenv("BASE_MAINNET_RPC_URL"), poa=True)
+            result = execute_warm_quote(w3, warm, wallet_info['private_key'])
+            if result is not None:
+                return result
+            print(f"[MONITOR] Warm route for job {job_id} needs an approval; building cold")
+        elif warm is not None:
+            print(f"[MONITOR] Warm route for job {job_id} went stale; building cold")
+        
         # Use your existing TokenTransactionTool but with DESIGNATED wallet
         tool = TokenTransactionTool()
         
@@ -0,0 +1,249 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+from web3 import Web3
+
+from acp.common.fees import get_fee_oracle
+from acp.common.gas import get_gas_estimator
+from acp.common.kyber import DESC_MIN_RETURN, NATIVE_TOKEN, decode_swap
+
+
+QUOTE_RACE_DEADLINE_MS = int(os.getenv("QUOTE_RACE_DEADLINE_MS", "3000"))
+# With executable_only, how long past the start to keep waiting for the first quote with calldata
+QUOTE_EXECUTABLE_DEADLINE_MS = int(os.getenv("QUOTE_EXECUTABLE_DEADLINE_MS", "15000"))
+DEFAULT_SWAP_GAS = 200000
+
+
+def _to_raw(amount, decimals: int) -> int:
+    return int(Decimal(str(amount)) * (Decimal(10) ** decimals))
+
+
+class QuoteRequest:
+    """One swap to price: token addresses, human-readable sell amount and the recipient.
+
+    Native ETH is the NATIVE_TOKEN sentinel (see ``tokens.swap_token``); the
+    WETH address is the ERC-20.
+    """
+
+    def __init__(self, sell_token: str, buy_token: str, sell_amount: str, sell_decimals: int, buy_decimals: int, recipient: str, slippage_pct: float = 0.5):
+        self.sell_token = sell_token
+        self.buy_token = buy_token
+        self.sell_amount = str(sell_amount)
+        self.sell_decimals = int(sell_decimals)
+        self.buy_decimals = int(buy_decimals)
+        self.recipient = recipient
+        self.slippage_pct = slippage_pct
+
+    @property
+    def sell_is_native(self) -> bool:
+        return self.sell_token.lower() == NATIVE_TOKEN
+
+    @property
+    def buy_is_native(self) -> bool:
+        return self.buy_token.lower() == NATIVE_TOKEN
+
+
+class SourceQuote:
+    """A source's answer: guaranteed output in raw buy-token units, gas, and calldata if executable."""
+
+    def __init__(self, source: str, amount_out: int, gas: int, tx_data: Optional[Dict] = None, raw=None):
+        self.source = source
+        self.amount_out = amount_out
+        self.gas = gas
+        self.tx_data = tx_data
+        self.raw = raw
+        self.latency: Optional[float] = None
+        self.net_out: Optional[int] = None
+
+
+class KyberRouteSource:
+    """KyberSwap route built by TokenTransactionTool, via ``build_route(request) -> tool response``.
+
+    The output used is the calldata's ``minReturnAmount`` (what the router
+    guarantees after slippage); gas is the learned per-route estimate.
+    """
+
+    name = "kyberswap"
+
+    def __init__(self, w3: Web3, build_route: Callable[[QuoteRequest], Dict]):
+        self.w3 = w3
+        self.build_route = build_route
+
+    def quote(self, request: QuoteRequest) -> SourceQuote:
+        tool_resp = self.build_route(request)
+        if "error" in tool_resp:
+            raise RuntimeError(tool_resp.get("error"))
+        tx_section = tool_resp.get("transaction", {})
+        tx_data = tx_section.get("transactionData") or tx_section.get("transaction") or {}
+        decoded = decode_swap(tx_data.get("data") or "0x")
+        if decoded is None:
+            raise RuntimeError("KyberSwap route calldata is not a router swap")
+        tx = {
+            "from": request.recipient,
+            "to": Web3.to_checksum_address(tx_data["to"]),
+            "data": tx_data["data"],
+            "value": int(tx_data.get("value") or "0"),
+        }
+        gas = get_gas_estimator(self.w3).estimate(
+            tx, (request.sell_token, request.buy_token), fallback=int(tx_data.get("gas") or DEFAULT_SWAP_GAS)
+        )
+        return SourceQuote(self.name, decoded[2][DESC_MIN_RETURN], gas, tx_data, tool_resp)
+
+
+class TradeServiceSource:
+    """Quote from the defai trade service (a TradeServiceClient).
+
+    Amounts in its responses are human-readable; ``minAmountOut`` is used
+    when present so the comparison with KyberSwap's minimum return is like
+    for like. The quote is executable only if the response carries calldata.
+    """
+
+    name = "trade-service"
+
+    def __init__(self, client):
+        self.client = client
+
+    def quote(self, request: QuoteRequest) -> SourceQuote:
+        if request.sell_is_native:
+            resp = self.client.quote_eth_to_token(request.sell_amount, request.buy_token, request.recipient, request.slippage_pct)
+        elif request.buy_is_native:
+            resp = self.client.quote_token_to_eth(request.sell_amount, request.sell_token, request.recipient, request.slippage_pct)
+        else:
+            resp = self.client.quote_token_to_token(
+                request.sell_amount, request.sell_token, request.buy_token, request.recipient, request.slippage_pct
+            )
+        data = resp.get("data") or {}
+        amount = data.get("minAmountOut") or data.get("amountOut")
+        if amount is None:
+            raise RuntimeError(f"Trade service quote has no output amount: {data}")
+        tx_data = data.get("transaction") or data.get("tx")
+        tx_data = tx_data if isinstance(tx_data, dict) and tx_data.get("to") and tx_data.get("data") else None
+        gas = int((tx_data or {}).get("gas") or data.get("gas") or data.get("estimatedGas") or DEFAULT_SWAP_GAS)
+        return SourceQuote(self.name, _to_raw(amount, request.buy_decimals), gas, tx_data, resp)
+
+
+class RaceResult:
+    def __init__(self, best: Optional[SourceQuote], quotes: List[SourceQuote], latencies: Dict[str, float], failed: Dict[str, str], dropped: List[str]):
+        self.best = best
+        self.quotes = quotes
+        self.latencies = latencies
+        self.failed = failed
+        self.dropped = dropped
+
+    def summary(self) -> str:
+        parts = []
+        for quote in sorted(self.quotes, key=lambda q: q.net_out, reverse=True):
+            parts.append(f"{quote.source} net {quote.net_out} ({quote.latency * 1000:.0f} ms)")
+        parts += [f"{name} failed ({error})" for name, error in self.failed.items()]
+        parts += [f"{name} missed deadline" for name in self.dropped]
+        winner = self.best.source if self.best else "none"
+        return f"winner {winner}: " + ", ".join(parts)
+
+
+class QuoteAggregator:
+    """Races every quote source for a swap under one hard deadline.
+
+    All sources are asked at once; those that have not answered ``deadline``
+    seconds later are dropped (their calls finish in the background and are
+    ignored). Answers are ranked by net output: the guaranteed output minus
+    the gas cost (gas x current base fee + tip) priced in the buy token.
+    Gas is priced exactly when either side of the swap is ETH; for
+    token-to-token swaps it only breaks ties. With ``executable_only`` the
+    winner is the best quote that carries calldata; if none has arrived by
+    the deadline, the race keeps waiting for the first one that does rather
+    than failing a swap whose route build is merely slow, up to
+    ``executable_deadline_ms`` from the start. Past that the remaining
+    sources are dropped and there is no winner.
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        sources: List,
+        deadline_ms: int = QUOTE_RACE_DEADLINE_MS,
+        max_workers: int = 8,
+        executable_deadline_ms: int = QUOTE_EXECUTABLE_DEADLINE_MS,
+    ):
+        self.w3 = w3
+        self.sources = sources
+        self.deadline = deadline_ms / 1000.0
+        self.executable_deadline = max(deadline_ms, executable_deadline_ms) / 1000.0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quote-race")
+        self._lock = threading.Lock()
+        self._wins: Dict[str, int] = {source.name: 0 for source in sources}
+
+    @property
+    def wins(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._wins)
+
+    def _gas_price(self) -> int:
+        fees = get_fee_oracle(self.w3).fees()
+        # maxFeePerGas carries 2x headroom over the base fee; what is actually paid is base + tip
+        base_fee = (fees["maxFeePerGas"] - fees["maxPriorityFeePerGas"]) // 2
+        return base_fee + fees["maxPriorityFeePerGas"]
+
+    def _net(self, quote: SourceQuote, request: QuoteRequest, gas_price: Optional[int]) -> int:
+        if gas_price is None:
+            return quote.amount_out
+        gas_wei = quote.gas * gas_price
+        if request.buy_is_native:
+            return quote.amount_out - gas_wei
+        if request.sell_is_native:
+            sell_wei = _to_raw(request.sell_amount, 18)
+            return quote.amount_out - gas_wei * quote.amount_out // max(1, sell_wei)
+        return quote.amount_out
+
+    def _timed(self, source, request: QuoteRequest) -> SourceQuote:
+        started = time.monotonic()
+        quote = source.quote(request)
+        quote.latency = time.monotonic() - started
+        return quote
+
+    @staticmethod
+    def _collect(done, futures, started: float, quotes: List[SourceQuote], failed: Dict[str, str], latencies: Dict[str, float]):
+        for future in done:
+            name = futures[future]
+            if future.exception() is not None:
+                failed[name] = str(future.exception())
+                latencies[name] = time.monotonic() - started
+                continue
+            quotes.append(future.result())
+            latencies[name] = future.result().latency
+
+    def race(self, request: QuoteRequest, executable_only: bool = False) -> RaceResult:
+        started = time.monotonic()
+        futures = {self._pool.submit(self._timed, source, request): source.name for source in self.sources}
+        done, not_done = wait(futures, timeout=self.deadline)
+        quotes, failed, latencies = [], {}, {}
+        self._collect(done, futures, started, quotes, failed, latencies)
+        while executable_only and not_done and not any(q.tx_data for q in quotes):
+            # Past the deadline with nothing executable yet: take the first executable answer,
+            # but never let a hung route build hold the job past the hard cap
+            remaining = self.executable_deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, not_done = wait(not_done, timeout=remaining, return_when=FIRST_COMPLETED)
+            self._collect(done, futures, started, quotes, failed, latencies)
+        dropped = [futures[f] for f in not_done]
+
+        try:
+            gas_price = self._gas_price()
+        except Exception as e:
+            print(f"[QUOTES] Gas price unavailable ({e}); ranking on gross output")
+            gas_price = None
+        for quote in quotes:
+            quote.net_out = self._net(quote, request, gas_price)
+
+        candidates = [q for q in quotes if q.tx_data] if executable_only else quotes
+        best = max(candidates, key=lambda q: (q.net_out, -q.gas), default=None)
+        if best is not None:
+            with self._lock:
+                self._wins[best.source] = self._wins.get(best.source, 0) + 1
+        result = RaceResult(best, quotes, latencies, failed, dropped)
+        print(f"[QUOTES] {request.sell_amount} {request.sell_token} -> {request.buy_token}: {result.summary()}")
+        return result
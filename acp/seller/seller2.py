@@ -24,7 +24,16 @@ for p in (OPERARI_ROOT, OPERARI_DATA):
 from acp.common.schemas import TradeRequest
 from data.crew.tools.tokenTools import TokenTransactionTool
 from data.utils import check_token_approval, approve_unlimited
-import csv
+from acp.common.tokens import get_token_registry, swap_token
+from acp.common.fees import fee_fields
+from acp.common.gas import get_gas_estimator
+from acp.common.receipts import off_tracker
+from acp.common.replacements import send_transaction
+from acp.common.singleflight import SingleFlight
+from acp.common.web3_pool import get_web3
+from acp.seller.quote_aggregator import KyberRouteSource, QuoteAggregator, QuoteRequest, TradeServiceSource
+from acp.seller.swap_batcher import get_swap_batcher
+from acp.seller.trade_client import TradeServiceClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -49,134 +58,144 @@ def _parse_service_requirement(sr):
 # Fallbacks:
 # - 'ETH' maps to Base canonical ETH address with 18 decimals
 # - If already an address (0x...), assume 18 decimals unless found in CSV
-_TOKENS_CACHE = None
 _TOKENS_CSV_PATH = os.path.join(OPERARI_ROOT, "tokens.csv")
+_TOKENS = get_token_registry(_TOKENS_CSV_PATH)
 
 
-def _load_tokens_csv():
-    global _TOKENS_CACHE
-    if _TOKENS_CACHE is not None:
-        return _TOKENS_CACHE
-    cache = {}
-    try:
-        with open(_TOKENS_CSV_PATH, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            # Expect header like: Token,Full Name,Contract Address,decimals
-            next(reader, None)
-            for row in reader:
-                if len(row) < 4:
-                    continue
-                sym = str(row[0]).strip()
-                addr = str(row[2]).strip()
-                try:
-                    dec = int(str(row[3]).strip())
-                except Exception:
-                    dec = 18
-                if sym:
-                    cache[sym.upper()] = {"address": addr, "decimals": dec}
-    except Exception as e:
-        print(f"[SELLER] Warning: failed to load tokens.csv at {_TOKENS_CSV_PATH}: {e}")
-    _TOKENS_CACHE = cache
-    return _TOKENS_CACHE
-
-
-def _resolve_token(value: str):
+def _resolve_token(value: str, chain: str = "base"):
     """
     Returns tuple (address, decimals).
     Accepts symbol (e.g., 'USDC', 'ETH') or address (0x...).
     """
-    if not value:
-        raise ValueError("Token value is empty")
-    v = str(value).strip()
-    # Base canonical ETH (WETH) address used by TokenTransactionTool to skip approvals
-    ETH_ADDR = "0x4200000000000000000000000000000000000006"
-    if v.lower() == "eth":
-        return ETH_ADDR, 18
-    if v.startswith("0x") and len(v) == 42:
-        # Try to enrich decimals from CSV if present by matching address
-        tokens = _load_tokens_csv()
-        for sym, info in tokens.items():
-            if info.get("address", "").lower() == v.lower():
-                return info.get("address"), int(info.get("decimals", 18))
-        return v, 18
-    # Symbol path
-    tokens = _load_tokens_csv()
-    info = tokens.get(v.upper())
-    if not info:
-        raise ValueError(f"Unknown token symbol '{v}'. Please use address or add to tokens.csv")
-    return info.get("address"), int(info.get("decimals", 18))
+    return _TOKENS.resolve(value, chain)
 
 
-def execute_swap_transaction(tx_data, private_key, rpc_url):
+# Identical route builds running at the same time (same pair, amount and recipient) share one KyberSwap call
+_ROUTE_FLIGHTS = SingleFlight("routes")
+
+
+def build_swap_route(buy_addr, sell_addr, sell_amount, wallet_address, sell_decimals):
+    """Parsed TokenTransactionTool route (built without a key, so nothing is sent)."""
+    def _build():
+        tool_resp_raw = TokenTransactionTool()._run(
+            buy_token=buy_addr,
+            sell_token=sell_addr,
+            sell_amount=sell_amount,
+            wallet_address=wallet_address,
+            sell_token_decimals=sell_decimals,
+        )
+        return json.loads(tool_resp_raw) if isinstance(tool_resp_raw, str) else tool_resp_raw
+
+    key = (buy_addr.lower(), sell_addr.lower(), sell_amount, wallet_address.lower(), sell_decimals)
+    return _ROUTE_FLIGHTS.do(key, _build)
+
+
+_AGGREGATOR = None
+_AGGREGATOR_LOCK = threading.Lock()
+
+
+def get_quote_aggregator(rpc_url):
+    """KyberSwap always; the trade service too when TRADE_SERVICE_BASE_URL is configured."""
+    global _AGGREGATOR
+    with _AGGREGATOR_LOCK:
+        if _AGGREGATOR is None:
+            w3 = get_web3(rpc_url)
+            sources = [KyberRouteSource(w3, lambda r: build_swap_route(
+                r.buy_token, r.sell_token, r.sell_amount, r.recipient, r.sell_decimals
+            ))]
+            if os.getenv("TRADE_SERVICE_BASE_URL"):
+                sources.append(TradeServiceSource(TradeServiceClient(block_number=lambda: w3.eth.block_number)))
+            _AGGREGATOR = QuoteAggregator(w3, sources)
+        return _AGGREGATOR
+
+
+def send_swap_transaction(tx_data, private_key, rpc_url, token_pair=None):
     """
-    Execute the actual swap transaction on-chain.
-    Returns the transaction hash on success, None on failure.
+    Sign and broadcast the swap transaction without waiting for it to be mined.
+    token_pair (sell, buy) keys the learned gas limit for this route.
+    Returns a TxHandle resolving to the receipt, or None if it could not be sent.
     """
     try:
-        web3 = Web3(Web3.HTTPProvider(rpc_url))
-        if not web3.is_connected():
-            print("[SELLER] Failed to connect to RPC")
-            return None
+        web3 = get_web3(rpc_url)
         
         account = web3.eth.account.from_key(private_key)
         wallet_address = account.address
-        nonce = web3.eth.get_transaction_count(wallet_address)
 
         tx_value = int(tx_data.get('value') or '0')
-        tx_gas = int(tx_data.get('gas') or '200000')
         
         transaction = {
+            'from': wallet_address,
             'to': web3.to_checksum_address(tx_data['to']),
             'data': tx_data['data'],
             'value': tx_value,
-            'gas': tx_gas,
-            'gasPrice': web3.eth.gas_price,
-            'nonce': nonce,
-            'chainId': 8453
+            'chainId': 8453,
+            **fee_fields(web3),
         }
+        # Learned from past receipts on this route; the router's own figure is the fallback
+        gas = get_gas_estimator(web3)
+        transaction['gas'] = gas.estimate(transaction, token_pair, fallback=int(tx_data.get('gas') or '200000'))
         
         print(f"[SELLER] Executing swap transaction for: {wallet_address}")
-        signed_txn = web3.eth.account.sign_transaction(transaction, private_key)
-        tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-        print(f"[SELLER] Transaction sent: {tx_hash.hex()}")
-        
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-        
-        if receipt.status == 1:
-            print(f"[SELLER] Swap successful! Gas used: {receipt.gasUsed}")
-            return tx_hash.hex()
-        else:
-            print(f"[SELLER] Swap failed! Transaction reverted")
-            return None
+        handle = send_transaction(web3, transaction, private_key)
+        print(f"[SELLER] Transaction sent: {handle.tx_hash}")
+        gas.record_when_mined(handle, transaction, token_pair)
+        return handle
             
     except Exception as e:
         print(f"[SELLER] Swap execution error: {e}")
         return None
 
+
+def swap_result(handle):
+    """
+    Outcome of a tracked swap (blocks until it resolves).
+    Returns the transaction hash on success, None on failure.
+    """
+    error = handle.exception()
+    if error is not None:
+        print(f"[SELLER] Swap execution error: {error}")
+        return None
+    
+    receipt = handle.receipt()
+    if receipt.status == 1:
+        print(f"[SELLER] Swap successful! Gas used: {receipt.gasUsed}")
+        return handle.tx_hash
+    else:
+        print(f"[SELLER] Swap failed! Transaction reverted")
+        return None
+
+
+def execute_swap_transaction(tx_data, private_key, rpc_url):
+    """
+    Execute the actual swap transaction on-chain.
+    Returns the transaction hash on success, None on failure.
+    """
+    handle = send_swap_transaction(tx_data, private_key, rpc_url)
+    return swap_result(handle) if handle is not None else None
+
 def execute_approval_transaction(approval_data, private_key, rpc_url):
     """
     Execute token approval transaction if needed.
     Returns True on success, False on failure.
     """
     try:
-        web3 = Web3(Web3.HTTPProvider(rpc_url))
+        web3 = get_web3(rpc_url)
         account = web3.eth.account.from_key(private_key)
-        nonce = web3.eth.get_transaction_count(account.address)
         
         approval_tx = {
+            'from': account.address,
             'to': web3.to_checksum_address(approval_data['to']),
             'data': approval_data['data'],
             'value': 0,
-            'gas': int(approval_data.get('gas', '100000')),
-            'gasPrice': web3.to_wei(float(approval_data.get('gasPriceGwei', '0.1')), 'gwei'),
-            'nonce': nonce
+            'chainId': 8453,
+            **fee_fields(web3),
         }
+        gas = get_gas_estimator(web3)
+        approval_tx['gas'] = gas.estimate(approval_tx, fallback=int(approval_data.get('gas', '100000')))
         
         print("[SELLER] Executing approval transaction...")
-        signed_txn = web3.eth.account.sign_transaction(approval_tx, private_key)
-        tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-        
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
+        receipt = send_transaction(web3, approval_tx, private_key).receipt()
+        gas.record(approval_tx, receipt)
         
         if receipt.status == 1:
             print("[SELLER] Approval successful!")
@@ -267,35 +286,29 @@ def seller():
                 requirements = _parse_service_requirement(original_trade_memo.content)
                 tr = TradeRequest.from_dict(requirements)
                 
-                # Resolve tokens and decimals
-                sell_addr, sell_dec = _resolve_token(tr.fromToken)
-                buy_addr, _ = _resolve_token(tr.toToken)
+                # Resolve tokens and decimals; ETH is routed as native ETH so the batcher can group it
+                sell_addr, sell_dec = _resolve_token(tr.fromToken, tr.chain)
+                buy_addr, buy_dec = _resolve_token(tr.toToken, tr.chain)
+                sell_addr, buy_addr = swap_token(tr.fromToken, sell_addr), swap_token(tr.toToken, buy_addr)
                 
                 # --- The key change: Use the designated wallet address for the swap. ---
                 web3 = Web3()
                 account = web3.eth.account.from_key(designated_wallet_private_key)
                 recipient = account.address
     
-                # Build using Operari internal tool (KyberSwap)
-                tool = TokenTransactionTool()
-                tool_resp_raw = tool._run(
-                    buy_token=buy_addr,
-                    sell_token=sell_addr,
-                    sell_amount=str(tr.amount),
-                    wallet_address=recipient,
-                    sell_token_decimals=int(sell_dec),
+                # Race every configured quote source (KyberSwap via the Operari tool,
+                # plus the trade service if set up) and execute the best net of gas
+                rpc_url = os.getenv("BASE_MAINNET_RPC_URL")
+                race = get_quote_aggregator(rpc_url).race(
+                    QuoteRequest(sell_addr, buy_addr, str(tr.amount), int(sell_dec), int(buy_dec), recipient, tr.slippage_percent()),
+                    executable_only=True,
                 )
-    
-                # Parse tool response
-                tool_resp = json.loads(tool_resp_raw) if isinstance(tool_resp_raw, str) else tool_resp_raw
-                if "error" in tool_resp:
-                    raise RuntimeError(tool_resp.get("error"))
-    
-                tx_section = tool_resp.get("transaction", {})
-                tx_data = tx_section.get("transactionData") or tx_section.get("transaction") or {}
+                if race.best is None:
+                    errors = "; ".join(f"{name}: {error}" for name, error in race.failed.items())
+                    raise RuntimeError(f"No executable quote ({errors or 'no source returned calldata'})")
+                tx_data = race.best.tx_data
 
                 # --- NEW LOGIC: DIRECTLY EXECUTE TRANSACTIONS ---
-                rpc_url = os.getenv("BASE_MAINNET_RPC_URL")
                 KYBER_ROUTER_ADDRESS = "0x6131B5fae19EA4f9D964eAc0408E4408b66337b5"
                 '''
                 # Check and grant approval
@@ -320,41 +333,65 @@ def seller():
                 else:
                     print(f"[SELLER] Token {sell_addr} already approved for spender.")
                 '''
-                # Execute the swap transaction
+                # Queue the swap with the wallet's batcher (native sells in the same
+                # window share one transaction) and deliver from its result, so this
+                # callback does not sit on the SDK's thread while the swap is mined
                 print("[SELLER] Executing swap transaction...")
-                tx_hash = execute_swap_transaction(tx_data, designated_wallet_private_key, rpc_url)
+                swap_future = get_swap_batcher(get_web3(rpc_url), designated_wallet_private_key).submit(
+                    job.id, tx_data, token_pair=(sell_addr, buy_addr)
+                )
     
-                if tx_hash:
-                    delivery_data = IDeliverable(
-                        type="object",
-                        value={
-                            "status": "SUCCESS",
-                            "message": "Swap completed.",
-                            "transaction_hash": tx_hash,
-                            "metadata": {
-                                "sellToken": tr.fromToken,
-                                "buyToken": tr.toToken,
-                                "sellAmount": tr.amount
-                            }
-                        }
-                    )
-                    job.deliver(delivery_data)
-                    print(f"[SELLER] Delivered successful swap status. Tx hash: {tx_hash}")
-                else:
-                    delivery_data = IDeliverable(
-                        type="object",
-                        value={
-                            "status": "FAILURE",
-                            "message": "Swap execution failed on-chain.",
-                            "metadata": {
-                                "sellToken": tr.fromToken,
-                                "buyToken": tr.toToken,
-                                "sellAmount": tr.amount
-                            }
-                        }
-                    )
-                    job.deliver(delivery_data)
-                    print("[SELLER] Delivered failed swap status.")
+                def deliver_swap_result(future):
+                    try:
+                        try:
+                            result = future.result()
+                            tx_hash = result["tx_hash"] if result["success"] else None
+                        except Exception as e:
+                            print(f"[SELLER] Swap execution error: {e}")
+                            tx_hash = None
+                        if tx_hash:
+                            delivery_data = IDeliverable(
+                                type="object",
+                                value={
+                                    "status": "SUCCESS",
+                                    "message": "Swap completed.",
+                                    "transaction_hash": tx_hash,
+                                    "metadata": {
+                                        "sellToken": tr.fromToken,
+                                        "buyToken": tr.toToken,
+                                        "sellAmount": tr.amount
+                                    }
+                                }
+                            )
+                            job.deliver(delivery_data)
+                            print(f"[SELLER] Delivered successful swap status. Tx hash: {tx_hash}")
+                        else:
+                            delivery_data = IDeliverable(
+                                type="object",
+                                value={
+                                    "status": "FAILURE",
+                                    "message": "Swap execution failed on-chain.",
+                                    "metadata": {
+                                        "sellToken": tr.fromToken,
+                                        "buyToken": tr.toToken,
+                                        "sellAmount": tr.amount
+                                    }
+                                }
+                            )
+                            job.deliver(delivery_data)
+                            print("[SELLER] Delivered failed swap status.")
+                    except Exception as e:
+                        print(f"[SELLER] Error delivering swap result: {e}")
+                        job.deliver(IDeliverable(
+                            type="object",
+                            value={
+                                "error": "DELIVERY_FAILED",
+                                "message": str(e),
+                            },
+                        ))
+    
+                # The batcher resolves swaps on the receipt tracker's thread; job.deliver blocks, so run it elsewhere
+                swap_future.add_done_callback(off_tracker(deliver_swap_result))
     
             except Exception as e:
                 print(f"[SELLER] Error during transaction phase: {e}")
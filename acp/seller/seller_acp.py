@@ -27,7 +27,7 @@ for p in (OPERARI_ROOT, OPERARI_DATA):
         sys.path.append(p)
 from acp.common.schemas import TradeRequest
 from data.crew.tools.tokenTools import TokenTransactionTool
-import csv
+from acp.common.tokens import get_token_registry
 
 
 load_dotenv(override=True)
@@ -49,62 +49,16 @@ def _parse_service_requirement(sr):
 # Fallbacks:
 # - 'ETH' maps to Base canonical ETH address with 18 decimals
 # - If already an address (0x...), assume 18 decimals unless found in CSV
-_TOKENS_CACHE = None
 _TOKENS_CSV_PATH = os.path.join(OPERARI_ROOT, "tokens.csv")
+_TOKENS = get_token_registry(_TOKENS_CSV_PATH)
 
 
-def _load_tokens_csv():
-    global _TOKENS_CACHE
-    if _TOKENS_CACHE is not None:
-        return _TOKENS_CACHE
-    cache = {}
-    try:
-        with open(_TOKENS_CSV_PATH, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f)
-            # Expect header like: Token,Full Name,Contract Address,decimals
-            next(reader, None)
-            for row in reader:
-                if len(row) < 4:
-                    continue
-                sym = str(row[0]).strip()
-                addr = str(row[2]).strip()
-                try:
-                    dec = int(str(row[3]).strip())
-                except Exception:
-                    dec = 18
-                if sym:
-                    cache[sym.upper()] = {"address": addr, "decimals": dec}
-    except Exception as e:
-        print(f"[SELLER] Warning: failed to load tokens.csv at {_TOKENS_CSV_PATH}: {e}")
-    _TOKENS_CACHE = cache
-    return _TOKENS_CACHE
-
-
-def _resolve_token(value: str):
+def _resolve_token(value: str, chain: str = "base"):
     """
     Returns tuple (address, decimals).
     Accepts symbol (e.g., 'USDC', 'ETH') or address (0x...).
     """
-    if not value:
-        raise ValueError("Token value is empty")
-    v = str(value).strip()
-    # Base canonical ETH (WETH) address used by TokenTransactionTool to skip approvals
-    ETH_ADDR = "0x4200000000000000000000000000000000000006"
-    if v.lower() == "eth":
-        return ETH_ADDR, 18
-    if v.startswith("0x") and len(v) == 42:
-        # Try to enrich decimals from CSV if present by matching address
-        tokens = _load_tokens_csv()
-        for sym, info in tokens.items():
-            if info.get("address", "").lower() == v.lower():
-                return info.get("address"), int(info.get("decimals", 18))
-        return v, 18
-    # Symbol path
-    tokens = _load_tokens_csv()
-    info = tokens.get(v.upper())
-    if not info:
-        raise ValueError(f"Unknown token symbol '{v}'. Please use address or add to tokens.csv")
-    return info.get("address"), int(info.get("decimals", 18))
+    return _TOKENS.resolve(value, chain)
 
 
 def seller():
@@ -133,8 +87,8 @@ def seller():
                         requirements = _parse_service_requirement(memo.content)
                         tr = TradeRequest.from_dict(requirements)
                         # Resolve tokens and decimals
-                        sell_addr, sell_dec = _resolve_token(tr.fromToken)
-                        buy_addr, _ = _resolve_token(tr.toToken)
+                        sell_addr, sell_dec = _resolve_token(tr.fromToken, tr.chain)
+                        buy_addr, _ = _resolve_token(tr.toToken, tr.chain)
                         recipient = tr.recipient or env.SELLER_AGENT_WALLET_ADDRESS
 
                         # Build using Operari internal tool (KyberSwap)
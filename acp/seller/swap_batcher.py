@@ -0,0 +1,293 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from web3 import Web3
+
+from acp.common.fees import fee_fields
+from acp.common.gas import get_gas_estimator
+from acp.common.kyber import (
+    DESC_AMOUNT,
+    DESC_DST_RECEIVER,
+    DESC_DST_TOKEN,
+    DESC_FLAGS,
+    DESC_SRC_TOKEN,
+    FLAG_PARTIAL_FILL,
+    FLAG_REQUIRES_EXTRA_ETH,
+    NATIVE_TOKEN,
+    decode_swap,
+    decode_swapped,
+)
+from acp.common.multicall import MULTICALL3_ADDRESS, multicall_contract
+from acp.common.replacements import send_transaction
+
+
+SWAP_BATCH_MAX_JOBS = int(os.getenv("SWAP_BATCH_MAX_JOBS", "10"))
+SWAP_BATCH_WAIT_MS = int(os.getenv("SWAP_BATCH_WAIT_MS", "500"))
+CHAIN_ID = 8453
+
+
+class _PendingSwap:
+    __slots__ = ("job_id", "tx", "token_pair", "future", "desc", "alone")
+
+    def __init__(self, job_id, tx: Dict, token_pair, future: Future, desc):
+        self.job_id = job_id
+        self.tx = tx
+        self.token_pair = token_pair
+        self.future = future
+        self.desc = desc
+        # Set once a batch holding this swap reverted; it is then only ever sent on its own
+        self.alone = False
+
+
+class SwapBatcher:
+    """Collects one wallet's swaps for a short window and sends them together.
+
+    Swaps are held for up to ``max_wait_ms`` or until ``max_jobs`` are
+    queued. Native-ETH KyberSwap swaps in a window are then packed into a
+    single Multicall3 ``aggregate3Value`` transaction, each call forwarding
+    its own ETH. Calls are sent with ``allowFailure=False``: Multicall3 keeps
+    the ETH of a call that fails, so a failing call must revert the whole
+    batch (returning all of it to the wallet). The batch is simulated first;
+    if the simulation or the mined transaction reverts, every swap in it is
+    sent again on its own, so one bad route only fails its own job. Only
+    swaps that cannot leave ETH in Multicall3 are batched: output paid to
+    the wallet, ``msg.value`` equal to the swap amount and no partial-fill or
+    extra-ETH flags (the router refunds unspent ETH to ``msg.sender``).
+
+    ERC-20 sells cannot go through Multicall3, since the router would pull
+    the tokens from the multicall contract rather than the wallet, so they
+    are sent as separate transactions back to back using locally managed
+    nonces.
+
+    Each ``submit`` returns a Future resolving to ``{"tx_hash", "success",
+    "batch_size", "return_amount"}``. Batched jobs are attributed from the
+    router's ``Swapped`` logs in call order. ``stats`` keeps transactions
+    sent, jobs per transaction, gas per job and batches that reverted.
+    """
+
+    def __init__(self, w3: Web3, private_key: str, max_jobs: int = SWAP_BATCH_MAX_JOBS, max_wait_ms: int = SWAP_BATCH_WAIT_MS):
+        self.w3 = w3
+        self.private_key = private_key
+        self.address = w3.eth.account.from_key(private_key).address
+        self.max_jobs = max(1, max_jobs)
+        self.max_wait = max_wait_ms / 1000.0
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._queue: List[_PendingSwap] = []
+        self._first_queued_at = 0.0
+        self._stats = {"transactions": 0, "jobs": 0, "batched_jobs": 0, "gas_used": 0, "reverted_batches": 0}
+        self._thread = threading.Thread(target=self._run, name="swap-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["jobs_per_tx"] = stats["jobs"] / stats["transactions"] if stats["transactions"] else 0.0
+        stats["gas_per_job"] = stats["gas_used"] / stats["jobs"] if stats["jobs"] else 0.0
+        return stats
+
+    def submit(self, job_id, tx_data: Dict, token_pair: Optional[Tuple[str, str]] = None) -> Future:
+        tx = {
+            "from": self.address,
+            "to": Web3.to_checksum_address(tx_data["to"]),
+            "data": tx_data["data"],
+            "value": int(tx_data.get("value") or "0"),
+            "gas_fallback": int(tx_data.get("gas") or "200000"),
+        }
+        try:
+            decoded = decode_swap(tx["data"])
+        except Exception:
+            decoded = None
+        future: Future = Future()
+        with self._lock:
+            if not self._queue:
+                self._first_queued_at = time.monotonic()
+            self._queue.append(_PendingSwap(job_id, tx, token_pair, future, decoded[2] if decoded else None))
+            self._ready.notify()
+        return future
+
+    def _take_batch(self) -> List[_PendingSwap]:
+        with self._lock:
+            while True:
+                if self._queue:
+                    waited = time.monotonic() - self._first_queued_at
+                    if len(self._queue) >= self.max_jobs or waited >= self.max_wait:
+                        batch, self._queue = self._queue[:self.max_jobs], self._queue[self.max_jobs:]
+                        self._first_queued_at = time.monotonic()
+                        return batch
+                    self._ready.wait(self.max_wait - waited)
+                else:
+                    self._ready.wait()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self._flush(batch)
+            except Exception as e:
+                print(f"[BATCH] Flush failed: {e}")
+                for swap in batch:
+                    if not swap.future.done():
+                        swap.future.set_exception(e)
+
+    def _batchable(self, swap: _PendingSwap) -> bool:
+        """Whether ``swap`` can run inside Multicall3 without stranding ETH there."""
+        desc = swap.desc
+        if swap.alone or desc is None or desc[DESC_SRC_TOKEN].lower() != NATIVE_TOKEN:
+            return False
+        if swap.tx["value"] <= 0 or swap.tx["value"] != desc[DESC_AMOUNT]:
+            return False
+        if desc[DESC_FLAGS] & (FLAG_PARTIAL_FILL | FLAG_REQUIRES_EXTRA_ETH):
+            return False
+        # A zero receiver means msg.sender, which inside the batch is Multicall3
+        return desc[DESC_DST_RECEIVER].lower() == self.address.lower()
+
+    def _requeue_alone(self, swaps: List[_PendingSwap]):
+        with self._lock:
+            for swap in swaps:
+                swap.alone = True
+            # Ahead of newer work, and flushed right away since they no longer wait for company
+            self._queue[:0] = swaps
+            self._first_queued_at = time.monotonic() - self.max_wait
+            self._ready.notify()
+
+    def _flush(self, batch: List[_PendingSwap]):
+        native = [s for s in batch if self._batchable(s)]
+        singles = [s for s in batch if s not in native]
+        if len(native) == 1:
+            singles.append(native.pop())
+        if native:
+            self._send_batch(native)
+        for swap in singles:
+            self._send_single(swap)
+
+    def _gas_for(self, swap: _PendingSwap) -> int:
+        tx = {k: v for k, v in swap.tx.items() if k != "gas_fallback"}
+        return get_gas_estimator(self.w3).estimate(tx, swap.token_pair, fallback=swap.tx["gas_fallback"])
+
+    def _send_single(self, swap: _PendingSwap):
+        tx = {k: v for k, v in swap.tx.items() if k != "gas_fallback"}
+        tx.update({"gas": self._gas_for(swap), "chainId": CHAIN_ID, **fee_fields(self.w3)})
+        try:
+            handle = send_transaction(self.w3, tx, self.private_key)
+        except Exception as e:
+            swap.future.set_exception(e)
+            return
+        print(f"[BATCH] Job {swap.job_id}: swap sent alone: {handle.tx_hash}")
+        get_gas_estimator(self.w3).record_when_mined(handle, tx, swap.token_pair)
+
+        def _done(h):
+            if h.exception() is not None:
+                swap.future.set_exception(h.exception())
+                return
+            receipt = h.receipt()
+            self._count(1, receipt.gasUsed, batched=False)
+            swap.future.set_result({
+                "tx_hash": h.tx_hash,
+                "success": receipt.status == 1,
+                "batch_size": 1,
+                "return_amount": None,
+            })
+        handle.add_done_callback(_done)
+
+    def _send_batch(self, swaps: List[_PendingSwap]):
+        calls = [(s.tx["to"], False, s.tx["value"], Web3.to_bytes(hexstr=s.tx["data"])) for s in swaps]
+        contract = multicall_contract(self.w3)
+        tx = {
+            "from": self.address,
+            "to": Web3.to_checksum_address(MULTICALL3_ADDRESS),
+            "data": contract.encode_abi("aggregate3Value", args=[calls]),
+            "value": sum(s.tx["value"] for s in swaps),
+            # Per-swap limits already include the 21000 base cost each, which covers the multicall overhead
+            "gas": sum(self._gas_for(s) for s in swaps),
+            "chainId": CHAIN_ID,
+            **fee_fields(self.w3),
+        }
+        try:
+            self.w3.eth.call({k: tx[k] for k in ("from", "to", "data", "value")})
+        except Exception as e:
+            print(f"[BATCH] Batch of {len(swaps)} swaps would revert ({e}); sending each on its own")
+            for swap in swaps:
+                swap.alone = True
+                self._send_single(swap)
+            return
+        try:
+            handle = send_transaction(self.w3, tx, self.private_key)
+        except Exception as e:
+            for swap in swaps:
+                swap.future.set_exception(e)
+            return
+        print(f"[BATCH] Sent {len(swaps)} swaps in one transaction: {handle.tx_hash}")
+        handle.add_done_callback(lambda h: self._settle_batch(h, swaps))
+
+    def _settle_batch(self, handle, swaps: List[_PendingSwap]):
+        if handle.exception() is not None:
+            for swap in swaps:
+                swap.future.set_exception(handle.exception())
+            return
+        receipt = handle.receipt()
+        if receipt.status != 1:
+            # Nothing ran and the ETH is back in the wallet; retry each swap alone on the batcher thread
+            self._count(0, receipt.gasUsed, batched=True, reverted=True)
+            print(f"[BATCH] {handle.tx_hash} reverted in block {receipt.blockNumber}; resending {len(swaps)} swaps one by one")
+            self._requeue_alone(swaps)
+            return
+        swapped = []
+        for log in receipt["logs"]:
+            event = decode_swapped(log)
+            if event is not None:
+                swapped.append(event)
+
+        index = 0
+        succeeded = 0
+        for swap in swaps:
+            event = swapped[index] if index < len(swapped) else None
+            matches = event is not None and (
+                event["srcToken"] == swap.desc[DESC_SRC_TOKEN].lower()
+                and event["dstToken"] == swap.desc[DESC_DST_TOKEN].lower()
+                and event["dstReceiver"] == swap.desc[DESC_DST_RECEIVER].lower()
+                and event["spentAmount"] == swap.desc[DESC_AMOUNT]
+            )
+            if matches:
+                index += 1
+                succeeded += 1
+            swap.future.set_result({
+                "tx_hash": handle.tx_hash,
+                "success": matches,
+                "batch_size": len(swaps),
+                "return_amount": event["returnAmount"] if matches else None,
+            })
+        self._count(len(swaps), receipt.gasUsed, batched=True)
+        print(
+            f"[BATCH] {handle.tx_hash} mined in block {receipt.blockNumber}: {succeeded}/{len(swaps)} swaps succeeded, "
+            f"{receipt.gasUsed / len(swaps):.0f} gas per job"
+        )
+
+    def _count(self, jobs: int, gas_used: int, batched: bool, reverted: bool = False):
+        with self._lock:
+            self._stats["transactions"] += 1
+            self._stats["jobs"] += jobs
+            self._stats["gas_used"] += gas_used
+            if batched:
+                self._stats["batched_jobs"] += jobs
+            if reverted:
+                self._stats["reverted_batches"] += 1
+
+
+_BATCHERS: Dict[Tuple[int, str], SwapBatcher] = {}
+_BATCHERS_LOCK = threading.Lock()
+
+
+def get_swap_batcher(w3: Web3, private_key: str) -> SwapBatcher:
+    """One batcher per (Web3 instance, signing wallet)."""
+    address = w3.eth.account.from_key(private_key).address.lower()
+    with _BATCHERS_LOCK:
+        batcher = _BATCHERS.get((id(w3), address))
+        if batcher is None or batcher.w3 is not w3:
+            batcher = SwapBatcher(w3, private_key)
+            _BATCHERS[(id(w3), address)] = batcher
+        return batcher
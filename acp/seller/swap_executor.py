@@ -0,0 +1,84 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, Tuple
+
+
+class SwapExecutor:
+    """Bounded worker pool that keeps each wallet's work strictly ordered.
+
+    Tasks are submitted under a key (the designated wallet address). Different
+    keys run concurrently on up to ``max_workers`` threads; tasks sharing a key
+    run one after another in submission order, so a wallet never has two of
+    its transactions in flight with competing nonces.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="swap")
+        self._lock = threading.Lock()
+        self._lanes: Dict[str, Deque[Tuple[Future, Callable, tuple, dict]]] = {}
+        self._queued = 0
+        self._running = 0
+        self._closed = False
+        self._idle = threading.Condition(self._lock)
+
+    @property
+    def queue_depth(self) -> int:
+        """Tasks accepted but not yet started."""
+        return self._queued
+
+    @property
+    def in_flight(self) -> int:
+        return self._running
+
+    def submit(self, key: str, fn: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+        lane_key = key.lower()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SwapExecutor is shut down")
+            lane = self._lanes.get(lane_key)
+            start_lane = lane is None
+            if start_lane:
+                lane = deque()
+                self._lanes[lane_key] = lane
+            lane.append((future, fn, args, kwargs))
+            self._queued += 1
+        if start_lane:
+            self._pool.submit(self._drain_lane, lane_key)
+        return future
+
+    def _drain_lane(self, lane_key: str):
+        while True:
+            with self._lock:
+                lane = self._lanes[lane_key]
+                if not lane:
+                    del self._lanes[lane_key]
+                    self._idle.notify_all()
+                    return
+                future, fn, args, kwargs = lane.popleft()
+                self._queued -= 1
+                self._running += 1
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def shutdown(self, wait: bool = True, timeout=None) -> bool:
+        """Stop accepting work and optionally wait for queued swaps to finish.
+
+        Returns True once every lane has drained (always True when wait=False).
+        """
+        with self._lock:
+            self._closed = True
+            if wait:
+                self._idle.wait_for(lambda: not self._lanes, timeout=timeout)
+            drained = not self._lanes
+        self._pool.shutdown(wait=wait and drained)
+        return drained or not wait
@@ -1,8 +1,216 @@
+import copy
 import os
-from typing import Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import requests
 
+from acp.common.resilience import ResilientCaller
+from acp.common.singleflight import SingleFlight
+
+
+QUOTE_CACHE_SIZE = int(os.getenv("QUOTE_CACHE_SIZE", "256"))
+# A quote is reused for at most this many blocks after the one it was fetched in
+QUOTE_CACHE_VALID_BLOCKS = int(os.getenv("QUOTE_CACHE_VALID_BLOCKS", "1"))
+BLOCK_TIME_SECONDS = float(os.getenv("BLOCK_TIME_SECONDS", "2"))
+# Significant digits kept when bucketing amounts; 0 keys on the exact amount
+QUOTE_CACHE_AMOUNT_DIGITS = int(os.getenv("QUOTE_CACHE_AMOUNT_DIGITS", "0"))
+QUOTE_BATCH_MAX = int(os.getenv("QUOTE_BATCH_MAX", "50"))
+QUOTE_BATCH_FALLBACK_WORKERS = int(os.getenv("QUOTE_BATCH_FALLBACK_WORKERS", "8"))
+
+
+def amount_bucket(amount: str, digits: int = QUOTE_CACHE_AMOUNT_DIGITS) -> str:
+    """Normalized amount for cache keys ("1.0" and "1" match); rounded to ``digits`` significant digits if set."""
+    try:
+        value = Decimal(str(amount))
+    except InvalidOperation:
+        return str(amount)
+    if digits > 0 and value:
+        value = round(value, digits - 1 - value.adjusted())
+    return format(value.normalize(), "f")
+
+
+ETH_TO_TOKEN_PATH = "/api/quote/eth-to-token"
+TOKEN_TO_ETH_PATH = "/api/quote/token-to-eth"
+TOKEN_TO_TOKEN_PATH = "/api/quote/token-to-token"
+BATCH_PATH = "/api/quote/batch"
+
+
+def _with_common(params: Dict[str, str], recipient: Optional[str], slippage_pct: float) -> Dict[str, str]:
+    return {
+        **params,
+        **({"recipientAddress": recipient} if recipient else {}),
+        "slippage": str(slippage_pct),
+    }
+
+
+def eth_to_token_request(amount_eth: str, token_out: str, recipient: Optional[str], slippage_pct: float) -> Tuple[str, Dict[str, str]]:
+    return ETH_TO_TOKEN_PATH, _with_common({"amountIn": amount_eth, "tokenOut": token_out}, recipient, slippage_pct)
+
+
+def token_to_eth_request(amount_in: str, token_in: str, recipient: Optional[str], slippage_pct: float) -> Tuple[str, Dict[str, str]]:
+    return TOKEN_TO_ETH_PATH, _with_common({"amountIn": amount_in, "tokenIn": token_in}, recipient, slippage_pct)
+
+
+def token_to_token_request(
+    amount_in: str, token_in: str, token_out: str, recipient: Optional[str], slippage_pct: float
+) -> Tuple[str, Dict[str, str]]:
+    return TOKEN_TO_TOKEN_PATH, _with_common(
+        {"amountIn": amount_in, "tokenIn": token_in, "tokenOut": token_out}, recipient, slippage_pct
+    )
+
+
+# Request kinds accepted by quote_batch / quote_many, with the ``quote_*`` method arguments as kwargs
+QUOTE_REQUESTS = {
+    "eth_to_token": eth_to_token_request,
+    "token_to_eth": token_to_eth_request,
+    "token_to_token": token_to_token_request,
+}
+
+
+def quote_cache_key(path: str, params: Dict[str, str]) -> Tuple:
+    return (
+        path,
+        params.get("tokenIn", "").lower(),
+        params.get("tokenOut", "").lower(),
+        amount_bucket(params["amountIn"]),
+        str(params["slippage"]),
+        params.get("recipientAddress", "").lower(),
+    )
+
+
+def check_response(data):
+    if not isinstance(data, dict) or not data.get("success"):
+        raise RuntimeError(f"Trade service error: {data}")
+    return data
+
+
+def service_settings(base_url: Optional[str], api_key: Optional[str]) -> Tuple[str, str, Dict[str, str]]:
+    """Resolved base URL, API key and request headers, falling back to the env vars."""
+    base_url = (base_url or os.getenv("TRADE_SERVICE_BASE_URL", "")).rstrip("/")
+    api_key = api_key or os.getenv("TRADE_SERVICE_API_KEY")
+    if not base_url:
+        raise ValueError("TRADE_SERVICE_BASE_URL is not set")
+    if not api_key:
+        raise ValueError("TRADE_SERVICE_API_KEY is not set")
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+    }
+    return base_url, api_key, headers
+
+
+class QuoteCache:
+    """Bounded LRU of trade-service quotes, each valid for a few blocks.
+
+    An entry stores the block it was fetched in (when a ``block_number``
+    source is given) and a wall-clock expiry of ``valid_blocks`` block
+    times. It is only returned while both still hold, so a quote is never
+    served past its validity block even if the clock says otherwise.
+    Without a block source the expiry alone applies.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = QUOTE_CACHE_SIZE,
+        valid_blocks: int = QUOTE_CACHE_VALID_BLOCKS,
+        block_time: float = BLOCK_TIME_SECONDS,
+        block_number: Optional[Callable[[], int]] = None,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.valid_blocks = max(0, valid_blocks)
+        self.ttl = (self.valid_blocks + 1) * block_time
+        self.block_number = block_number
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, Tuple[Dict, float, Optional[int]]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    @property
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _current_block(self) -> Optional[int]:
+        if self.block_number is None:
+            return None
+        try:
+            return self.block_number()
+        except Exception as e:
+            print(f"[QUOTES] Block number unavailable ({e}); using time-based expiry only")
+            return None
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+        data, expires_at, fetched_block = entry
+        fresh = time.monotonic() < expires_at
+        if fresh and fetched_block is not None:
+            head = self._current_block()
+            fresh = head is not None and head <= fetched_block + self.valid_blocks
+        with self._lock:
+            if not fresh:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+        return copy.deepcopy(data)
+
+    def put(self, key: Tuple, data: Dict):
+        fetched_block = self._current_block()
+        with self._lock:
+            self._entries[key] = (copy.deepcopy(data), time.monotonic() + self.ttl, fetched_block)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every client so concurrent jobs quoting the same request make one call
+_QUOTE_FLIGHTS = SingleFlight("quotes")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection failures, timeouts, 429s and 5xx responses; anything else would fail again."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+
+_CALLERS: Dict[str, ResilientCaller] = {}
+_CALLERS_LOCK = threading.Lock()
+
+
+def get_resilient_caller(base_url: str) -> ResilientCaller:
+    """One caller (retry budget, latency history, breakers) per trade-service deployment."""
+    with _CALLERS_LOCK:
+        caller = _CALLERS.get(base_url)
+        if caller is None:
+            caller = ResilientCaller("trade-service", is_retryable)
+            _CALLERS[base_url] = caller
+        return caller
+
 
 class TradeServiceClient:
     """Thin client for defai-trade-service quote and agent endpoints.
@@ -10,62 +218,147 @@ class TradeServiceClient:
     Expects the following env vars:
       - TRADE_SERVICE_BASE_URL (e.g., http://localhost:3000)
       - TRADE_SERVICE_API_KEY   (maps to SERVER_API_KEY for server auth)
+
+    Quotes are cached (see QuoteCache) keyed by endpoint, tokens, amount
+    bucket, slippage and recipient. Pass ``block_number`` (e.g.
+    ``lambda: w3.eth.block_number``) to tie validity to the chain head, or
+    ``quote_cache=False`` to always hit the service. Identical quotes
+    requested concurrently (from any client) share one request. Every GET
+    goes through a ResilientCaller: transient failures are retried with
+    jittered backoff, slow requests are hedged past the endpoint's p95
+    latency, and each endpoint has a circuit breaker (see ``resilience.stats``).
+
+    ``quote_batch`` prices many requests with one POST per ``QUOTE_BATCH_MAX``
+    requests, falling back to concurrent single GETs if the service has no
+    batch endpoint.
     """
 
-    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
-        self.base_url = (base_url or os.getenv("TRADE_SERVICE_BASE_URL", "")).rstrip("/")
-        self.api_key = api_key or os.getenv("TRADE_SERVICE_API_KEY")
-        if not self.base_url:
-            raise ValueError("TRADE_SERVICE_BASE_URL is not set")
-        if not self.api_key:
-            raise ValueError("TRADE_SERVICE_API_KEY is not set")
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        quote_cache=None,
+        block_number: Optional[Callable[[], int]] = None,
+    ):
+        self.base_url, self.api_key, headers = service_settings(base_url, api_key)
+        self.flights = _QUOTE_FLIGHTS
+        self.resilience = get_resilient_caller(self.base_url)
+        self.batch_supported: Optional[bool] = None
 
         self.session = requests.Session()
-        self.session.headers.update({
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        })
+        self.session.headers.update(headers)
+        if quote_cache is False:
+            self.quote_cache = None
+        else:
+            self.quote_cache = quote_cache or QuoteCache(block_number=block_number)
 
-    def _get(self, path: str, params: Dict[str, str]):
+    def _send(self, path: str, params: Dict[str, str]):
         url = f"{self.base_url}{path}"
         resp = self.session.get(url, params=params, timeout=30)
         resp.raise_for_status()
-        data = resp.json()
-        if not isinstance(data, dict) or not data.get("success"):
-            raise RuntimeError(f"Trade service error: {data}")
+        return check_response(resp.json())
+
+    def _get(self, path: str, params: Dict[str, str]):
+        return self.resilience.call(path, lambda: self._send(path, params))
+
+    def _fetch(self, path: str, params: Dict[str, str], key: Tuple):
+        data = self._get(path, params)
+        if self.quote_cache is not None:
+            self.quote_cache.put(key, data)
         return data
 
+    def _quote(self, path: str, params: Dict[str, str]):
+        key = quote_cache_key(path, params)
+        if self.quote_cache is not None:
+            cached = self.quote_cache.get(key)
+            if cached is not None:
+                return cached
+        return self.flights.do((self.base_url,) + key, self._fetch, path, params, key)
+
     def quote_eth_to_token(self, amount_eth: str, token_out: str, recipient: Optional[str], slippage_pct: float):
-        return self._get(
-            "/api/quote/eth-to-token",
-            {
-                "amountIn": amount_eth,
-                "tokenOut": token_out,
-                **({"recipientAddress": recipient} if recipient else {}),
-                "slippage": str(slippage_pct),
-            },
-        )
+        return self._quote(*eth_to_token_request(amount_eth, token_out, recipient, slippage_pct))
 
     def quote_token_to_eth(self, amount_in: str, token_in: str, recipient: Optional[str], slippage_pct: float):
-        return self._get(
-            "/api/quote/token-to-eth",
-            {
-                "amountIn": amount_in,
-                "tokenIn": token_in,
-                **({"recipientAddress": recipient} if recipient else {}),
-                "slippage": str(slippage_pct),
-            },
-        )
+        return self._quote(*token_to_eth_request(amount_in, token_in, recipient, slippage_pct))
 
     def quote_token_to_token(self, amount_in: str, token_in: str, token_out: str, recipient: Optional[str], slippage_pct: float):
-        return self._get(
-            "/api/quote/token-to-token",
-            {
-                "amountIn": amount_in,
-                "tokenIn": token_in,
-                "tokenOut": token_out,
-                **({"recipientAddress": recipient} if recipient else {}),
-                "slippage": str(slippage_pct),
-            },
-        )
+        return self._quote(*token_to_token_request(amount_in, token_in, token_out, recipient, slippage_pct))
+
+    def _post_batch(self, items: List[Tuple[str, Dict[str, str]]]) -> List:
+        body = {"requests": [{"id": str(i), "path": path, "params": params} for i, (path, params) in enumerate(items)]}
+
+        def _send():
+            resp = self.session.post(f"{self.base_url}{BATCH_PATH}", json=body, timeout=30)
+            resp.raise_for_status()
+            return check_response(resp.json())
+
+        data = self.resilience.call(BATCH_PATH, _send)
+        by_id = {str(r.get("id")): r for r in data.get("results", []) if isinstance(r, dict)}
+        results = []
+        for i in range(len(items)):
+            result = by_id.get(str(i))
+            if result is None:
+                results.append(RuntimeError(f"Trade service batch response has no result for request {i}"))
+                continue
+            try:
+                results.append(check_response(result))
+            except RuntimeError as e:
+                results.append(e)
+        return results
+
+    def _quote_each(self, items: List[Tuple[str, Dict[str, str]]]) -> List:
+        def _one(item):
+            try:
+                return self._quote(*item)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(QUOTE_BATCH_FALLBACK_WORKERS, len(items)))) as pool:
+            return list(pool.map(_one, items))
+
+    def quote_batch(self, quote_requests: Iterable[Tuple[str, Dict]], max_batch: int = QUOTE_BATCH_MAX) -> List:
+        """Quote many requests at once; results (or exceptions) come back in request order.
+
+        Each request is ``(kind, kwargs)`` with kind a ``QUOTE_REQUESTS`` key
+        and kwargs those of the matching ``quote_*`` method. Cached quotes are
+        answered locally and duplicates are sent once. The rest go out as
+        POSTs of up to ``max_batch`` requests; a 404/405/501 from the batch
+        endpoint switches this client to concurrent single GETs for good.
+        """
+        items = [QUOTE_REQUESTS[kind](**kwargs) for kind, kwargs in quote_requests]
+        results: List = [None] * len(items)
+        pending: Dict[Tuple, List[int]] = OrderedDict()
+        for i, (path, params) in enumerate(items):
+            key = quote_cache_key(path, params)
+            cached = self.quote_cache.get(key) if self.quote_cache is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(key, []).append(i)
+
+        unique = [items[positions[0]] for positions in pending.values()]
+        fetched: List = []
+        for start in range(0, len(unique), max(1, max_batch)):
+            chunk = unique[start:start + max(1, max_batch)]
+            if self.batch_supported is not False:
+                try:
+                    fetched.extend(self._post_batch(chunk))
+                    self.batch_supported = True
+                    continue
+                except requests.HTTPError as e:
+                    if e.response is None or e.response.status_code not in (404, 405, 501):
+                        fetched.extend([e] * len(chunk))
+                        continue
+                    print(f"[TRADE] Batch quotes unsupported by {self.base_url}; using concurrent single quotes")
+                    self.batch_supported = False
+                except Exception as e:
+                    fetched.extend([e] * len(chunk))
+                    continue
+            fetched.extend(self._quote_each(chunk))
+
+        for (key, positions), outcome in zip(pending.items(), fetched):
+            if self.quote_cache is not None and not isinstance(outcome, BaseException):
+                self.quote_cache.put(key, outcome)
+            for n, i in enumerate(positions):
+                results[i] = outcome if n == 0 or isinstance(outcome, BaseException) else copy.deepcopy(outcome)
+        return results
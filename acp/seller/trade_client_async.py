@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from acp.common.singleflight import AsyncSingleFlight
+from acp.seller.trade_client import (
+    QUOTE_REQUESTS,
+    QuoteCache,
+    check_response,
+    eth_to_token_request,
+    quote_cache_key,
+    service_settings,
+    token_to_eth_request,
+    token_to_token_request,
+)
+
+
+TRADE_SERVICE_MAX_CONNECTIONS = int(os.getenv("TRADE_SERVICE_MAX_CONNECTIONS", "16"))
+TRADE_SERVICE_TIMEOUT_SECONDS = float(os.getenv("TRADE_SERVICE_TIMEOUT_SECONDS", "10"))
+
+
+class AsyncTradeServiceClient:
+    """asyncio counterpart of TradeServiceClient for concurrent quoting.
+
+    Requests share one aiohttp session whose connector holds at most
+    ``max_connections`` sockets to the service; further requests wait for a
+    free connection instead of opening more. Every request has a deadline
+    (``timeout`` seconds by default, overridable per call) covering the
+    wait for a connection as well as the response. Quotes go through the
+    same QuoteCache as the synchronous client, and identical quotes
+    in flight at the same time share one request.
+
+    Use it as an async context manager, or call ``close()`` when done.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        max_connections: int = TRADE_SERVICE_MAX_CONNECTIONS,
+        timeout: float = TRADE_SERVICE_TIMEOUT_SECONDS,
+        quote_cache=None,
+        block_number: Optional[Callable[[], int]] = None,
+    ):
+        self.base_url, self.api_key, self._headers = service_settings(base_url, api_key)
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.flights = AsyncSingleFlight("quotes")
+        if quote_cache is False:
+            self.quote_cache = None
+        else:
+            self.quote_cache = quote_cache or QuoteCache(block_number=block_number)
+
+    async def __aenter__(self) -> "AsyncTradeServiceClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_connections)
+            self._session = aiohttp.ClientSession(headers=self._headers, connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _get(self, path: str, params: Dict[str, str], timeout: Optional[float] = None):
+        url = f"{self.base_url}{path}"
+        deadline = aiohttp.ClientTimeout(total=self.timeout if timeout is None else timeout)
+        async with self._get_session().get(url, params=params, timeout=deadline) as resp:
+            resp.raise_for_status()
+            return check_response(await resp.json())
+
+    async def _fetch(self, path: str, params: Dict[str, str], key: Tuple, timeout: Optional[float]):
+        data = await self._get(path, params, timeout)
+        if self.quote_cache is not None:
+            self.quote_cache.put(key, data)
+        return data
+
+    async def _quote(self, path: str, params: Dict[str, str], timeout: Optional[float] = None):
+        key = quote_cache_key(path, params)
+        if self.quote_cache is not None:
+            cached = self.quote_cache.get(key)
+            if cached is not None:
+                return cached
+        # A joining caller waits on the leader's deadline, bounded by its own
+        call = self.flights.do(key, self._fetch, path, params, key, timeout)
+        return await (call if timeout is None else asyncio.wait_for(call, timeout))
+
+    async def quote_eth_to_token(
+        self, amount_eth: str, token_out: str, recipient: Optional[str], slippage_pct: float, timeout: Optional[float] = None
+    ):
+        return await self._quote(*eth_to_token_request(amount_eth, token_out, recipient, slippage_pct), timeout=timeout)
+
+    async def quote_token_to_eth(
+        self, amount_in: str, token_in: str, recipient: Optional[str], slippage_pct: float, timeout: Optional[float] = None
+    ):
+        return await self._quote(*token_to_eth_request(amount_in, token_in, recipient, slippage_pct), timeout=timeout)
+
+    async def quote_token_to_token(
+        self,
+        amount_in: str,
+        token_in: str,
+        token_out: str,
+        recipient: Optional[str],
+        slippage_pct: float,
+        timeout: Optional[float] = None,
+    ):
+        return await self._quote(
+            *token_to_token_request(amount_in, token_in, token_out, recipient, slippage_pct), timeout=timeout
+        )
+
+    async def quote_many(self, requests: Iterable[Tuple[str, Dict]], timeout: Optional[float] = None) -> List:
+        """Run many quotes concurrently; results come back in request order.
+
+        Each request is ``(kind, kwargs)`` with kind a ``QUOTE_REQUESTS`` key
+        ("eth_to_token", "token_to_eth" or "token_to_token") and kwargs those
+        of the matching ``quote_*`` method. ``timeout`` bounds the whole fan-out: no request
+        runs past it. A failed or late request yields its exception in place
+        of a result rather than failing the others.
+        """
+        started = time.monotonic()
+        limit = self.timeout if timeout is None else timeout
+
+        async def _one(kind: str, kwargs: Dict):
+            path, params = QUOTE_REQUESTS[kind](**kwargs)
+            remaining = limit - (time.monotonic() - started)
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"Quote deadline passed before {kind} request started")
+            return await self._quote(path, params, timeout=remaining)
+
+        return await asyncio.gather(*(_one(kind, kwargs) for kind, kwargs in requests), return_exceptions=True)
@@ -0,0 +1,231 @@
+"""Local stand-in for defai-trade-service's quote endpoints.
+
+Answers the three ``/api/quote/*`` GETs and the ``/api/quote/batch`` POST
+with deterministic quotes after a configurable delay, so the quote clients
+can be exercised and benchmarked offline. Run it directly to benchmark
+sequential, concurrent and batched quoting:
+
+    python -m acp.seller.trade_service_standin --requests 200 --latency-ms 100 --batch-sizes 1,10,50
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from acp.seller.trade_client import BATCH_PATH, ETH_TO_TOKEN_PATH, TOKEN_TO_ETH_PATH, TOKEN_TO_TOKEN_PATH
+
+NATIVE = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
+STANDIN_API_KEY = "standin-key"
+# Fixed price so every quote is reproducible: 1 unit in -> 2 units out, less slippage
+RATE = Decimal(2)
+QUOTE_PATHS = (ETH_TO_TOKEN_PATH, TOKEN_TO_ETH_PATH, TOKEN_TO_TOKEN_PATH)
+
+
+def make_quote(path: str, params: Dict[str, str]) -> Dict:
+    amount_in = Decimal(params["amountIn"])
+    slippage = Decimal(params.get("slippage", "0.5"))
+    amount_out = amount_in * RATE
+    return {
+        "amountIn": params["amountIn"],
+        "tokenIn": params.get("tokenIn", NATIVE),
+        "tokenOut": params.get("tokenOut", NATIVE),
+        "amountOut": format(amount_out.normalize(), "f"),
+        "minAmountOut": format((amount_out * (100 - slippage) / 100).normalize(), "f"),
+        "recipientAddress": params.get("recipientAddress"),
+        "path": path,
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StandInServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: Dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _authorized(self) -> bool:
+        if self.headers.get("Authorization") == f"Bearer {self.server.api_key}":
+            return True
+        self._reply(401, {"success": False, "error": "unauthorized"})
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in QUOTE_PATHS:
+            self._reply(404, {"success": False, "error": f"unknown path {url.path}"})
+            return
+        if not self._authorized():
+            return
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        self.server.count_request()
+        time.sleep(self.server.latency)
+        try:
+            quote = make_quote(url.path, params)
+        except (KeyError, InvalidOperation) as e:
+            self._reply(400, {"success": False, "error": f"bad request: {e}"})
+            return
+        self._reply(200, {"success": True, "data": quote})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlparse(self.path).path != BATCH_PATH or not self.server.batch_supported:
+            self._reply(404, {"success": False, "error": f"unknown path {self.path}"})
+            return
+        if not self._authorized():
+            return
+        try:
+            requests = json.loads(body)["requests"]
+        except (ValueError, KeyError, TypeError) as e:
+            self._reply(400, {"success": False, "error": f"bad request: {e}"})
+            return
+        self.server.count_request()
+        # One round of upstream work per batch, plus a little per quote
+        time.sleep(self.server.latency + self.server.item_latency * len(requests))
+        results = []
+        for request in requests:
+            try:
+                if request["path"] not in QUOTE_PATHS:
+                    raise KeyError(f"unknown path {request['path']}")
+                results.append({"id": request["id"], "success": True, "data": make_quote(request["path"], request["params"])})
+            except (KeyError, TypeError, InvalidOperation) as e:
+                results.append({"id": request.get("id"), "success": False, "error": f"bad request: {e}"})
+        self._reply(200, {"success": True, "results": results})
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops simultaneous connects, which then retry
+    # after ~1 s and distort concurrent benchmarks
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        latency: float = 0.05,
+        api_key: str = STANDIN_API_KEY,
+        batch_supported: bool = True,
+        item_latency: float = 0.001,
+    ):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.api_key = api_key
+        self.batch_supported = batch_supported
+        self.item_latency = item_latency
+        self.requests_served = 0
+        self._count_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._count_lock:
+            self.requests_served += 1
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency: float = 0.05,
+    api_key: str = STANDIN_API_KEY,
+    batch_supported: bool = True,
+) -> StandInServer:
+    """Start a stand-in server on a background thread (port 0 picks a free one); call ``shutdown()`` to stop."""
+    server = StandInServer((host, port), latency=latency, api_key=api_key, batch_supported=batch_supported)
+    threading.Thread(target=server.serve_forever, name="trade-service-standin", daemon=True).start()
+    return server
+
+
+def _quote_requests(count: int):
+    return [
+        ("token_to_token", {
+            "amount_in": str(1000 + i),
+            "token_in": "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913",
+            "token_out": "0x4200000000000000000000000000000000000006",
+            "recipient": None,
+            "slippage_pct": 0.5,
+        })
+        for i in range(count)
+    ]
+
+
+def benchmark_batches(count: int, latency: float, batch_sizes, batch_supported: bool = True):
+    from acp.seller.trade_client import TradeServiceClient
+
+    server = serve(latency=latency, batch_supported=batch_supported)
+    try:
+        for size in batch_sizes:
+            client = TradeServiceClient(server.base_url, server.api_key, quote_cache=False)
+            served = server.requests_served
+            started = time.perf_counter()
+            results = client.quote_batch(_quote_requests(count), max_batch=size)
+            elapsed = time.perf_counter() - started
+            failures = sum(1 for r in results if isinstance(r, BaseException))
+            mode = "batch" if client.batch_supported else "single GET fallback"
+            print(
+                f"[STANDIN] quote_batch size {size:>4} ({mode}): {elapsed:.2f}s "
+                f"({count / elapsed:.1f} quotes/s, {server.requests_served - served} HTTP requests, {failures} failed)"
+            )
+    finally:
+        server.shutdown()
+
+
+def benchmark(count: int, latency: float, max_connections: int):
+    from acp.seller.trade_client import TradeServiceClient
+    from acp.seller.trade_client_async import AsyncTradeServiceClient
+
+    server = serve(latency=latency)
+    try:
+        sync_client = TradeServiceClient(server.base_url, server.api_key, quote_cache=False)
+        started = time.perf_counter()
+        for kind, kwargs in _quote_requests(count):
+            getattr(sync_client, f"quote_{kind}")(**kwargs)
+        sequential = time.perf_counter() - started
+
+        async def _fan_out():
+            async with AsyncTradeServiceClient(
+                server.base_url, server.api_key, max_connections=max_connections, quote_cache=False
+            ) as client:
+                return await client.quote_many(_quote_requests(count), timeout=max(30.0, count * latency))
+
+        started = time.perf_counter()
+        results = asyncio.run(_fan_out())
+        concurrent = time.perf_counter() - started
+        failures = sum(1 for r in results if isinstance(r, BaseException))
+    finally:
+        server.shutdown()
+
+    print(f"[STANDIN] {count} quotes at {latency * 1000:.0f} ms each")
+    print(f"[STANDIN] sequential (requests): {sequential:.2f}s ({count / sequential:.1f} quotes/s)")
+    print(
+        f"[STANDIN] concurrent (aiohttp, {max_connections} connections): {concurrent:.2f}s "
+        f"({count / concurrent:.1f} quotes/s, {failures} failed)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--max-connections", type=int, default=16)
+    parser.add_argument("--batch-sizes", default="", help="comma-separated quote_batch sizes, e.g. 1,10,50")
+    parser.add_argument("--no-batch-endpoint", action="store_true", help="serve without the batch endpoint")
+    args = parser.parse_args()
+    benchmark(args.requests, args.latency_ms / 1000, args.max_connections)
+    if args.batch_sizes:
+        sizes = [int(size) for size in args.batch_sizes.split(",") if size]
+        benchmark_batches(args.requests, args.latency_ms / 1000, sizes, batch_supported=not args.no_batch_endpoint)
@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, List, Optional
+
+from web3 import Web3
+
+from acp.seller.blocks import TRANSFER_TOPIC, address_topic
+from acp.seller.job_store import JobStore
+
+
+class TransferLogScanner:
+    """Indexes ERC-20 Transfer events to designated wallets with eth_getLogs.
+
+    Each scan covers the blocks since the last persisted checkpoint with one
+    getLogs call per block range, filtering on the Transfer topic and the
+    recipient topics of every designated wallet. Ranges start at
+    ``initial_range`` blocks, halve whenever the provider rejects a request
+    (range or result-size limits) and double again after a streak of
+    successful calls. The
+    checkpoint lives in the job store, so a restarted monitor resumes where it
+    stopped instead of rescanning history.
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        store: JobStore,
+        name: str = "transfer_scanner",
+        initial_range: int = 2000,
+        min_range: int = 1,
+        max_range: int = 10000,
+        confirmations: int = 0,
+        max_recipients_per_call: int = 500,
+    ):
+        self.w3 = w3
+        self.store = store
+        self.name = name
+        self.range = initial_range
+        self.min_range = min_range
+        self.max_range = max_range
+        self.confirmations = confirmations
+        self.max_recipients_per_call = max_recipients_per_call
+        self._success_streak = 0
+
+    def _get_logs(self, from_block: int, to_block: int, recipient_topics: List[str]):
+        logs = []
+        for i in range(0, len(recipient_topics), self.max_recipients_per_call):
+            logs.extend(self.w3.eth.get_logs({
+                "fromBlock": from_block,
+                "toBlock": to_block,
+                "topics": [TRANSFER_TOPIC, None, recipient_topics[i:i + self.max_recipients_per_call]],
+            }))
+        return logs
+
+    def scan(self, wallets: Iterable[str], start_block: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """Return {lowercased wallet: [transfer, ...]} for new Transfer logs.
+
+        ``start_block`` is only used when no checkpoint exists yet; it defaults
+        to the current head so a fresh monitor does not crawl old history.
+        """
+        wallets = sorted({w.lower() for w in wallets})
+        head = self.w3.eth.block_number - self.confirmations
+        checkpoint = self.store.get_checkpoint(self.name)
+        if checkpoint is None:
+            checkpoint = (head if start_block is None else start_block) - 1
+            self.store.set_checkpoint(self.name, checkpoint)
+
+        transfers: Dict[str, List[Dict]] = {}
+        if not wallets or checkpoint >= head:
+            # Nothing to watch yet; keep the checkpoint at head so we never rescan idle blocks
+            if checkpoint < head:
+                self.store.set_checkpoint(self.name, head)
+            return transfers
+
+        recipient_topics = ["0x" + address_topic(w).hex() for w in wallets]
+        from_block = checkpoint + 1
+        while from_block <= head:
+            to_block = min(head, from_block + self.range - 1)
+            try:
+                logs = self._get_logs(from_block, to_block, recipient_topics)
+            except Exception as e:
+                if self.range <= self.min_range:
+                    raise
+                self.range = max(self.min_range, self.range // 2)
+                self._success_streak = 0
+                print(f"[SCANNER] getLogs {from_block}-{to_block} rejected ({e}); range -> {self.range}")
+                continue
+
+            for log in logs:
+                topics = log["topics"]
+                if len(topics) < 3:
+                    continue
+                recipient = "0x" + bytes(topics[2])[-20:].hex()
+                transfers.setdefault(recipient, []).append({
+                    "token": log["address"],
+                    "from": "0x" + bytes(topics[1])[-20:].hex(),
+                    "value": int.from_bytes(bytes(log["data"])[:32], "big"),
+                    "blockNumber": log["blockNumber"],
+                    "transactionHash": Web3.to_hex(log["transactionHash"]),
+                })
+
+            self.store.set_checkpoint(self.name, to_block)
+            from_block = to_block + 1
+            self._success_streak += 1
+            if self._success_streak >= 5:
+                self.range = min(self.max_range, self.range * 2)
+                self._success_streak = 0
+        return transfers
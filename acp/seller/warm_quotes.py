@@ -0,0 +1,269 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Callable, Dict, Optional
+
+from web3 import Web3
+
+from acp.common.allowances import get_allowance_cache
+from acp.common.fees import fee_fields
+from acp.common.gas import get_gas_estimator
+from acp.common.kyber import DESC_AMOUNT, DESC_SRC_TOKEN, NATIVE_TOKEN, decode_swap
+from acp.common.permits import with_permit
+from acp.common.replacements import send_transaction
+from acp.seller.blocks import BlockFollower
+from acp.seller.quote_aggregator import QuoteRequest, SourceQuote
+
+
+# Rebuild every job's route at least this often (in blocks)
+WARM_QUOTE_REFRESH_BLOCKS = int(os.getenv("WARM_QUOTE_REFRESH_BLOCKS", "1"))
+# With a price probe, rebuild early once the probed output moves this much (basis points)
+WARM_QUOTE_PRICE_MOVE_BPS = float(os.getenv("WARM_QUOTE_PRICE_MOVE_BPS", "30"))
+# A quote older than this many blocks is never executed
+WARM_QUOTE_STALE_BLOCKS = int(os.getenv("WARM_QUOTE_STALE_BLOCKS", "3"))
+WARM_QUOTE_WORKERS = int(os.getenv("WARM_QUOTE_WORKERS", "4"))
+CHAIN_ID = 8453
+
+
+class WarmQuote:
+    """Ready-to-sign route for a job, as built at ``block``."""
+
+    def __init__(self, job_id, request: QuoteRequest, quote: SourceQuote, block: int, probe: Optional[int]):
+        self.job_id = job_id
+        self.request = request
+        self.quote = quote
+        self.block = block
+        self.probe = probe
+        self.built_at = time.time()
+
+
+class QuoteKeeper:
+    """Keeps a live route and calldata for every job still waiting on funds.
+
+    Jobs are registered with ``watch`` (or ``sync`` against the pending set).
+    A background thread follows new blocks and rebuilds a job's route from
+    ``source`` (e.g. a KyberRouteSource) once it is ``refresh_blocks`` old.
+    If a ``price_probe(request) -> expected output`` is given it is also
+    checked every block, and the route is rebuilt early when the probed
+    output moves more than ``price_move_bps`` from the one seen at build
+    time; a cheap probe then lets ``refresh_blocks`` be raised without
+    holding on to a route the market has moved away from.
+
+    ``get`` only hands out a quote built within the last ``stale_blocks``
+    blocks; anything older is treated as missing and the caller falls back
+    to a cold build.
+    """
+
+    def __init__(
+        self,
+        w3: Web3,
+        source,
+        price_probe: Optional[Callable[[QuoteRequest], int]] = None,
+        refresh_blocks: int = WARM_QUOTE_REFRESH_BLOCKS,
+        price_move_bps: float = WARM_QUOTE_PRICE_MOVE_BPS,
+        stale_blocks: int = WARM_QUOTE_STALE_BLOCKS,
+        max_workers: int = WARM_QUOTE_WORKERS,
+    ):
+        self.w3 = w3
+        self.source = source
+        self.price_probe = price_probe
+        self.refresh_blocks = max(1, refresh_blocks)
+        self.price_move_bps = price_move_bps
+        self.stale_blocks = stale_blocks
+        self._lock = threading.Lock()
+        self._requests: Dict[str, QuoteRequest] = {}
+        self._quotes: Dict[str, WarmQuote] = {}
+        self._building: set = set()
+        self._head: Optional[int] = None
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warm-quote")
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"builds": 0, "build_failures": 0, "price_moves": 0, "hits": 0, "stale": 0, "misses": 0}
+
+    @property
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["watched"] = len(self._requests)
+            stats["warm"] = len(self._quotes)
+        return stats
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="quote-keeper", daemon=True)
+            self._thread.start()
+
+    def watch(self, job_id, request: QuoteRequest):
+        job_id = str(job_id)
+        with self._lock:
+            if job_id in self._requests:
+                return
+            self._requests[job_id] = request
+        self.start()
+        self._schedule(job_id, self._head if self._head is not None else self.w3.eth.block_number)
+
+    def unwatch(self, job_id):
+        with self._lock:
+            self._requests.pop(str(job_id), None)
+            self._quotes.pop(str(job_id), None)
+
+    def sync(self, requests: Dict[str, QuoteRequest]):
+        """Watch exactly these jobs: new ones start warming, finished ones are dropped."""
+        wanted = {str(job_id) for job_id in requests}
+        with self._lock:
+            gone = [job_id for job_id in self._requests if job_id not in wanted]
+        for job_id in gone:
+            self.unwatch(job_id)
+        for job_id, request in requests.items():
+            self.watch(job_id, request)
+
+    def get(self, job_id) -> Optional[WarmQuote]:
+        job_id = str(job_id)
+        with self._lock:
+            warm = self._quotes.get(job_id)
+        if warm is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        if not self.is_fresh(warm):
+            with self._lock:
+                self._stats["stale"] += 1
+            return None
+        with self._lock:
+            self._stats["hits"] += 1
+        return warm
+
+    def is_fresh(self, warm: WarmQuote) -> bool:
+        """Whether ``warm`` is still within ``stale_blocks`` of the chain head."""
+        head = self.w3.eth.block_number
+        with self._lock:
+            self._head = max(head, self._head or 0)
+        return head - warm.block <= self.stale_blocks
+
+    def _schedule(self, job_id: str, block: int):
+        with self._lock:
+            if job_id in self._building or job_id not in self._requests:
+                return
+            self._building.add(job_id)
+        self._pool.submit(self._build, job_id, block)
+
+    def _build(self, job_id: str, block: int):
+        try:
+            with self._lock:
+                request = self._requests.get(job_id)
+            if request is None:
+                return
+            probe = self._probe(request)
+            quote = self.source.quote(request)
+            with self._lock:
+                if job_id in self._requests:
+                    self._quotes[job_id] = WarmQuote(job_id, request, quote, block, probe)
+                self._stats["builds"] += 1
+        except Exception as e:
+            with self._lock:
+                self._stats["build_failures"] += 1
+            print(f"[WARM] Route build for job {job_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(job_id)
+
+    def _probe(self, request: QuoteRequest) -> Optional[int]:
+        if self.price_probe is None:
+            return None
+        try:
+            return self.price_probe(request)
+        except Exception as e:
+            print(f"[WARM] Price probe failed: {e}")
+            return None
+
+    def _moved(self, warm: WarmQuote) -> bool:
+        if not warm.probe:
+            return False
+        probe = self._probe(warm.request)
+        if probe is None:
+            return False
+        moved_bps = abs(probe - warm.probe) * 10000 / warm.probe
+        if moved_bps < self.price_move_bps:
+            return False
+        with self._lock:
+            self._stats["price_moves"] += 1
+        print(f"[WARM] Job {warm.job_id}: price moved {moved_bps:.0f} bps since block {warm.block}; rebuilding")
+        return True
+
+    def on_block(self, block: int):
+        with self._lock:
+            self._head = block
+            jobs = list(self._requests)
+            quotes = dict(self._quotes)
+        for job_id in jobs:
+            warm = quotes.get(job_id)
+            if warm is None or block - warm.block >= self.refresh_blocks or self._moved(warm):
+                self._schedule(job_id, block)
+
+    def _run(self):
+        follower = BlockFollower(self.w3)
+        while True:
+            try:
+                for block in follower.new_blocks():
+                    self.on_block(block)
+            except Exception as e:
+                print(f"[WARM] Block follower error: {e}")
+                time.sleep(5)
+
+
+def amm_price_probe(quoter) -> Callable[[QuoteRequest], Optional[int]]:
+    """Price probe backed by a local AmmQuoter: the pools' output for the job's amount, no RPC."""
+    def probe(request: QuoteRequest) -> Optional[int]:
+        amount_in = int(Decimal(request.sell_amount) * (Decimal(10) ** request.sell_decimals))
+        quote = quoter.quote_exact_in(request.sell_token, request.buy_token, amount_in)
+        return quote[0] if quote else None
+    return probe
+
+
+def execute_warm_quote(w3: Web3, warm: WarmQuote, private_key: str, timeout: float = 300) -> Optional[Dict]:
+    """Sign and send a warm route; None if it cannot be sent as-is (caller falls back to a cold build).
+
+    ERC-20 sells need the router's allowance to cover the amount, or an
+    EIP-2612 permit folded into the calldata; otherwise the warm route is
+    not usable and None is returned. So is a route that no longer simulates,
+    e.g. because the price moved past its ``minReturn``.
+    """
+    tx_data = dict(warm.quote.tx_data)
+    decoded = decode_swap(tx_data.get("data") or "0x")
+    if decoded is None:
+        return None
+    desc = decoded[2]
+    owner = w3.eth.account.from_key(private_key).address
+    if desc[DESC_SRC_TOKEN].lower() != NATIVE_TOKEN:
+        allowance = get_allowance_cache(w3).allowance(owner, desc[DESC_SRC_TOKEN], tx_data["to"])
+        if allowance < desc[DESC_AMOUNT]:
+            tx_data = with_permit(w3, tx_data, private_key)
+            if tx_data is None:
+                return None
+
+    tx = {
+        "from": owner,
+        "to": Web3.to_checksum_address(tx_data["to"]),
+        "data": tx_data["data"],
+        "value": int(tx_data.get("value") or "0"),
+        "chainId": CHAIN_ID,
+        **fee_fields(w3),
+    }
+    # The calldata may be a few blocks old and a learned gas limit skips
+    # estimateGas, so nothing else would check minReturn against the current price
+    try:
+        w3.eth.call({k: tx[k] for k in ("from", "to", "data", "value")})
+    except Exception as e:
+        print(f"[WARM] Job {warm.job_id}: warm route from block {warm.block} no longer executes ({e}); building a fresh one")
+        return None
+    token_pair = (warm.request.sell_token, warm.request.buy_token)
+    gas = get_gas_estimator(w3)
+    tx["gas"] = gas.estimate(tx, token_pair, fallback=warm.quote.gas)
+    handle = send_transaction(w3, tx, private_key)
+    print(f"[WARM] Job {warm.job_id}: sent warm route from block {warm.block}: {handle.tx_hash}")
+    gas.record_when_mined(handle, tx, token_pair)
+    receipt = handle.receipt(timeout)
+    if receipt.status != 1:
+        return {"error": f"Swap transaction {handle.tx_hash} reverted", "transaction": {"transactionHash": handle.tx_hash}}
+    return {"transaction": {"transactionHash": handle.tx_hash, "blockNumber": receipt.blockNumber, "gasUsed": receipt.gasUsed}}
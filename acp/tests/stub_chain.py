@@ -0,0 +1,91 @@
+"""In-memory stand-in for the Base RPC, enough for the Multicall3 and ERC-20 reads the code makes."""
+from typing import Callable, Dict, Tuple
+
+from eth_abi import decode, encode
+from web3 import Web3
+from web3.providers.base import BaseProvider
+
+from acp.common.multicall import MULTICALL3_ADDRESS
+
+
+AGGREGATE3 = bytes.fromhex("82ad56cb")
+GET_ETH_BALANCE = bytes.fromhex("4d2301cc")
+BALANCE_OF = bytes.fromhex("70a08231")
+ALLOWANCE = bytes.fromhex("dd62ed3e")
+
+
+class Revert(Exception):
+    pass
+
+
+class StubChain(BaseProvider):
+    """Answers eth_call against in-memory ETH balances and ERC-20 ledgers.
+
+    Multicall3 ``aggregate3`` is executed here sub-call by sub-call (a
+    sub-call to an unknown contract fails without sinking the batch, as
+    allowFailure=True does on-chain). Extra contracts are added to
+    ``contracts`` as ``address -> fn(data) -> return bytes``. Every RPC is
+    recorded in ``requests``.
+    """
+
+    def __init__(self, block_number: int = 100, chain_id: int = 8453):
+        super().__init__()
+        self.block_number = block_number
+        self.chain_id = chain_id
+        self.eth_balances: Dict[str, int] = {}
+        self.token_balances: Dict[Tuple[str, str], int] = {}
+        self.allowances: Dict[Tuple[str, str, str], int] = {}
+        self.tokens = set()
+        self.contracts: Dict[str, Callable[[bytes], bytes]] = {}
+        self.requests = []
+
+    def make_request(self, method, params):
+        self.requests.append((method, params))
+        if method == "eth_chainId":
+            return {"jsonrpc": "2.0", "id": 1, "result": hex(self.chain_id)}
+        if method == "eth_blockNumber":
+            return {"jsonrpc": "2.0", "id": 1, "result": hex(self.block_number)}
+        if method == "eth_call":
+            tx = params[0]
+            try:
+                out = self.call(tx["to"], bytes.fromhex(tx["data"][2:]))
+            except Revert as e:
+                return {"jsonrpc": "2.0", "id": 1, "error": {"code": 3, "message": f"execution reverted: {e}"}}
+            return {"jsonrpc": "2.0", "id": 1, "result": "0x" + out.hex()}
+        raise NotImplementedError(method)
+
+    def eth_calls(self) -> int:
+        return sum(1 for method, _ in self.requests if method == "eth_call")
+
+    def call(self, to: str, data: bytes) -> bytes:
+        to = to.lower()
+        selector, body = data[:4], data[4:]
+        if to == MULTICALL3_ADDRESS.lower():
+            if selector == AGGREGATE3:
+                (calls,) = decode(["(address,bool,bytes)[]"], body)
+                results = []
+                for target, allow_failure, call_data in calls:
+                    try:
+                        results.append((True, self.call(target, call_data)))
+                    except Revert:
+                        if not allow_failure:
+                            raise
+                        results.append((False, b""))
+                return encode(["(bool,bytes)[]"], [results])
+            if selector == GET_ETH_BALANCE:
+                (owner,) = decode(["address"], body)
+                return encode(["uint256"], [self.eth_balances.get(owner.lower(), 0)])
+        if to in self.contracts:
+            return self.contracts[to](data)
+        if to in self.tokens:
+            if selector == BALANCE_OF:
+                (owner,) = decode(["address"], body)
+                return encode(["uint256"], [self.token_balances.get((to, owner.lower()), 0)])
+            if selector == ALLOWANCE:
+                owner, spender = decode(["address", "address"], body)
+                return encode(["uint256"], [self.allowances.get((to, owner.lower(), spender.lower()), 0)])
+        raise Revert(f"no code or unknown selector at {to}")
+
+
+def stub_web3(chain: StubChain) -> Web3:
+    return Web3(chain)
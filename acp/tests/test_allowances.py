@@ -0,0 +1,75 @@
+from acp.common import allowances
+from acp.common.allowances import AllowanceCache
+
+
+OWNER = "0x1111111111111111111111111111111111111111"
+TOKEN = "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913"
+ROUTER = "0x6131b5fae19ea4f9d964eac0408e4408b66337b5"
+
+
+class _Eth:
+    def __init__(self):
+        self.block_number = 100
+        self.logs_error = None
+
+    def get_logs(self, params):
+        if self.logs_error is not None:
+            raise self.logs_error
+        return []
+
+
+class _W3:
+    def __init__(self):
+        self.eth = _Eth()
+
+
+def _chain(monkeypatch, values):
+    """Serve aggregate3 reads from ``values`` (allowance first, as the cache asks)."""
+    reads = []
+
+    def aggregate3(w3, calls, block_identifier="latest"):
+        reads.append(len(calls))
+        return [(True, values["allowance"].to_bytes(32, "big")) for _ in calls]
+
+    monkeypatch.setattr(allowances, "aggregate3", aggregate3)
+    return reads
+
+
+def test_cached_allowance_is_served_without_rpc(monkeypatch):
+    values = {"allowance": 500}
+    reads = _chain(monkeypatch, values)
+    cache = AllowanceCache(_W3(), refresh_seconds=3600)
+    assert cache.allowance(OWNER, TOKEN, ROUTER) == 500
+    values["allowance"] = 0
+    assert cache.allowance(OWNER, TOKEN, ROUTER) == 500
+    assert reads == [1]
+
+
+def test_lagging_cache_falls_back_to_the_chain(monkeypatch):
+    values = {"allowance": 500}
+    reads = _chain(monkeypatch, values)
+    w3 = _W3()
+    cache = AllowanceCache(w3, refresh_seconds=3600, max_lag=5)
+    assert cache.allowance(OWNER, TOKEN, ROUTER) == 500
+
+    # Log refreshes keep failing while the allowance is spent on-chain
+    w3.eth.block_number = 110
+    w3.eth.logs_error = RuntimeError("rpc down")
+    values["allowance"] = 0
+    cache._synced_at -= 10
+
+    assert cache.allowance(OWNER, TOKEN, ROUTER) == 0
+    assert reads == [1, 1]
+
+
+def test_inline_refresh_keeps_cache_when_logs_work(monkeypatch):
+    values = {"allowance": 500}
+    reads = _chain(monkeypatch, values)
+    w3 = _W3()
+    cache = AllowanceCache(w3, refresh_seconds=3600, max_lag=5)
+    cache.allowance(OWNER, TOKEN, ROUTER)
+    w3.eth.block_number = 101
+    cache._synced_at -= 10
+
+    assert cache.allowance(OWNER, TOKEN, ROUTER) == 500
+    assert reads == [1]
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from eth_abi import encode
+
+from acp.common.amm import SYNC_TOPIC, AmmQuoter, InsufficientTickData, V2Pool, V3Pool
+from acp.common.v3_math import Q96, compute_swap_step, get_sqrt_ratio_at_tick
+
+
+WETH = "0x4200000000000000000000000000000000000006"
+USDC = "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913"
+POOL = "0x88a43bbdf9d098eec7bceda4e2494615dfd9bb9c"
+V3_POOL = "0xd0b53d9277642d899df5c87a3966a349a798f224"
+INNER_LIQUIDITY = 10**21
+OUTER_LIQUIDITY = 4 * 10**20
+
+
+def _v2_pool(reserve0=10**21, reserve1=3 * 10**12):
+    pool = V2Pool(POOL)
+    pool.token0, pool.token1 = WETH, USDC
+    pool.reserve0, pool.reserve1 = reserve0, reserve1
+    return pool
+
+
+def _v3_pool():
+    """Price 1.0 at tick 0 with positions on [-120, 120] and [-600, 600]; ticks loaded for +-1200."""
+    pool = V3Pool(V3_POOL)
+    pool.token0, pool.token1 = WETH, USDC
+    pool.fee, pool.tick_spacing = 3000, 60
+    pool.sqrt_price_x96, pool.tick = Q96, 0
+    pool.liquidity = INNER_LIQUIDITY + OUTER_LIQUIDITY
+    pool.liquidity_net = {-600: OUTER_LIQUIDITY, -120: INNER_LIQUIDITY, 120: -INNER_LIQUIDITY, 600: -OUTER_LIQUIDITY}
+    pool.ticks = sorted(pool.liquidity_net)
+    pool.min_loaded_tick, pool.max_loaded_tick = -1200, 1200
+    return pool
+
+
+def test_v2_matches_router_get_amount_out_and_in():
+    pool = _v2_pool(100, 100)
+    assert pool.amount_out(WETH, 2) == 1
+    assert pool.amount_in(WETH, 1) == 2
+    pool = _v2_pool(5 * 10**18, 10 * 10**18)
+    assert pool.amount_out(WETH, 10**18) == 1662497915624478906
+
+
+def test_v3_swap_within_one_tick_range_is_a_single_step():
+    pool = _v3_pool()
+    sqrt_target = get_sqrt_ratio_at_tick(-120)
+    _, step_in, step_out, fee = compute_swap_step(Q96, sqrt_target, pool.liquidity, 10**18, 3000)
+
+    assert pool.swap(True, 10**18) == (step_in + fee, step_out)
+    assert step_in + fee == 10**18
+
+
+def test_v3_swap_crosses_initialized_ticks_step_by_step():
+    pool = _v3_pool()
+    amount = 10**19
+    sqrt_120, sqrt_600 = get_sqrt_ratio_at_tick(120), get_sqrt_ratio_at_tick(600)
+    # Full range of both positions, then part of the outer one alone
+    _, in1, out1, fee1 = compute_swap_step(Q96, sqrt_120, INNER_LIQUIDITY + OUTER_LIQUIDITY, amount, 3000)
+    assert in1 + fee1 < amount
+    _, in2, out2, fee2 = compute_swap_step(sqrt_120, sqrt_600, OUTER_LIQUIDITY, amount - in1 - fee1, 3000)
+    assert in1 + fee1 + in2 + fee2 == amount
+
+    assert pool.swap(False, amount) == (amount, out1 + out2)
+
+
+def test_v3_exact_output_inverts_exact_input():
+    pool = _v3_pool()
+    out = pool.amount_out(USDC, 10**19)
+    needed = pool.amount_in(USDC, out)
+    assert needed <= 10**19
+    assert pool.amount_out(USDC, needed) >= out
+
+
+def test_v3_swap_past_loaded_ticks_refuses_to_guess():
+    pool = _v3_pool()
+    with pytest.raises(InsufficientTickData):
+        pool.swap(True, 10**23)
+
+
+def test_ladder_matches_exact_quotes():
+    pool = _v3_pool()
+    amounts = [10**15, 10**18, 5 * 10**18, 10**19, 10**23]
+    ladder = pool.ladder_out(USDC, np.array(amounts, dtype=float))
+    for amount, approx in zip(amounts[:-1], ladder[:-1]):
+        assert approx == pytest.approx(pool.amount_out(USDC, amount), rel=1e-9)
+    assert np.isnan(ladder[-1])
+
+
+def test_quoter_picks_the_best_pool():
+    v2 = _v2_pool(10**21, 10**21)
+    v3 = _v3_pool()
+    quoter = AmmQuoter(_W3(None), [v2, v3])
+
+    out, pool = quoter.quote_exact_in(WETH, USDC, 10**18)
+    assert pool == V3_POOL
+    assert out == v3.amount_out(WETH, 10**18) > v2.amount_out(WETH, 10**18)
+    assert quoter.ladder(WETH, USDC, [10**18])[0] == pytest.approx(out, rel=1e-9)
+
+
+def _sync_log(block, reserve0, reserve1):
+    return {
+        "address": POOL,
+        "topics": [bytes.fromhex(SYNC_TOPIC[2:])],
+        "data": encode(["uint112", "uint112"], [reserve0, reserve1]),
+        "blockNumber": block,
+        "logIndex": 0,
+    }
+
+
+class _SlowNode:
+    """eth namespace whose get_logs blocks until released."""
+
+    def __init__(self, head, logs):
+        self.block_number = head
+        self.logs = logs
+        self.release = threading.Event()
+        self.fetching = threading.Event()
+
+    def get_logs(self, params):
+        self.fetching.set()
+        self.release.wait(5)
+        return self.logs
+
+
+class _W3:
+    def __init__(self, eth):
+        self.eth = eth
+
+
+def test_quotes_do_not_wait_on_a_refresh_fetching_logs():
+    node = _SlowNode(101, [_sync_log(101, 2 * 10**21, 3 * 10**12)])
+    quoter = AmmQuoter(_W3(node), [_v2_pool()])
+    quoter._synced_block = 100
+
+    refresher = threading.Thread(target=quoter.refresh)
+    refresher.start()
+    assert node.fetching.wait(2)
+
+    started = time.monotonic()
+    before = quoter.quote_exact_in(WETH, USDC, 10**18)
+    assert time.monotonic() - started < 0.5
+    assert before is not None
+
+    node.release.set()
+    refresher.join(2)
+    after = quoter.quote_exact_in(WETH, USDC, 10**18)
+    # Twice the WETH reserve: each WETH now buys roughly half as much USDC
+    assert after[0] < before[0] * 0.51
+    assert quoter._synced_block == 101
@@ -0,0 +1,42 @@
+from acp.seller.balances import BalanceFetcher
+from acp.tests.stub_chain import StubChain, stub_web3
+
+
+USDC = "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913"
+NOT_A_TOKEN = "0x000000000000000000000000000000000000beef"
+
+
+def _wallet(i: int) -> str:
+    return "0x" + f"{i + 1:040x}"
+
+
+def test_all_wallets_are_read_in_chunked_multicalls():
+    chain = StubChain()
+    chain.tokens.add(USDC)
+    wallets = {}
+    for i in range(25):
+        wallet = _wallet(i)
+        chain.eth_balances[wallet] = i * 10**15
+        chain.token_balances[(USDC, wallet)] = i * 10**6
+        wallets[wallet] = [USDC] if i % 2 else []
+
+    fetcher = BalanceFetcher(stub_web3(chain), chunk_size=10)
+    balances = fetcher.fetch(wallets)
+
+    assert balances[_wallet(3)] == {"native": 3 * 10**15, "tokens": {USDC: 3 * 10**6}}
+    assert balances[_wallet(4)] == {"native": 4 * 10**15, "tokens": {}}
+    # 25 native reads + 12 token reads = 37 sub-calls in 4 chunks of 10
+    assert fetcher.last_tick["calls"] == 37
+    assert fetcher.last_tick["chunks"] == 4
+    assert chain.eth_calls() == 4
+
+
+def test_reverting_token_read_is_reported_as_none():
+    chain = StubChain()
+    wallet = _wallet(0)
+    chain.eth_balances[wallet] = 5
+
+    balances = BalanceFetcher(stub_web3(chain)).fetch({wallet: [NOT_A_TOKEN]})
+
+    assert balances[wallet]["native"] == 5
+    assert balances[wallet]["tokens"][NOT_A_TOKEN] is None
@@ -0,0 +1,146 @@
+import os
+
+import pytest
+
+from acp.seller.job_state import JobJournal, JobState, delivery_value
+from acp.seller.job_store import STATUS_COMPLETED, STATUS_FAILED, STATUS_SWAPPING, JobStore
+
+
+def _journal(path):
+    return JobJournal(str(path), fsync=False)
+
+
+def test_replay_restores_open_jobs(tmp_path):
+    jobs = _journal(tmp_path)
+    jobs.advance(1, JobState.REQUEST, wallet={"address": "0xabc"})
+    jobs.advance(1, JobState.NEGOTIATION)
+    jobs.close()
+
+    jobs = _journal(tmp_path)
+    assert jobs.get(1).state == JobState.NEGOTIATION
+    assert jobs.wallet(1) == {"address": "0xabc"}
+
+
+def test_redelivered_request_keeps_the_published_wallet(tmp_path):
+    generated = iter([{"address": "0x1", "private_key": "0xk1"}, {"address": "0x2", "private_key": "0xk2"}])
+    jobs = _journal(tmp_path)
+    first = jobs.designated_wallet(1, lambda: next(generated))
+    jobs.close()
+
+    # Crash before NEGOTIATION was recorded: the SDK delivers REQUEST again
+    jobs = _journal(tmp_path)
+    assert jobs.get(1).state == JobState.REQUEST
+    again = jobs.designated_wallet(1, lambda: next(generated))
+    jobs.close()
+
+    assert again == first == {"address": "0x1", "private_key": "0xk1"}
+    assert _journal(tmp_path).wallet(1) == first
+
+
+def test_torn_tail_is_cut_before_next_append(tmp_path):
+    jobs = _journal(tmp_path)
+    jobs.advance(1, JobState.REQUEST)
+    jobs.advance(1, JobState.NEGOTIATION)
+    jobs.close()
+    with open(os.path.join(tmp_path, "journal.log"), "a", encoding="utf-8") as f:
+        f.write('{"seq": 3, "job_')
+
+    jobs = _journal(tmp_path)
+    jobs.advance(2, JobState.REQUEST)
+    jobs.close()
+
+    jobs = _journal(tmp_path)
+    assert jobs.get(1).state == JobState.NEGOTIATION
+    assert jobs.get(2).state == JobState.REQUEST
+
+
+def test_entry_missing_its_newline_is_dropped(tmp_path):
+    jobs = _journal(tmp_path)
+    jobs.advance(1, JobState.REQUEST)
+    jobs.close()
+    path = os.path.join(tmp_path, "journal.log")
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "ab") as f:
+        f.write(data.replace(b'"seq": 1', b'"seq": 2').replace(b'"request"', b'"negotiation"').rstrip(b"\n"))
+
+    jobs = _journal(tmp_path)
+    jobs.advance(3, JobState.REQUEST)
+    jobs.close()
+
+    jobs = _journal(tmp_path)
+    assert jobs.get(1).state == JobState.REQUEST
+    assert jobs.get(3).state == JobState.REQUEST
+
+
+def test_transaction_recovers_job_stuck_in_request(tmp_path):
+    jobs = _journal(tmp_path)
+    # Crashed after job.respond() but before NEGOTIATION was recorded
+    jobs.advance(1, JobState.REQUEST, wallet={"address": "0xabc"})
+    jobs.close()
+
+    jobs = _journal(tmp_path)
+    assert jobs.advance(1, JobState.TRANSACTION, trade_details={"amount": 1}).state == JobState.TRANSACTION
+
+
+def test_illegal_transition_raises(tmp_path):
+    jobs = _journal(tmp_path)
+    jobs.advance(1, JobState.REQUEST)
+    with pytest.raises(ValueError):
+        jobs.advance(1, JobState.SWAPPED)
+
+
+def _transaction_job(jobs, store, job_id):
+    wallet = {"address": "0xabc", "private_key": "0x01"}
+    trade = {"fromToken": "ETH", "toToken": "USDC", "amount": 1}
+    jobs.advance(job_id, JobState.REQUEST, wallet=wallet)
+    jobs.advance(job_id, JobState.NEGOTIATION)
+    jobs.advance(job_id, JobState.TRANSACTION, trade_details=trade)
+    store.save_job(job_id, wallet, trade)
+
+
+def test_monitor_results_drive_jobs_to_terminal_states(tmp_path):
+    jobs = _journal(tmp_path / "journal")
+    store = JobStore(str(tmp_path / "jobs.db"))
+    for job_id in (1, 2, 3):
+        _transaction_job(jobs, store, job_id)
+
+    store.update_status(1, STATUS_SWAPPING)
+    store.update_status(2, STATUS_COMPLETED, {"transaction": {"transactionHash": "0xfeed"}})
+    store.update_status(3, STATUS_FAILED, {"error": "reverted"})
+    delivered = []
+    jobs.deliver_finished(store, lambda record: delivered.append((record.job_id, delivery_value(record))))
+
+    assert jobs.get(1).state == JobState.FUNDED
+    assert jobs.get(2).state == JobState.DELIVERED
+    assert jobs.get(3).state == JobState.FAILED
+    assert dict(delivered)["2"]["transaction_hash"] == "0xfeed"
+    assert dict(delivered)["3"]["status"] == "FAILURE"
+    assert set(jobs.open_jobs()) == {"1"}
+
+
+def test_failed_delivery_is_retried(tmp_path):
+    jobs = _journal(tmp_path / "journal")
+    store = JobStore(str(tmp_path / "jobs.db"))
+    _transaction_job(jobs, store, 1)
+    store.update_status(1, STATUS_COMPLETED, {"transaction": {"transactionHash": "0xfeed"}})
+
+    def broken(record):
+        raise RuntimeError("ACP unavailable")
+
+    jobs.deliver_finished(store, broken)
+    assert jobs.get(1).state == JobState.SWAPPED
+    jobs.deliver_finished(store, lambda record: None)
+    assert jobs.get(1).state == JobState.DELIVERED
+
+
+def test_snapshot_prunes_delivered_jobs(tmp_path):
+    jobs = JobJournal(str(tmp_path / "journal"), snapshot_every=6, fsync=False)
+    store = JobStore(str(tmp_path / "jobs.db"))
+    _transaction_job(jobs, store, 1)
+    store.update_status(1, STATUS_COMPLETED, {})
+    jobs.deliver_finished(store, lambda record: None)
+    jobs.close()
+
+    jobs = _journal(tmp_path / "journal")
+    assert jobs.get(1) is None
@@ -0,0 +1,71 @@
+from eth_account.typed_transactions import TypedTransaction
+from web3 import Web3
+
+from acp.common.nonces import NonceManager, send_with_nonce
+from acp.tests.stub_chain import StubChain, stub_web3
+
+
+PRIVATE_KEY = "0x" + "11" * 32
+
+
+class _Node:
+    """Stands in for the RPC calls the nonce manager makes."""
+
+    def __init__(self, w3, error=None, pending=7):
+        self.error = error
+        self.pending = pending
+        self.sent = []
+        w3.eth.get_transaction_count = lambda address, block: self.pending
+        w3.eth.send_raw_transaction = self.send_raw_transaction
+
+    def send_raw_transaction(self, raw):
+        self.sent.append(raw)
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        return Web3.keccak(raw)
+
+
+def _tx(w3):
+    address = w3.eth.account.from_key(PRIVATE_KEY).address
+    return {"to": address, "value": 0, "gas": 21000, "maxFeePerGas": 10, "maxPriorityFeePerGas": 1, "chainId": 8453}
+
+
+def test_already_known_counts_as_sent():
+    w3 = Web3()
+    node = _Node(w3, error=ValueError({"code": -32000, "message": "already known"}))
+    tx_hash, sent = send_with_nonce(w3, _tx(w3), PRIVATE_KEY)
+
+    signed = w3.eth.account.sign_transaction(sent, PRIVATE_KEY)
+    assert sent["nonce"] == 7
+    assert tx_hash == signed.hash
+    assert len(node.sent) == 1
+
+
+def test_nonce_too_low_resyncs_and_retries():
+    w3 = Web3()
+    node = _Node(w3, error=ValueError({"code": -32000, "message": "nonce too low"}))
+    send_with_nonce(w3, _tx(w3), PRIVATE_KEY)
+    node.error = ValueError({"code": -32000, "message": "nonce too low"})
+    node.pending = 12
+    _, sent = send_with_nonce(w3, _tx(w3), PRIVATE_KEY)
+
+    assert sent["nonce"] == 12
+    assert len(node.sent) == 4
+
+
+def test_in_flight_nonce_is_not_treated_as_a_gap():
+    w3 = stub_web3(StubChain())
+    node = _Node(w3, pending=7)
+    manager = NonceManager(w3)
+    address = w3.eth.account.from_key(PRIVATE_KEY).address
+    approval, swap, later = (manager.next_nonce(address) for _ in range(3))
+    assert (approval, swap, later) == (7, 8, 9)
+    # The swap at 8 failed to send; the approval at 7 has not reached this node yet
+    manager.release(address, swap)
+
+    assert manager.find_gaps(address) == [8]
+    manager.fill_gaps(address, PRIVATE_KEY, fees={"maxFeePerGas": 10, "maxPriorityFeePerGas": 1})
+    assert len(node.sent) == 1
+    assert TypedTransaction.from_bytes(node.sent[0]).as_dict()["nonce"] == 8
+    assert manager.find_gaps(address) == []
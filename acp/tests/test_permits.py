@@ -0,0 +1,129 @@
+import pytest
+from eth_abi import decode, encode
+from eth_account import Account
+from eth_keys import keys
+from web3 import Web3
+
+from acp.common.kyber import DESC_PERMIT, NATIVE_TOKEN, SWAP_DESCRIPTION, SWAP_SIMPLE_MODE_SELECTOR, decode_swap, encode_swap
+from acp.common.permits import _domain_separator, with_permit
+from acp.tests.stub_chain import Revert, StubChain, stub_web3
+
+
+ROUTER = "0x6131B5fae19EA4f9D964eAc0408E4408b66337b5"
+RECEIVER = "0x00000000000000000000000000000000000000aa"
+PRIVATE_KEY = "0x" + "11" * 32
+OWNER = Account.from_key(PRIVATE_KEY).address
+
+_PERMIT_TYPEHASH = Web3.keccak(
+    text="Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)"
+)
+
+
+class MockPermitToken:
+    """EIP-2612 token: serves the domain reads and checks permits the way the contract's ``permit`` does."""
+
+    def __init__(self, address, name="Mock USD", version="1", chain_id=8453, expose_version=True):
+        self.address = address.lower()
+        self.name = name
+        self.version = version
+        self.expose_version = expose_version
+        self.separator = _domain_separator(name, version, chain_id, address)
+        self.nonces = {}
+        self.allowances = {}
+
+    def __call__(self, data: bytes) -> bytes:
+        selector, body = data[:4].hex(), data[4:]
+        if selector == "3644e515":
+            return self.separator
+        if selector == "7ecebe00":
+            (owner,) = decode(["address"], body)
+            return encode(["uint256"], [self.nonces.get(owner.lower(), 0)])
+        if selector == "06fdde03":
+            return encode(["string"], [self.name])
+        if selector == "54fd4d50" and self.expose_version:
+            return encode(["string"], [self.version])
+        raise Revert("unknown selector")
+
+    def permit(self, owner, spender, value, deadline, v, r, s):
+        nonce = self.nonces.get(owner.lower(), 0)
+        struct_hash = Web3.keccak(encode(
+            ["bytes32", "address", "address", "uint256", "uint256", "uint256"],
+            [_PERMIT_TYPEHASH, owner, spender, value, nonce, deadline],
+        ))
+        digest = Web3.keccak(b"\x19\x01" + self.separator + struct_hash)
+        signature = keys.Signature(vrs=(v - 27, int.from_bytes(r, "big"), int.from_bytes(s, "big")))
+        signer = signature.recover_public_key_from_msg_hash(digest).to_checksum_address()
+        if signer.lower() != owner.lower():
+            raise Revert("INVALID_SIGNER")
+        self.nonces[owner.lower()] = nonce + 1
+        self.allowances[(owner.lower(), spender.lower())] = value
+
+
+def _swap_tx(token: str, amount: int) -> dict:
+    desc = (token, "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913", [], [], [], [], RECEIVER, amount, 1, 0, b"")
+    data = SWAP_SIMPLE_MODE_SELECTOR + encode(["address", SWAP_DESCRIPTION, "bytes", "bytes"], [ROUTER, desc, b"", b""])
+    return {"to": ROUTER, "data": Web3.to_hex(data), "value": 0}
+
+
+def _chain_with(token: MockPermitToken) -> StubChain:
+    chain = StubChain()
+    chain.contracts[token.address] = token
+    return chain
+
+
+def test_permit_in_calldata_recovers_to_the_owner():
+    token = MockPermitToken("0x0000000000000000000000000000000000001001")
+    token.nonces[OWNER.lower()] = 3
+    w3 = stub_web3(_chain_with(token))
+
+    tx = with_permit(w3, _swap_tx(token.address, 5_000_000), PRIVATE_KEY)
+
+    assert tx is not None and tx["to"] == ROUTER
+    _, _, desc = decode_swap(tx["data"])
+    value, deadline, v, r, s = decode(["uint256", "uint256", "uint8", "bytes32", "bytes32"], desc[DESC_PERMIT])
+    assert value == 5_000_000
+    token.permit(OWNER, ROUTER, value, deadline, v, r, s)
+    assert token.allowances[(OWNER.lower(), ROUTER.lower())] == 5_000_000
+    assert token.nonces[OWNER.lower()] == 4
+
+
+def test_permit_domain_falls_back_to_common_versions():
+    token = MockPermitToken("0x0000000000000000000000000000000000001002", version="2", expose_version=False)
+    w3 = stub_web3(_chain_with(token))
+
+    tx = with_permit(w3, _swap_tx(token.address, 7), PRIVATE_KEY)
+
+    _, _, desc = decode_swap(tx["data"])
+    token.permit(OWNER, ROUTER, *decode(["uint256", "uint256", "uint8", "bytes32", "bytes32"], desc[DESC_PERMIT]))
+
+
+def test_permit_signed_for_another_spender_is_rejected():
+    token = MockPermitToken("0x0000000000000000000000000000000000001003")
+    w3 = stub_web3(_chain_with(token))
+
+    tx = with_permit(w3, _swap_tx(token.address, 7), PRIVATE_KEY)
+
+    _, _, desc = decode_swap(tx["data"])
+    value, deadline, v, r, s = decode(["uint256", "uint256", "uint8", "bytes32", "bytes32"], desc[DESC_PERMIT])
+    with pytest.raises(Revert):
+        token.permit(OWNER, RECEIVER, value, deadline, v, r, s)
+
+
+def test_tokens_without_permit_and_native_sells_are_left_alone():
+    plain = "0x0000000000000000000000000000000000001004"
+    chain = StubChain()
+    chain.tokens.add(plain)
+    w3 = stub_web3(chain)
+
+    assert with_permit(w3, _swap_tx(plain, 7), PRIVATE_KEY) is None
+    assert with_permit(w3, _swap_tx(NATIVE_TOKEN, 7), PRIVATE_KEY) is None
+
+
+def test_existing_permit_is_not_replaced():
+    token = MockPermitToken("0x0000000000000000000000000000000000001005")
+    w3 = stub_web3(_chain_with(token))
+    selector, args, desc = decode_swap(_swap_tx(token.address, 7)["data"])
+    desc[DESC_PERMIT] = b"\x01"
+    tx = {"to": ROUTER, "data": Web3.to_hex(encode_swap(selector, args, desc)), "value": 0}
+
+    assert with_permit(w3, tx, PRIVATE_KEY) is None
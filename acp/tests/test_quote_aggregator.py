@@ -0,0 +1,82 @@
+import time
+
+from web3 import Web3
+
+from acp.common.kyber import NATIVE_TOKEN
+from acp.common.tokens import ETH_ADDRESS, swap_token
+from acp.seller.quote_aggregator import QuoteAggregator, QuoteRequest, SourceQuote
+
+
+USDC = "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
+RECIPIENT = "0x000000000000000000000000000000000000dEaD"
+
+
+class _Source:
+    def __init__(self, name, amount_out, gas=100000, executable=True, delay=0.0):
+        self.name = name
+        self.amount_out = amount_out
+        self.gas = gas
+        self.executable = executable
+        self.delay = delay
+
+    def quote(self, request):
+        time.sleep(self.delay)
+        tx_data = {"to": RECIPIENT, "data": "0x"} if self.executable else None
+        return SourceQuote(self.name, self.amount_out, self.gas, tx_data)
+
+
+def _aggregator(sources, deadline_ms=200, gas_price=None, executable_deadline_ms=5000):
+    aggregator = QuoteAggregator(Web3(), sources, deadline_ms=deadline_ms, executable_deadline_ms=executable_deadline_ms)
+    aggregator._gas_price = lambda: gas_price
+    return aggregator
+
+
+def test_only_the_eth_symbol_is_routed_as_native():
+    assert swap_token("ETH", ETH_ADDRESS) == NATIVE_TOKEN
+    assert swap_token(" eth ", ETH_ADDRESS) == NATIVE_TOKEN
+    assert swap_token("WETH", ETH_ADDRESS) == ETH_ADDRESS
+    assert swap_token(ETH_ADDRESS, ETH_ADDRESS) == ETH_ADDRESS
+
+    request = QuoteRequest(swap_token("ETH", ETH_ADDRESS), USDC, "1", 18, 6, RECIPIENT)
+    assert request.sell_is_native and not request.buy_is_native
+    assert not QuoteRequest(ETH_ADDRESS, USDC, "1", 18, 6, RECIPIENT).sell_is_native
+
+
+def test_gas_is_netted_when_buying_eth():
+    cheap = _Source("cheap", amount_out=10**18, gas=100000)
+    pricey = _Source("pricey", amount_out=10**18 + 10**14, gas=1000000)
+    race = _aggregator([cheap, pricey], gas_price=10**9).race(QuoteRequest(USDC, NATIVE_TOKEN, "3000", 6, 18, RECIPIENT))
+    # 900k extra gas at 1 gwei costs 9e14 wei, more than the 1e14 extra output
+    assert race.best.source == "cheap"
+
+
+def test_slow_executable_quote_is_awaited_past_the_deadline():
+    kyber = _Source("kyberswap", amount_out=100, delay=0.4)
+    service = _Source("trade-service", amount_out=120, executable=False)
+    race = _aggregator([kyber, service], deadline_ms=100).race(
+        QuoteRequest(USDC, NATIVE_TOKEN, "1", 6, 18, RECIPIENT), executable_only=True
+    )
+    assert race.best is not None and race.best.source == "kyberswap"
+    assert race.dropped == []
+
+
+def test_hung_route_build_is_dropped_at_the_hard_cap():
+    hung = _Source("kyberswap", amount_out=100, delay=2.0)
+    service = _Source("trade-service", amount_out=120, executable=False)
+    started = time.monotonic()
+    race = _aggregator([hung, service], deadline_ms=100, executable_deadline_ms=300).race(
+        QuoteRequest(USDC, NATIVE_TOKEN, "1", 6, 18, RECIPIENT), executable_only=True
+    )
+    assert time.monotonic() - started < 1.0
+    assert race.best is None
+    assert race.dropped == ["kyberswap"]
+
+
+def test_deadline_still_drops_slow_sources_once_something_is_executable():
+    fast = _Source("fast", amount_out=100)
+    slow = _Source("slow", amount_out=200, delay=0.5)
+    race = _aggregator([fast, slow], deadline_ms=100).race(
+        QuoteRequest(USDC, NATIVE_TOKEN, "1", 6, 18, RECIPIENT), executable_only=True
+    )
+    assert race.best.source == "fast"
+    assert race.dropped == ["slow"]
@@ -0,0 +1,22 @@
+import threading
+from concurrent.futures import Future
+
+from acp.common.receipts import TxHandle, off_tracker, when_all_done
+
+
+def test_off_tracker_continuation_runs_on_a_worker_thread():
+    future = Future()
+    ran = threading.Event()
+    seen = {}
+
+    def slow_delivery():
+        seen["thread"] = threading.current_thread().name
+        ran.set()
+
+    when_all_done([TxHandle("0x01", future)], off_tracker(slow_delivery))
+    resolver = threading.Thread(target=future.set_result, args=({"status": 1},), name="receipt-tracker")
+    resolver.start()
+    resolver.join()
+
+    assert ran.wait(2)
+    assert seen["thread"].startswith("tx-continuation")
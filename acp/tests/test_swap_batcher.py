@@ -0,0 +1,186 @@
+from eth_abi import decode, encode
+from eth_account import Account
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from acp.common.kyber import (
+    FLAG_PARTIAL_FILL,
+    NATIVE_TOKEN,
+    SWAP_DESCRIPTION,
+    SWAP_SIMPLE_MODE_SELECTOR,
+    SWAPPED_DATA_TYPES,
+    SWAPPED_TOPIC,
+)
+from acp.common.multicall import MULTICALL3_ADDRESS
+from acp.seller import swap_batcher
+from acp.seller.swap_batcher import SwapBatcher
+from acp.tests.stub_chain import Revert, StubChain, stub_web3
+
+
+ROUTER = "0x6131B5fae19EA4f9D964eAc0408E4408b66337b5"
+USDC = "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913"
+OTHER = "0x00000000000000000000000000000000000000aa"
+PRIVATE_KEY = "0x" + "22" * 32
+WALLET = Account.from_key(PRIVATE_KEY).address
+AGGREGATE3_VALUE = bytes.fromhex("174dea71")
+TIMEOUT = 5
+
+
+def _swap(amount, src=NATIVE_TOKEN, receiver=WALLET, flags=0, value=None):
+    desc = (src, USDC, [], [], [], [], receiver, amount, 1, flags, b"")
+    data = SWAP_SIMPLE_MODE_SELECTOR + encode(["address", SWAP_DESCRIPTION, "bytes", "bytes"], [ROUTER, desc, b"", b""])
+    return {"to": ROUTER, "data": Web3.to_hex(data), "value": str(amount if value is None else value), "gas": "150000"}
+
+
+def _swapped_log(amount, returned, receiver=WALLET):
+    return {
+        "address": ROUTER,
+        "topics": [bytes.fromhex(SWAPPED_TOPIC[2:])],
+        "data": encode(SWAPPED_DATA_TYPES, [MULTICALL3_ADDRESS, NATIVE_TOKEN, USDC, receiver, amount, returned]),
+    }
+
+
+class _Handle:
+    def __init__(self, tx_hash, receipt):
+        self.tx_hash = tx_hash
+        self._receipt = receipt
+
+    def exception(self):
+        return None
+
+    def receipt(self):
+        return self._receipt
+
+    def add_done_callback(self, fn):
+        fn(self)
+
+
+class _Gas:
+    def estimate(self, tx, token_pair=None, fallback=200000):
+        return fallback
+
+    def record_when_mined(self, handle, tx, token_pair=None):
+        pass
+
+
+class _Node:
+    """Sends transactions into a list and mines each with the receipt ``mine(tx)`` returns."""
+
+    def __init__(self, monkeypatch, mine):
+        self.sent = []
+        self.mine = mine
+        self.chain = StubChain()
+        self.chain.contracts[MULTICALL3_ADDRESS.lower()] = self.simulate
+        self.simulation_reverts = False
+        monkeypatch.setattr(swap_batcher, "send_transaction", self.send)
+        monkeypatch.setattr(swap_batcher, "fee_fields", lambda w3: {})
+        monkeypatch.setattr(swap_batcher, "get_gas_estimator", lambda w3: _Gas())
+
+    def simulate(self, data: bytes) -> bytes:
+        assert data[:4] == AGGREGATE3_VALUE
+        if self.simulation_reverts:
+            raise Revert("Multicall3: call failed")
+        (calls,) = decode(["(address,bool,uint256,bytes)[]"], data[4:])
+        return encode(["(bool,bytes)[]"], [[(True, b"") for _ in calls]])
+
+    def send(self, w3, tx, private_key):
+        self.sent.append(tx)
+        status, gas_used, logs = self.mine(tx)
+        receipt = AttributeDict({"status": status, "gasUsed": gas_used, "blockNumber": 100 + len(self.sent), "logs": logs})
+        return _Handle(f"0x{len(self.sent):064x}", receipt)
+
+    def batches(self):
+        return [tx for tx in self.sent if tx["to"].lower() == MULTICALL3_ADDRESS.lower()]
+
+
+def _batched_calls(tx):
+    (calls,) = decode(["(address,bool,uint256,bytes)[]"], Web3.to_bytes(hexstr=tx["data"])[4:])
+    return calls
+
+
+def _batcher(node, max_jobs=3):
+    return SwapBatcher(stub_web3(node.chain), PRIVATE_KEY, max_jobs=max_jobs, max_wait_ms=60_000)
+
+
+def test_native_swaps_share_one_transaction_and_are_attributed_from_swapped_logs(monkeypatch):
+    def mine(tx):
+        calls = _batched_calls(tx)
+        logs = []
+        for _, _, value, _ in calls:
+            # Pools emit their own logs in between; only Swapped logs count
+            logs.append({"address": USDC, "topics": [b"\x00" * 32], "data": b""})
+            logs.append(_swapped_log(value, value * 3))
+        return 1, 300_000, logs
+
+    node = _Node(monkeypatch, mine)
+    batcher = _batcher(node)
+    futures = [batcher.submit(job, _swap(10**15 * job)) for job in (1, 2, 3)]
+    results = [f.result(TIMEOUT) for f in futures]
+
+    assert len(node.sent) == 1
+    tx = node.sent[0]
+    assert tx["value"] == 6 * 10**15
+    assert [(to.lower(), allow_failure, value) for to, allow_failure, value, _ in _batched_calls(tx)] == [
+        (ROUTER.lower(), False, 10**15), (ROUTER.lower(), False, 2 * 10**15), (ROUTER.lower(), False, 3 * 10**15)
+    ]
+    assert [r["return_amount"] for r in results] == [3 * 10**15, 6 * 10**15, 9 * 10**15]
+    assert all(r["success"] and r["batch_size"] == 3 and r["tx_hash"] == results[0]["tx_hash"] for r in results)
+    stats = batcher.stats
+    assert stats["transactions"] == 1 and stats["jobs_per_tx"] == 3
+    assert stats["gas_per_job"] == 100_000
+
+
+def test_swap_without_matching_log_is_reported_failed(monkeypatch):
+    # The second swap's Swapped log is missing: only the first and third are attributed
+    def mine(tx):
+        values = [value for _, _, value, _ in _batched_calls(tx)]
+        return 1, 300_000, [_swapped_log(values[0], 1), _swapped_log(values[2], 3)]
+
+    node = _Node(monkeypatch, mine)
+    batcher = _batcher(node)
+    results = [f.result(TIMEOUT) for f in [batcher.submit(job, _swap(job)) for job in (1, 2, 3)]]
+
+    assert [(r["success"], r["return_amount"]) for r in results] == [(True, 1), (False, None), (True, 3)]
+
+
+def test_swaps_that_could_strand_eth_in_multicall_are_sent_alone(monkeypatch):
+    node = _Node(monkeypatch, lambda tx: (1, 120_000, []))
+    batcher = _batcher(node, max_jobs=4)
+    swaps = [
+        _swap(10, receiver=OTHER),               # output paid to someone else
+        _swap(10, flags=FLAG_PARTIAL_FILL),      # router may refund to msg.sender
+        _swap(10, value=11),                     # msg.value differs from the amount
+        _swap(10, src=USDC, value=0),            # ERC-20 sell
+    ]
+    results = [f.result(TIMEOUT) for f in [batcher.submit(i, tx) for i, tx in enumerate(swaps)]]
+
+    assert not node.batches()
+    assert [tx["to"] for tx in node.sent] == [ROUTER] * 4
+    assert all(r["batch_size"] == 1 and r["success"] for r in results)
+
+
+def test_batch_that_fails_simulation_is_sent_swap_by_swap(monkeypatch):
+    node = _Node(monkeypatch, lambda tx: (1, 120_000, []))
+    node.simulation_reverts = True
+    batcher = _batcher(node)
+    results = [f.result(TIMEOUT) for f in [batcher.submit(job, _swap(job)) for job in (1, 2, 3)]]
+
+    assert not node.batches()
+    assert [tx["value"] for tx in node.sent] == [1, 2, 3]
+    assert all(r["batch_size"] == 1 for r in results)
+
+
+def test_mined_batch_revert_resends_each_swap_alone(monkeypatch):
+    def mine(tx):
+        if tx["to"].lower() == MULTICALL3_ADDRESS.lower():
+            return 0, 50_000, []
+        return 1, 120_000, []
+
+    node = _Node(monkeypatch, mine)
+    batcher = _batcher(node)
+    results = [f.result(TIMEOUT) for f in [batcher.submit(job, _swap(job)) for job in (1, 2, 3)]]
+
+    assert len(node.batches()) == 1
+    assert [tx["value"] for tx in node.sent[1:]] == [1, 2, 3]
+    assert all(r["batch_size"] == 1 and r["success"] for r in results)
+    assert batcher.stats["reverted_batches"] == 1
@@ -0,0 +1,44 @@
+from eth_abi import encode
+
+from acp.common.token_metadata import TokenMetadataResolver
+from acp.common.tokens import TokenRegistry
+from acp.tests.stub_chain import Revert, StubChain, stub_web3
+
+
+USDC = "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
+TOKEN_A = "0x0000000000000000000000000000000000000a0a"
+TOKEN_B = "0x0000000000000000000000000000000000000b0b"
+
+
+def _erc20(symbol, decimals):
+    def call(data):
+        selector = data[:4].hex()
+        if selector == "313ce567":
+            return encode(["uint8"], [decimals])
+        if selector == "95d89b41":
+            return encode(["string"], [symbol])
+        raise Revert("unknown selector")
+    return call
+
+
+def _registry(tmp_path):
+    csv_path = tmp_path / "tokens.csv"
+    csv_path.write_text(f"Token,Full Name,Contract Address,decimals\nUSDC,USD Coin,{USDC},6\n")
+    chain = StubChain()
+    chain.contracts[TOKEN_A] = _erc20("AAA", 8)
+    chain.contracts[TOKEN_B] = _erc20("BBB", 12)
+    metadata = TokenMetadataResolver(rpc_url="http://stub", cache_path=str(tmp_path / "metadata.json"))
+    metadata._w3 = stub_web3(chain)
+    return TokenRegistry(str(csv_path), metadata=metadata), chain
+
+
+def test_prefetch_reads_unknown_addresses_in_one_batch(tmp_path):
+    registry, chain = _registry(tmp_path)
+
+    registry.prefetch(["USDC", "ETH", "", USDC, TOKEN_A, TOKEN_B])
+
+    assert chain.eth_calls() == 1
+    assert registry.resolve(TOKEN_A)[1] == 8
+    assert registry.resolve(TOKEN_B)[1] == 12
+    assert registry.resolve("USDC") == (USDC, 6)
+    assert chain.eth_calls() == 1
@@ -0,0 +1,75 @@
+import pytest
+
+from acp.seller.trade_client import TradeServiceClient
+from acp.seller.trade_service_standin import serve
+
+
+USDC = "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
+WETH = "0x4200000000000000000000000000000000000006"
+
+
+def _requests(amounts):
+    return [
+        ("token_to_token", {"amount_in": str(a), "token_in": USDC, "token_out": WETH, "recipient": None, "slippage_pct": 0.5})
+        for a in amounts
+    ]
+
+
+@pytest.fixture
+def standin():
+    servers = []
+
+    def _start(**kwargs):
+        server = serve(latency=0.01, **kwargs)
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+
+
+def test_quote_batch_sends_one_post_per_chunk(standin):
+    server = standin()
+    client = TradeServiceClient(server.base_url, server.api_key, quote_cache=False)
+
+    results = client.quote_batch(_requests(range(1, 26)), max_batch=10)
+
+    assert [r["data"]["amountOut"] for r in results] == [str(2 * a) for a in range(1, 26)]
+    assert client.batch_supported is True
+    assert server.requests_served == 3
+
+
+def test_quote_batch_sends_duplicates_and_cached_quotes_once(standin):
+    server = standin()
+    client = TradeServiceClient(server.base_url, server.api_key)
+    client.quote_token_to_token("1", USDC, WETH, None, 0.5)
+
+    results = client.quote_batch(_requests([1, 2, 2, 3]))
+
+    assert [r["data"]["amountOut"] for r in results] == ["2", "4", "4", "6"]
+    assert results[1] is not results[2]
+    # One GET for the cached quote, then one POST carrying only 2 and 3
+    assert server.requests_served == 2
+
+
+def test_quote_batch_falls_back_to_single_gets(standin):
+    server = standin(batch_supported=False)
+    client = TradeServiceClient(server.base_url, server.api_key, quote_cache=False)
+
+    results = client.quote_batch(_requests(range(1, 6)), max_batch=2)
+
+    assert [r["data"]["amountOut"] for r in results] == [str(2 * a) for a in range(1, 6)]
+    assert client.batch_supported is False
+    assert server.requests_served == 5
+
+
+def test_failed_batch_item_does_not_fail_the_others(standin):
+    server = standin()
+    client = TradeServiceClient(server.base_url, server.api_key, quote_cache=False)
+
+    results = client.quote_batch(_requests(["1", "not-a-number", "3"]))
+
+    assert results[0]["data"]["amountOut"] == "2"
+    assert isinstance(results[1], RuntimeError)
+    assert results[2]["data"]["amountOut"] == "6"
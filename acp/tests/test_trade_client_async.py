@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import pytest
+
+from acp.seller.trade_client_async import AsyncTradeServiceClient
+from acp.seller.trade_service_standin import serve
+
+
+USDC = "0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913"
+WETH = "0x4200000000000000000000000000000000000006"
+
+
+def _requests(amounts):
+    return [
+        ("token_to_token", {"amount_in": str(a), "token_in": USDC, "token_out": WETH, "recipient": None, "slippage_pct": 0.5})
+        for a in amounts
+    ]
+
+
+@pytest.fixture
+def standin():
+    servers = []
+
+    def _start(**kwargs):
+        server = serve(**kwargs)
+        servers.append(server)
+        return server
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+
+
+def _quote_many(server, requests, max_connections=16, timeout=None):
+    async def _run():
+        async with AsyncTradeServiceClient(
+            server.base_url, server.api_key, max_connections=max_connections, quote_cache=False
+        ) as client:
+            return await client.quote_many(requests, timeout=timeout)
+
+    return asyncio.run(_run())
+
+
+def test_quote_many_runs_concurrently_and_keeps_request_order(standin):
+    server = standin(latency=0.2)
+
+    started = time.monotonic()
+    results = _quote_many(server, _requests(range(1, 11)))
+    elapsed = time.monotonic() - started
+
+    assert [r["data"]["amountOut"] for r in results] == [str(2 * a) for a in range(1, 11)]
+    assert server.requests_served == 10
+    # Ten 200 ms requests one after another would take 2 s
+    assert elapsed < 1.0
+
+
+def test_connection_limit_queues_requests(standin):
+    server = standin(latency=0.1)
+
+    started = time.monotonic()
+    results = _quote_many(server, _requests(range(1, 7)), max_connections=2)
+    elapsed = time.monotonic() - started
+
+    assert not any(isinstance(r, BaseException) for r in results)
+    # Six requests over two connections take at least three round trips
+    assert elapsed >= 0.3
+
+
+def test_late_requests_fail_alone_at_the_deadline(standin):
+    server = standin(latency=0.5)
+
+    started = time.monotonic()
+    results = _quote_many(server, _requests([1, 2]), timeout=0.1)
+
+    assert time.monotonic() - started < 0.4
+    assert all(isinstance(r, asyncio.TimeoutError) for r in results)
+
+
+def test_identical_quotes_share_one_request(standin):
+    server = standin(latency=0.1)
+
+    results = _quote_many(server, _requests([5] * 5))
+
+    assert [r["data"]["amountOut"] for r in results] == ["10"] * 5
+    assert server.requests_served == 1
@@ -0,0 +1,93 @@
+from decimal import ROUND_FLOOR, Decimal, getcontext
+
+from acp.common.v3_math import (
+    MAX_SQRT_RATIO,
+    MAX_TICK,
+    MIN_SQRT_RATIO,
+    MIN_TICK,
+    Q96,
+    compute_swap_step,
+    get_sqrt_ratio_at_tick,
+)
+
+
+def encode_price_sqrt(reserve1: int, reserve0: int) -> int:
+    """sqrt(reserve1 / reserve0) as Q64.96, rounded down like the Uniswap test helper."""
+    getcontext().prec = 80
+    return int(((Decimal(reserve1) / Decimal(reserve0)).sqrt() * Q96).to_integral_value(ROUND_FLOOR))
+
+
+E18 = 10**18
+
+
+def test_sqrt_ratio_at_tick_bounds_and_center():
+    assert get_sqrt_ratio_at_tick(MIN_TICK) == MIN_SQRT_RATIO
+    assert get_sqrt_ratio_at_tick(MAX_TICK) == MAX_SQRT_RATIO
+    assert get_sqrt_ratio_at_tick(0) == Q96
+
+
+def test_sqrt_ratio_at_tick_tracks_sqrt_of_1_0001_pow_tick():
+    getcontext().prec = 80
+    for tick in (-500000, -50000, -5000, -60, -1, 1, 60, 5000, 50000, 500000):
+        exact = Decimal("1.0001") ** tick
+        expected = exact.sqrt() * Q96
+        assert abs(Decimal(get_sqrt_ratio_at_tick(tick)) - expected) / expected < Decimal("1e-12")
+
+
+# Cases and expected outputs from Uniswap v3-core's SwapMath tests
+def test_exact_in_capped_at_price_target_one_for_zero():
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(101, 100)
+    sqrt_q, amount_in, amount_out, fee = compute_swap_step(price, target, 2 * E18, E18, 600)
+    assert (amount_in, fee, amount_out) == (9975124224178055, 5988667735148, 9925619580021728)
+    assert sqrt_q == target
+
+
+def test_exact_out_capped_at_price_target_one_for_zero():
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(101, 100)
+    sqrt_q, amount_in, amount_out, fee = compute_swap_step(price, target, 2 * E18, -E18, 600)
+    assert (amount_in, fee, amount_out) == (9975124224178055, 5988667735148, 9925619580021728)
+    assert sqrt_q == target
+
+
+def test_exact_in_fully_spent_one_for_zero():
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(1000, 100)
+    sqrt_q, amount_in, amount_out, fee = compute_swap_step(price, target, 2 * E18, E18, 600)
+    assert (amount_in, fee, amount_out) == (999400000000000000, 600000000000000, 666399946655997866)
+    assert amount_in + fee == E18
+    assert sqrt_q < target
+
+
+def test_exact_out_fully_received_one_for_zero():
+    price, target = encode_price_sqrt(1, 1), encode_price_sqrt(10000, 100)
+    sqrt_q, amount_in, amount_out, fee = compute_swap_step(price, target, 2 * E18, -E18, 600)
+    assert (amount_in, fee, amount_out) == (2 * E18, 1200720432259356, E18)
+    assert sqrt_q < target
+
+
+def test_amount_out_is_capped_at_the_desired_amount_out():
+    result = compute_swap_step(
+        417332158212080721273783715441582, 1452870262520218020823638996, 159344665391607089467575320103, -1, 1
+    )
+    assert result == (417332158212080721273783715441581, 1, 1, 1)
+
+
+def test_target_price_of_1_uses_partial_input_amount():
+    result = compute_swap_step(2, 1, 1, 3915081100057732413702495386755767, 1)
+    assert result == (1, 39614081257132168796771975168, 0, 39614120871253040049813)
+
+
+def test_entire_input_amount_taken_as_fee():
+    result = compute_swap_step(2413, 79887613182836312, 1985041575832132834610021537970, 10, 1872)
+    assert result == (2413, 0, 0, 10)
+
+
+def test_intermediate_insufficient_liquidity_zero_for_one_exact_output():
+    price = 20282409603651670423947251286016
+    target = price * 11 // 10
+    assert compute_swap_step(price, target, 1024, -4, 3000) == (target, 26215, 0, 79)
+
+
+def test_intermediate_insufficient_liquidity_one_for_zero_exact_output():
+    price = 20282409603651670423947251286016
+    target = price * 9 // 10
+    assert compute_swap_step(price, target, 1024, -263000, 3000) == (target, 1, 26214, 1)
@@ -0,0 +1,68 @@
+from eth_abi import encode
+from eth_account import Account
+from web3 import Web3
+from web3.datastructures import AttributeDict
+
+from acp.common.kyber import NATIVE_TOKEN, SWAP_DESCRIPTION, SWAP_SIMPLE_MODE_SELECTOR
+from acp.seller import warm_quotes
+from acp.seller.quote_aggregator import QuoteRequest, SourceQuote
+from acp.seller.warm_quotes import WarmQuote, execute_warm_quote
+from acp.tests.stub_chain import Revert, StubChain, stub_web3
+
+
+ROUTER = "0x6131B5fae19EA4f9D964eAc0408E4408b66337b5"
+USDC = "0x833589fcd6edb6e08f4c7c32d4f71b54bda02913"
+PRIVATE_KEY = "0x" + "33" * 32
+WALLET = Account.from_key(PRIVATE_KEY).address
+
+
+class _Gas:
+    def estimate(self, tx, token_pair=None, fallback=200000):
+        return fallback
+
+    def record_when_mined(self, handle, tx, token_pair=None):
+        pass
+
+
+class _Handle:
+    tx_hash = "0x" + "ab" * 32
+
+    def receipt(self, timeout=None):
+        return AttributeDict({"status": 1, "blockNumber": 101, "gasUsed": 150_000})
+
+
+def _warm(amount=10**15):
+    desc = (NATIVE_TOKEN, USDC, [], [], [], [], WALLET, amount, 3_000_000, 0, b"")
+    data = SWAP_SIMPLE_MODE_SELECTOR + encode(["address", SWAP_DESCRIPTION, "bytes", "bytes"], [ROUTER, desc, b"", b""])
+    tx_data = {"to": ROUTER, "data": Web3.to_hex(data), "value": str(amount)}
+    request = QuoteRequest(NATIVE_TOKEN, USDC, "0.001", 18, 6, WALLET)
+    return WarmQuote(7, request, SourceQuote("kyberswap", 3_000_000, 180_000, tx_data), block=98, probe=None)
+
+
+def _setup(monkeypatch, router):
+    sent = []
+    chain = StubChain()
+    chain.contracts[ROUTER.lower()] = router
+    monkeypatch.setattr(warm_quotes, "fee_fields", lambda w3: {})
+    monkeypatch.setattr(warm_quotes, "get_gas_estimator", lambda w3: _Gas())
+    monkeypatch.setattr(warm_quotes, "send_transaction", lambda w3, tx, key: sent.append(tx) or _Handle())
+    return stub_web3(chain), sent
+
+
+def test_warm_route_that_would_revert_is_not_sent(monkeypatch):
+    def router(data):
+        raise Revert("Return amount is not enough")
+
+    w3, sent = _setup(monkeypatch, router)
+
+    assert execute_warm_quote(w3, _warm(), PRIVATE_KEY) is None
+    assert sent == []
+
+
+def test_warm_route_that_still_executes_is_sent(monkeypatch):
+    w3, sent = _setup(monkeypatch, lambda data: encode(["uint256", "uint256"], [3_000_000, 150_000]))
+
+    result = execute_warm_quote(w3, _warm(), PRIVATE_KEY)
+
+    assert result["transaction"]["transactionHash"] == _Handle.tx_hash
+    assert len(sent) == 1 and sent[0]["gas"] == 180_000